@@ -9,7 +9,7 @@ https://docs.djangoproject.com/en/6.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
-import os
+import json, os
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -135,18 +135,149 @@ MAX_FILES_PER_UPLOAD = int(os.getenv("MAX_FILES_PER_UPLOAD", "5"))
 MAX_TOTAL_UPLOAD_SIZE = int(os.getenv("MAX_TOTAL_UPLOAD_SIZE", "20971520"))  # 20MB
 ALLOWED_EXTENSIONS = set(os.getenv("ALLOWED_EXTENSIONS", "txt,csv,pdf,docx").split(","))
 
+# Search settings
+SEARCH_COUNT_CACHE_TTL = int(os.getenv("SEARCH_COUNT_CACHE_TTL", "3600"))  # เก็บยอดรวมไว้นานสุด (วินาที)
+SEARCH_COUNT_STALE_AFTER = int(os.getenv("SEARCH_COUNT_STALE_AFTER", "60"))  # เกินนี้ refresh เบื้องหลัง
+SEARCH_SNIPPET_PREFIX_CHARS = int(os.getenv("SEARCH_SNIPPET_PREFIX_CHARS", "20000"))  # snippet คำนวณจาก prefix นี้เท่านั้น
+SEARCH_TRIGRAM_THRESHOLD = float(os.getenv("SEARCH_TRIGRAM_THRESHOLD", "0.4"))  # pg_trgm word similarity ขั้นต่ำ
+SEARCH_TRIGRAM_WEIGHT = float(os.getenv("SEARCH_TRIGRAM_WEIGHT", "0.5"))  # น้ำหนัก similarity ของชื่อไฟล์ตอน rank
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") == "1"
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "120"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "500"))  # ต่อ user ต่อ generation
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", "262144"))  # response ใหญ่กว่านี้ไม่ cache
+
+SUGGEST_TERMS_PER_DOCUMENT = int(os.getenv("SUGGEST_TERMS_PER_DOCUMENT", "30"))
+SUGGEST_SCAN_CHARS = int(os.getenv("SUGGEST_SCAN_CHARS", "200000"))
+
+# Export settings
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))  # แถวต่อรอบของ server-side cursor
+EXPORT_TEXT_BATCH_SIZE = int(os.getenv("EXPORT_TEXT_BATCH_SIZE", "50"))  # ตอน export extracted_text / chunks
+EXPORT_ZIP_CONCURRENCY = int(os.getenv("EXPORT_ZIP_CONCURRENCY", "4"))  # จำนวนไฟล์ต้นฉบับที่ดึงจาก storage ล่วงหน้าพร้อมกัน
+
 # LLM settings
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # model + prompt cache อยู่ใน memory ระหว่าง turn
 ENABLE_LLM = os.getenv("ENABLE_LLM", "1") == "1"
 
-LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama")  # bedrock / ollama / mock (load test, ไม่เรียก model จริง)
+
+# mock provider: คำตอบ deterministic จาก hash ของ prompt
+LLM_MOCK_LATENCY_MS = int(os.getenv("LLM_MOCK_LATENCY_MS", "300"))  # ก่อน token แรก
+LLM_MOCK_JITTER_MS = int(os.getenv("LLM_MOCK_JITTER_MS", "0"))
+LLM_MOCK_TOKENS_PER_SECOND = float(os.getenv("LLM_MOCK_TOKENS_PER_SECOND", "50"))
+LLM_MOCK_OUTPUT_WORDS = int(os.getenv("LLM_MOCK_OUTPUT_WORDS", "60"))
+LLM_MOCK_ERROR_RATE = float(os.getenv("LLM_MOCK_ERROR_RATE", "0"))
+LLM_MOCK_THROTTLE_RATE = float(os.getenv("LLM_MOCK_THROTTLE_RATE", "0"))
+LLM_MOCK_SEED = int(os.getenv("LLM_MOCK_SEED")) if os.getenv("LLM_MOCK_SEED") else None
 
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 BEDROCK_INFERENCE_PROFILE_ARN = os.getenv("BEDROCK_INFERENCE_PROFILE_ARN", "")
 
 BEDROCK_MAX_TOKENS = int(os.getenv("BEDROCK_MAX_TOKENS", "800"))
 BEDROCK_TEMPERATURE = float(os.getenv("BEDROCK_TEMPERATURE", "0.2"))
+# model เล็ก/เร็วสำหรับ profile "fast" (classify, title) ว่าง = ใช้ model หลัก
+BEDROCK_FAST_MODEL_ID = os.getenv("BEDROCK_FAST_MODEL_ID", "")
+OLLAMA_FAST_MODEL = os.getenv("OLLAMA_FAST_MODEL", "")
+# override generation profile ต่อ purpose เช่น {"title": {"max_tokens": 40}, "chat": {"model": "fast"}}
+LLM_PROFILES = json.loads(os.getenv("LLM_PROFILES", "") or "{}")
+# prompt caching: context ที่ซ้ำทุก turn (system + summary) ใส่ cache_control ถ้ายาวอย่างน้อย MIN_TOKENS
+BEDROCK_PROMPT_CACHE = os.getenv("BEDROCK_PROMPT_CACHE", "1") == "1"
+BEDROCK_PROMPT_CACHE_MIN_TOKENS = int(os.getenv("BEDROCK_PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+LLM_HTTP_POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", "10"))  # connection pool ของ client Bedrock / Ollama
+LLM_HTTP_KEEPALIVE_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "30"))
+# connection สูงสุดของ Ollama AsyncClient ต่อ event loop และจำนวน thread อ่าน Bedrock stream ของ async endpoint ต่อ process
+LLM_ASYNC_POOL_SIZE = int(os.getenv("LLM_ASYNC_POOL_SIZE", "200"))
+
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+# routing: ถ้า primary (LLM_PROVIDER) ล่ม/ช้า -> ลอง provider ถัดไปตามลำดับนี้ (เช่น "ollama")
+LLM_FALLBACK_PROVIDERS = [p for p in os.getenv("LLM_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+LLM_BREAKER_WINDOW_BUCKETS = int(os.getenv("LLM_BREAKER_WINDOW_BUCKETS", "6"))  # x LLM_BREAKER_BUCKET_SECONDS
+LLM_BREAKER_BUCKET_SECONDS = int(os.getenv("LLM_BREAKER_BUCKET_SECONDS", "10"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_MS = int(os.getenv("LLM_BREAKER_SLOW_MS", "20000"))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_COOLDOWN_SECONDS = int(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+# hedged request: primary ยังไม่ตอบ/ไม่มี token แรกเกิน percentile นี้ -> ยิง fallback ซ้อน (เสีย token เพิ่ม)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# outbound limiter ต่อ provider (ควรใช้ cache กลาง เช่น Redis เพื่อให้ทุก process แชร์กัน)
+# CACHES ค่าเริ่มต้น (LocMem) -> โควตาและ concurrency ด้านล่างเป็นต่อ process ไม่ใช่รวมทั้งระบบ
+# 0 = ไม่จำกัด
+LLM_RATE_RPM = {
+    "bedrock": int(os.getenv("LLM_BEDROCK_RPM", "0")),
+    "ollama": int(os.getenv("LLM_OLLAMA_RPM", "0")),
+}
+LLM_RATE_TPM = {
+    "bedrock": int(os.getenv("LLM_BEDROCK_TPM", "0")),
+    "ollama": int(os.getenv("LLM_OLLAMA_TPM", "0")),
+}
+LLM_CONCURRENCY_MAX = {
+    "bedrock": int(os.getenv("LLM_BEDROCK_MAX_CONCURRENCY", "16")),
+    "ollama": int(os.getenv("LLM_OLLAMA_MAX_CONCURRENCY", "4")),
+}
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+LLM_CONCURRENCY_LATENCY_TARGET_MS = int(os.getenv("LLM_CONCURRENCY_LATENCY_TARGET_MS", "15000"))
+LLM_QUEUE_DEADLINE_SECONDS = float(os.getenv("LLM_QUEUE_DEADLINE_SECONDS", "30"))
+
+# coefficients ของ token estimator (เขียนโดย manage.py calibrate_tokens)
+LLM_TOKEN_ESTIMATOR_PATH = os.getenv("LLM_TOKEN_ESTIMATOR_PATH", str(BASE_DIR / "token_estimator.json"))
+
+# LLMCallLog เขียนแบบ buffer + bulk_create ใน thread เบื้องหลัง (0 = เขียนทันทีแบบเดิม)
+LLM_LOG_ASYNC = os.getenv("LLM_LOG_ASYNC", "1") == "1"
+LLM_LOG_BATCH_SIZE = int(os.getenv("LLM_LOG_BATCH_SIZE", "100"))
+LLM_LOG_FLUSH_SECONDS = float(os.getenv("LLM_LOG_FLUSH_SECONDS", "2"))
+LLM_LOG_SPOOL_PATH = os.getenv("LLM_LOG_SPOOL_PATH", str(BASE_DIR / ".llm_log_spool.jsonl"))
+
+# งบ token ของ prompt chat (system + context + history) ต่อ purpose; excerpt ที่ดึงมาเป็น candidate สูงสุด
+CHAT_PROMPT_TOKEN_BUDGETS = {
+    "chat": int(os.getenv("CHAT_PROMPT_TOKENS", "6000")),
+    "chat_stream": int(os.getenv("CHAT_STREAM_PROMPT_TOKENS", os.getenv("CHAT_PROMPT_TOKENS", "6000"))),
+}
+CHAT_CONTEXT_MAX_EXCERPTS = int(os.getenv("CHAT_CONTEXT_MAX_EXCERPTS", "10"))
+# สัดส่วนงบที่ให้ context คงที่ (title/summary) -> ข้อความ prefix เหมือนเดิมทุก turn จึง cache ได้
+CHAT_STABLE_CONTEXT_SHARE = float(os.getenv("CHAT_STABLE_CONTEXT_SHARE", "0.5"))
+
+# ใช้ async chat stream (achat_stream_api) -> ต้องรันผ่าน ASGI เช่น uvicorn config.asgi:application
+CHAT_ASYNC_STREAMING = os.getenv("CHAT_ASYNC_STREAMING", "0") == "1"
+
+# response cache ของ LLM: "" = ปิด, "db" = ตาราง LLMResponseCache, "disk" = ไฟล์ใต้ LLM_RESPONSE_CACHE_DIR
+LLM_RESPONSE_CACHE_BACKEND = os.getenv("LLM_RESPONSE_CACHE_BACKEND", "db")
+LLM_RESPONSE_CACHE_DIR = os.getenv("LLM_RESPONSE_CACHE_DIR", str(BASE_DIR / ".llm_cache"))
+LLM_RESPONSE_CACHE_PURPOSES = [
+    p for p in os.getenv("LLM_RESPONSE_CACHE_PURPOSES", "title,classify,combined,summarize").split(",") if p.strip()
+]
+LLM_RESPONSE_CACHE_TTL = int(os.getenv("LLM_RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+LLM_RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_RESPONSE_CACHE_MAX_TEMPERATURE", "0.3"))
+
+# batch classify: หลายเอกสารต่อ 1 request (ดู classifier.classify_batch)
+CLASSIFY_BATCH_EXCERPT_CHARS = int(os.getenv("CLASSIFY_BATCH_EXCERPT_CHARS", "1500"))
+CLASSIFY_BATCH_MAX_ITEMS = int(os.getenv("CLASSIFY_BATCH_MAX_ITEMS", "20"))
+CLASSIFY_BATCH_MAX_INPUT_TOKENS = int(os.getenv("CLASSIFY_BATCH_MAX_INPUT_TOKENS", "6000"))
+
+# summary: สั้นกว่า SUMMARY_LLM_MIN_CHARS ใช้ extractive เลย; ยาวกว่า SUMMARY_INPUT_MAX_CHARS ย่อด้วยประโยคสำคัญก่อนส่ง LLM
+SUMMARY_LLM_MIN_CHARS = int(os.getenv("SUMMARY_LLM_MIN_CHARS", "500"))
+SUMMARY_INPUT_MAX_CHARS = int(os.getenv("SUMMARY_INPUT_MAX_CHARS", "12000"))
+
+# combined summary: งบ token ต่อกลุ่มในแต่ละชั้นของ reduce และจำนวน LLM call ที่ยิงพร้อมกัน
+COMBINED_REDUCE_INPUT_TOKENS = int(os.getenv("COMBINED_REDUCE_INPUT_TOKENS", "4000"))
+COMBINED_SUMMARY_CONCURRENCY = int(os.getenv("COMBINED_SUMMARY_CONCURRENCY", "4"))
+# จำนวนเอกสารเฉลี่ยต่อกลุ่ม (รอยต่อกลุ่มจาก hash ของ doc id -> เพิ่ม/ลบเอกสารสรุปใหม่แค่กิ่งเดียว)
+COMBINED_REDUCE_GROUP_SIZE = int(os.getenv("COMBINED_REDUCE_GROUP_SIZE", "8"))
+# summary ใหม่คล้ายเดิม (cosine) ตั้งแต่ค่านี้ -> คง title เดิม ไม่เรียก LLM สร้างใหม่
+COMBINED_TITLE_KEEP_SIMILARITY = float(os.getenv("COMBINED_TITLE_KEEP_SIMILARITY", "0.6"))
+
+# classifier ในเครื่อง (manage.py train_classifier): มั่นใจ >= threshold -> ไม่เรียก LLM
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "1") == "1"
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", str(BASE_DIR / "doc_classifier.npz"))
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
 
 LLM_DAILY_CALL_LIMIT = int(os.getenv("LLM_DAILY_CALL_LIMIT", "0"))
 
@@ -159,6 +290,7 @@ LLM_LOW_TOKEN_THRESHOLD_RATIO = 0.10
 
 AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME", "")
 AWS_S3_REGION_NAME = os.getenv("AWS_S3_REGION_NAME", "ap-southeast-1")
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_S3_MAX_POOL_CONNECTIONS", "20"))
 
 # แนะนำ: ไม่ให้ public
 AWS_DEFAULT_ACL = None
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document, CombinedSummary, Conversation, Message, LLMCallLog, DocumentChunk
+from .models import Document, CombinedSummary, Conversation, Message, LLMCallLog, LLMResponseCache, DocumentChunk, SuggestTerm
 
 
 
@@ -56,10 +56,22 @@ class MessageAdmin(admin.ModelAdmin):
 
 @admin.register(LLMCallLog)
 class LLMCallLogAdmin(admin.ModelAdmin):
-    list_display = ("id", "owner", "provider", "purpose", "ok", "latency_ms", "input_tokens", "output_tokens", "created_at")
-    list_filter = ("provider", "purpose", "ok", "created_at")
+    list_display = ("id", "owner", "provider", "purpose", "ok", "cache_hit", "latency_ms", "input_tokens", "output_tokens", "cache_read_tokens", "created_at")
+    list_filter = ("provider", "purpose", "ok", "cache_hit", "created_at")
+
+@admin.register(LLMResponseCache)
+class LLMResponseCacheAdmin(admin.ModelAdmin):
+    list_display = ("id", "purpose", "provider", "model_id", "hits", "created_at", "last_used_at")
+    list_filter = ("purpose", "provider")
+    search_fields = ("key",)
 
 @admin.register(DocumentChunk)
 class DocumentChunkAdmin(admin.ModelAdmin):
     list_display = ("id", "document_id", "idx", "created_at")
-    search_fields = ("content",)
\ No newline at end of file
+    search_fields = ("content",)
+
+@admin.register(SuggestTerm)
+class SuggestTermAdmin(admin.ModelAdmin):
+    list_display = ("id", "owner", "kind", "term", "display", "weight")
+    list_filter = ("kind",)
+    search_fields = ("term", "display")
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class DocumentsConfig(AppConfig):
     name = 'documents'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from documents.services.search.trigram import configure_trigram_threshold
+
+        connection_created.connect(configure_trigram_threshold, dispatch_uid="documents.trigram_threshold")
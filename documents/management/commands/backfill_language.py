@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.models import Document, DocumentChunk
+from documents.services.analysis.lang_detect import language_from_ratio, thai_ratio
+
+
+class Command(BaseCommand):
+    help = "Compute Document.lang / thai_ratio and DocumentChunk.lang for rows processed before they existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=500, help="rows loaded per round")
+        parser.add_argument("--all", action="store_true", help="recompute rows that already have a language")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+
+        docs = Document.objects.all() if opts["all"] else Document.objects.filter(lang="")
+        buf, n_docs = [], 0
+        for doc_id, text in docs.order_by("id").values_list("id", "extracted_text").iterator(chunk_size=opts["chunk"]):
+            r = thai_ratio(text or "")
+            buf.append(Document(id=doc_id, lang=language_from_ratio(r), thai_ratio=r))
+            if len(buf) >= opts["chunk"]:
+                Document.objects.bulk_update(buf, ["lang", "thai_ratio"])
+                n_docs += len(buf)
+                buf = []
+        if buf:
+            Document.objects.bulk_update(buf, ["lang", "thai_ratio"])
+            n_docs += len(buf)
+        self.stdout.write(f"documents: {n_docs}")
+
+        # chunk ใช้แค่ lang -> รวม id ตามภาษาแล้ว UPDATE ทีละภาษา
+        chunks = DocumentChunk.objects.all() if opts["all"] else DocumentChunk.objects.filter(lang="")
+        by_lang, n_chunks = {"th": [], "en": []}, 0
+
+        def flush():
+            nonlocal n_chunks
+            for lang, ids in by_lang.items():
+                if ids:
+                    DocumentChunk.objects.filter(id__in=ids).update(lang=lang)
+                    n_chunks += len(ids)
+                    ids.clear()
+
+        for chunk_id, content in chunks.order_by("id").values_list("id", "content").iterator(chunk_size=opts["chunk"]):
+            by_lang[language_from_ratio(thai_ratio(content or ""))].append(chunk_id)
+            if sum(len(v) for v in by_lang.values()) >= opts["chunk"]:
+                flush()
+        flush()
+        self.stdout.write(f"chunks: {n_chunks}")
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - t0:.1f}s"))
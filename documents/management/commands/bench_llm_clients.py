@@ -0,0 +1,73 @@
+import statistics, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.services.llm import clients
+
+from .bench_search import _pct
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark per-call LLM client overhead: fresh client per call vs cached registry client"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider", choices=["bedrock", "ollama"], default=None)
+        parser.add_argument("--runs", type=int, default=50)
+        parser.add_argument(
+            "--live", action="store_true",
+            help="also make one cheap request per run (ollama: list models, bedrock: 1-token invoke)",
+        )
+
+    def handle(self, *args, **opts):
+        prov = opts["provider"] or (getattr(settings, "LLM_PROVIDER", "") or "ollama").lower().strip()
+        runs = max(1, opts["runs"])
+
+        if prov == "bedrock":
+            fresh, cached = clients.new_bedrock_runtime, clients.bedrock_runtime
+        else:
+            fresh, cached = clients.new_ollama_client, clients.ollama_client
+
+        self.stdout.write(f"provider={prov} runs={runs} live={opts['live']} pool={clients._pool_size()}")
+
+        clients.reset_clients()
+        self._report("before: new client per call", self._time(runs, lambda: self._call(prov, fresh(), opts["live"])))
+
+        clients.reset_clients()
+        cached()  # warm
+        self._report("after:  registry client", self._time(runs, lambda: self._call(prov, cached(), opts["live"])))
+
+        self.stdout.write("Done.")
+
+    def _call(self, prov, client, live):
+        if not live:
+            return
+        if prov == "ollama":
+            client.list()
+            return
+
+        import json
+        client.invoke_model(
+            modelId=getattr(settings, "BEDROCK_INFERENCE_PROFILE_ARN", ""),
+            body=json.dumps({
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 1,
+                "messages": [{"role": "user", "content": [{"type": "text", "text": "hi"}]}],
+            }).encode("utf-8"),
+            contentType="application/json",
+            accept="application/json",
+        )["body"].read()
+
+    def _time(self, runs, fn):
+        out = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            fn()
+            out.append((time.perf_counter() - t0) * 1000)
+        return out
+
+    def _report(self, label, ms):
+        self.stdout.write(
+            f"  {label:<32} p50={_pct(ms, 50):8.2f}ms  p95={_pct(ms, 95):8.2f}ms  "
+            f"mean={statistics.fmean(ms):8.2f}ms"
+        )
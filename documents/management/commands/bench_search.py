@@ -0,0 +1,165 @@
+import random, statistics, time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from documents.models import Document, CombinedSummary
+from documents.services.search.document_query import DocumentFilters, filtered_documents, attach_snippets, LIST_FIELDS
+from documents.services.search.notebook_query import filtered_notebooks
+from documents.services.search.pagination import paginate_keyset
+from documents.services.search.search_index import search_vector_expression
+
+BENCH_PREFIX = "bench_"
+
+WORDS_EN = [
+    "report", "invoice", "policy", "proposal", "budget", "quarterly", "research", "market", "analysis",
+    "customer", "contract", "payment", "schedule", "announcement", "resume", "project", "summary",
+    "revenue", "forecast", "security", "training", "meeting", "strategy", "product", "review",
+]
+WORDS_TH = [
+    "รายงาน", "ใบแจ้งหนี้", "นโยบาย", "ข้อเสนอ", "งบประมาณ", "การวิจัย", "ลูกค้า", "สัญญา",
+    "การชำระเงิน", "ประกาศ", "โครงการ", "สรุป", "รายได้", "การประชุม", "กลยุทธ์",
+]
+
+DEFAULT_QUERIES = ["report", "reprot", "quarterly budget", "invoce", "งบประมาณ"]
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+class Command(BaseCommand):
+    help = "Benchmark document/notebook search (optionally seed synthetic documents for one user)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner-id", type=int, required=True)
+        parser.add_argument("--seed", type=int, default=0, help="create N synthetic documents before running")
+        parser.add_argument("--batch", type=int, default=2000)
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--deep-pages", type=int, default=20, help="follow next_cursor this many pages")
+        parser.add_argument("--query", action="append", dest="queries", default=None)
+        parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE for the first page")
+        parser.add_argument("--cleanup", action="store_true", help="delete synthetic documents and exit")
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        try:
+            owner = User.objects.get(pk=opts["owner_id"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {opts['owner_id']} not found")
+
+        if opts["cleanup"]:
+            n_cs, _ = CombinedSummary.objects.filter(owner=owner, title__startswith=BENCH_PREFIX).delete()
+            n_doc, _ = Document.objects.filter(owner=owner, file_name__startswith=BENCH_PREFIX).delete()
+            self.stdout.write(f"Deleted {n_doc} documents / {n_cs} notebooks.")
+            return
+
+        if opts["seed"] > 0:
+            self._seed(owner, opts["seed"], opts["batch"])
+
+        total = Document.objects.filter(owner=owner).count()
+        self.stdout.write(f"Benchmarking user={owner.pk} documents={total} runs={opts['runs']}")
+
+        for q in opts["queries"] or DEFAULT_QUERIES:
+            f = DocumentFilters(q=q)
+            self._report(f"docs first page   q={q!r}", self._time(opts["runs"], lambda: self._first_page(owner, f)))
+            self._report(f"docs deep page    q={q!r}", self._time(
+                max(1, opts["runs"] // 5), lambda: self._deep_page(owner, f, opts["deep_pages"])
+            ))
+            self._report(f"docs count        q={q!r}", self._time(opts["runs"], lambda: filtered_documents(owner, f).count()))
+            self._report(f"notebooks         q={q!r}", self._time(
+                opts["runs"], lambda: list(filtered_notebooks(owner, q, "relevance")[:10])
+            ))
+
+            if opts["explain"]:
+                qs = filtered_documents(owner, f).only(*LIST_FIELDS)[:11]
+                self.stdout.write(qs.explain(analyze=True, buffers=True))
+
+        self.stdout.write("Done.")
+
+    # -------------------------
+    # scenarios
+    # -------------------------
+    def _first_page(self, owner, f):
+        page = paginate_keyset(filtered_documents(owner, f).only(*LIST_FIELDS), per_page=10, ranked=bool(f.q))
+        attach_snippets(page.items, f.q)
+
+    def _deep_page(self, owner, f, pages):
+        cursor = ""
+        for _ in range(pages):
+            page = paginate_keyset(
+                filtered_documents(owner, f).only(*LIST_FIELDS), cursor=cursor, per_page=10, ranked=bool(f.q)
+            )
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+
+    def _time(self, runs, fn):
+        out = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            fn()
+            out.append((time.perf_counter() - t0) * 1000)
+        return out
+
+    def _report(self, label, ms):
+        self.stdout.write(
+            f"  {label:<40} p50={_pct(ms, 50):8.2f}ms  p95={_pct(ms, 95):8.2f}ms  "
+            f"mean={statistics.fmean(ms):8.2f}ms"
+        )
+
+    # -------------------------
+    # seed
+    # -------------------------
+    def _seed(self, owner, n, batch):
+        rng = random.Random(42)
+        self.stdout.write(f"Seeding {n} documents for user={owner.pk}...")
+
+        def words(k):
+            pool = WORDS_TH if rng.random() < 0.3 else WORDS_EN
+            return [rng.choice(pool) for _ in range(k)]
+
+        buf = []
+        for i in range(1, n + 1):
+            name = f"{BENCH_PREFIX}{i}_{'_'.join(words(3))}.pdf"
+            text = " ".join(words(rng.randint(150, 400)))
+            buf.append(Document(
+                owner=owner,
+                file=f"bench/user_{owner.pk}/{name}",
+                file_name=name,
+                file_ext="pdf",
+                extracted_text=text,
+                summary=" ".join(words(30)),
+                word_count=len(text.split()),
+                char_count=len(text),
+                status="done",
+                document_type=rng.choice(["invoice", "policy", "proposal", "report", "research", "other"]),
+            ))
+            if len(buf) >= batch:
+                Document.objects.bulk_create(buf)
+                buf = []
+                self.stdout.write(f"  {i}/{n}")
+        if buf:
+            Document.objects.bulk_create(buf)
+
+        CombinedSummary.objects.bulk_create([
+            CombinedSummary(
+                owner=owner,
+                title=f"{BENCH_PREFIX}{' '.join(words(4))}",
+                combined_summary="\n".join(f"- {' '.join(words(20))}" for _ in range(5)),
+            )
+            for _ in range(max(1, n // 100))
+        ])
+
+        self.stdout.write("Building search vectors...")
+        Document.objects.filter(owner=owner, file_name__startswith=BENCH_PREFIX).update(
+            search_vector=search_vector_expression()
+        )
+        with connection.cursor() as cur:
+            cur.execute(f"ANALYZE {Document._meta.db_table}")
+            cur.execute(f"ANALYZE {CombinedSummary._meta.db_table}")
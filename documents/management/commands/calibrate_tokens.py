@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from documents.models import LLMCallLog
+from documents.services.llm import tokens
+
+FEATURES = list(tokens.CLASSES) + ["intercept"]
+
+
+def _solve(a: list[list[float]], b: list[float]) -> list[float]:
+    # Gaussian elimination (partial pivot) สำหรับ normal equations ขนาดเล็ก
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        piv = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[piv][col]) < 1e-12:
+            continue
+        m[col], m[piv] = m[piv], m[col]
+        for r in range(n):
+            if r != col and m[r][col]:
+                f = m[r][col] / m[col][col]
+                m[r] = [x - f * y for x, y in zip(m[r], m[col])]
+    return [m[i][n] / m[i][i] if abs(m[i][i]) >= 1e-12 else 0.0 for i in range(n)]
+
+
+def _fit(rows: list[tuple[list[float], float]], *, ridge: float = 1e-3) -> list[float]:
+    """
+    least squares แบบ coefficient ห้ามติดลบ: fit -> ตัด feature ที่ได้ค่าลบออก (=0) -> fit ใหม่
+    ridge เล็ก ๆ กัน matrix singular เมื่อ class ไหนไม่มีข้อมูลเลย (เช่นไม่มี "other")
+    """
+    active = list(range(len(FEATURES)))
+    while True:
+        k = len(active)
+        ata = [[0.0] * k for _ in range(k)]
+        atb = [0.0] * k
+        for x, y in rows:
+            xs = [x[i] for i in active]
+            for i in range(k):
+                atb[i] += xs[i] * y
+                for j in range(k):
+                    ata[i][j] += xs[i] * xs[j]
+        for i in range(k):
+            ata[i][i] += ridge
+        sol = _solve(ata, atb)
+        neg = [active[i] for i, v in enumerate(sol) if v < 0]
+        if not neg:
+            out = [0.0] * len(FEATURES)
+            for i, v in zip(active, sol):
+                out[i] = v
+            return out
+        active = [i for i in active if i not in neg]
+
+
+def _mape(rows, coefs: dict) -> float:
+    errs = []
+    for x, y in rows:
+        prof = dict(zip(tokens.CLASSES, x))
+        est = tokens.estimate_from_profile(prof, coefs=coefs, intercept=True)
+        errs.append(abs(est - y) / y)
+    return 100.0 * sum(errs) / max(1, len(errs))
+
+
+class Command(BaseCommand):
+    help = "Refit token estimator coefficients (per character class) from logged Bedrock usage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--limit", type=int, default=20000)
+        parser.add_argument("--min-rows", type=int, default=50)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        since = timezone.now() - timedelta(days=opts["days"])
+        qs = (
+            LLMCallLog.objects.filter(
+                provider="bedrock", ok=True, cache_hit=False, input_tokens__gt=0,
+                input_profile__isnull=False, created_at__gte=since,
+            )
+            .order_by("-created_at")
+            .values_list("input_profile", "input_tokens")[: opts["limit"]]
+        )
+
+        rows = []
+        for prof, n in qs:
+            if not isinstance(prof, dict):
+                continue
+            x = [float(prof.get(c, 0)) for c in tokens.CLASSES] + [1.0]
+            rows.append((x, float(n)))
+
+        if len(rows) < opts["min_rows"]:
+            raise CommandError(f"Only {len(rows)} usable Bedrock calls (need --min-rows={opts['min_rows']}).")
+
+        fitted = dict(zip(FEATURES, _fit(rows)))
+        before = _mape([(x[:-1], y) for x, y in rows], tokens.coefficients())
+        after = _mape([(x[:-1], y) for x, y in rows], fitted)
+
+        self.stdout.write(f"rows={len(rows)} days={opts['days']}")
+        for k in FEATURES:
+            self.stdout.write(f"  {k:<10} {tokens.coefficients()[k]:.4f} -> {fitted[k]:.4f}")
+        self.stdout.write(f"MAPE current={before:.1f}% fitted={after:.1f}%")
+
+        if opts["dry_run"]:
+            return
+        path = tokens.save_coefficients(
+            {k: round(v, 6) for k, v in fitted.items()},
+            {"rows": len(rows), "days": opts["days"], "mape": round(after, 2), "fitted_at": timezone.now().isoformat()},
+        )
+        self.stdout.write(self.style.SUCCESS(f"Saved {path}"))
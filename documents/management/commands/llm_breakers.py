@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from documents.services.llm.router import snapshot, reset
+
+class Command(BaseCommand):
+    help = "Show (or reset) the circuit breaker state of each LLM provider"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["reset"]:
+            reset()
+            self.stdout.write("Breakers reset.")
+        for s in snapshot():
+            p = s["first_token_p"]
+            self.stdout.write(
+                f"{s['provider']:<8} state={s['state']:<9} calls={s['calls']} errors={s['errors']} "
+                f"slow={s['slow']} error_rate={s['error_rate']:.0%} "
+                f"latency_p={'-' if p is None else f'{p}ms'} {s['reason']}"
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.models import LLMCallLog
+from documents.services.llm.response_cache import get_backend
+
+class Command(BaseCommand):
+    help = "Prune (TTL + LRU) or clear the LLM response cache and show hit counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true")
+        parser.add_argument("--clear", action="store_true")
+
+    def handle(self, *args, **opts):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError("LLM response cache is disabled (LLM_RESPONSE_CACHE_BACKEND).")
+
+        if opts["clear"]:
+            self.stdout.write(f"Cleared {backend.clear()} entries.")
+        elif opts["prune"]:
+            self.stdout.write(f"Pruned {backend.prune()} entries.")
+
+        hits = LLMCallLog.objects.filter(cache_hit=True).count()
+        calls = LLMCallLog.objects.filter(cache_hit=False, ok=True).count()
+        self.stdout.write(f"backend={backend.__class__.__name__} cache_hits={hits} model_calls={calls}")
@@ -0,0 +1,267 @@
+import random, re, statistics, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from documents.models import Document
+
+from .bench_search import DEFAULT_QUERIES, WORDS_EN, WORDS_TH, _pct
+
+LOADTEST_PREFIX = "loadtest_"
+SCENARIOS = ("upload", "search", "chat")
+TERMINAL_EVENTS = ((b"event: done", "done"), (b"event: error", "error"), (b"event: canceled", "canceled"))
+CHAT_QUESTIONS = ["สรุปประเด็นหลักให้หน่อย", "What are the key risks?", "มีตัวเลขงบประมาณเท่าไร", "List the action items."]
+
+
+def _read_sse(chunks, t0: float) -> tuple[float | None, str]:
+    """
+    อ่าน SSE ของ chat stream จนจบ -> (ttft, event ปิดท้าย "done" / "error" / "canceled" / "")
+    error ของ LLM (LLMError / QueueTimeout / ProviderUnavailable) มาเป็น event: error ใน response 200
+    -> ต้องดู event ไม่ใช่แค่ status code
+    """
+    first, last, tail = None, "", b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if first is None:
+            first = time.time() - t0
+        buf = tail + (chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        found = [(buf.rfind(m), name) for m, name in TERMINAL_EVENTS if m in buf]
+        if found:
+            last = max(found)[1]
+        tail = buf[-32:]  # marker อาจถูกตัดคร่อม chunk
+    return first, last
+
+
+def _synthetic_text(rnd: random.Random, words: int = 400) -> str:
+    pool = WORDS_EN + WORDS_TH
+    return " ".join(rnd.choice(pool) for _ in range(words))
+
+
+# -------------------------
+# session: Django test client (ใน process) หรือ server จริงผ่าน httpx
+# -------------------------
+class _LocalSession:
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+        # connection ของ Django แยกต่อ thread -> จำ wrapper ของ thread ที่สร้าง session ไว้ปิดตอนจบ
+        self.db = connections[DEFAULT_DB_ALIAS]
+
+    def get(self, path, params=None):
+        r = self.client.get(path, params or {})
+        return r.status_code, r.get("Location", "")
+
+    def upload(self, path, name, content: bytes):
+        r = self.client.post(path, {"files": [SimpleUploadedFile(name, content, content_type="text/plain")]})
+        return r.status_code
+
+    def stream(self, path, data):
+        t0 = time.time()
+        r = self.client.post(path, data)
+        first, event = _read_sse(getattr(r, "streaming_content", [r.content]), t0)
+        return r.status_code, first, event
+
+    def close(self):
+        # test client ปลด close_old_connections ออกจาก request_finished -> connection ของ worker thread ค้างเปิดไว้
+        # close() ถูกเรียกจาก main thread หลัง pool จบ -> เปิด thread sharing ชั่วคราวเพื่อปิดข้าม thread
+        self.db.inc_thread_sharing()
+        try:
+            self.db.close()
+        finally:
+            self.db.dec_thread_sharing()
+
+
+class _LiveSession:
+    def __init__(self, base_url, cookies):
+        import httpx
+        self.client = httpx.Client(base_url=base_url, cookies=cookies, timeout=120, follow_redirects=False)
+
+    @classmethod
+    def login(cls, base_url, username, password):
+        import httpx
+        with httpx.Client(base_url=base_url, timeout=30, follow_redirects=False) as c:
+            login_path = reverse("accounts:login")
+            c.get(login_path)
+            r = c.post(login_path, data={
+                "username": username, "password": password,
+                "csrfmiddlewaretoken": c.cookies.get("csrftoken", ""),
+            }, headers={"Referer": f"{base_url}{login_path}"})
+            if r.status_code != 302 or "sessionid" not in c.cookies:
+                raise CommandError(f"Login failed ({r.status_code}).")
+            return dict(c.cookies)
+
+    def _csrf(self):
+        return {"X-CSRFToken": self.client.cookies.get("csrftoken", ""), "Referer": str(self.client.base_url)}
+
+    def get(self, path, params=None):
+        r = self.client.get(path, params=params or {})
+        return r.status_code, r.headers.get("location", "")
+
+    def upload(self, path, name, content: bytes):
+        r = self.client.post(path, files=[("files", (name, content, "text/plain"))], headers=self._csrf())
+        return r.status_code
+
+    def stream(self, path, data):
+        t0 = time.time()
+        with self.client.stream("POST", path, data=data, headers=self._csrf()) as r:
+            first, event = _read_sse(r.iter_raw(), t0)
+            return r.status_code, first, event
+
+    def close(self):
+        self.client.close()
+
+
+class Command(BaseCommand):
+    help = "Load test uploads, searches and chat streams (Django test client or a live server) and report latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner-id", type=int, help="in-process mode: run as this user via the Django test client")
+        parser.add_argument("--base-url", default="", help="live mode, e.g. http://127.0.0.1:8000")
+        parser.add_argument("--username", default="")
+        parser.add_argument("--password", default="")
+        parser.add_argument("--scenario", action="append", choices=SCENARIOS, dest="scenarios", default=None)
+        parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--doc-id", type=int, default=None, help="document to chat with (default: latest done)")
+        parser.add_argument("--query", action="append", dest="queries", default=None)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--allow-real-llm", action="store_true",
+            help="in-process mode refuses upload/chat unless LLM_PROVIDER=mock",
+        )
+        parser.add_argument("--cleanup", action="store_true", help="delete documents created by earlier runs and exit")
+
+    def handle(self, *args, **opts):
+        live = bool(opts["base_url"])
+        scenarios = opts["scenarios"] or list(SCENARIOS)
+        self.seed = opts["seed"]
+        self.queries = opts["queries"] or DEFAULT_QUERIES
+
+        if live:
+            if not opts["username"]:
+                raise CommandError("--username/--password are required with --base-url")
+            cookies = _LiveSession.login(opts["base_url"].rstrip("/"), opts["username"], opts["password"])
+            self.new_session = lambda: _LiveSession(opts["base_url"].rstrip("/"), cookies)
+            owner = None
+        else:
+            if not opts["owner_id"]:
+                raise CommandError("Use --owner-id (in-process) or --base-url (live server).")
+            try:
+                owner = get_user_model().objects.get(pk=opts["owner_id"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {opts['owner_id']} not found")
+
+            if opts["cleanup"]:
+                n, _ = Document.objects.filter(owner=owner, file_name__startswith=LOADTEST_PREFIX).delete()
+                self.stdout.write(f"Deleted {n} objects.")
+                return
+
+            prov = (getattr(settings, "LLM_PROVIDER", "") or "").lower()
+            if prov != "mock" and not opts["allow_real_llm"] and {"upload", "chat"} & set(scenarios):
+                raise CommandError(
+                    f"LLM_PROVIDER={prov}: upload/chat would call a real model. "
+                    "Set LLM_PROVIDER=mock or pass --allow-real-llm."
+                )
+            self.new_session = lambda: _LocalSession(owner)
+
+        self.stdout.write(
+            f"mode={'live ' + opts['base_url'] if live else 'in-process'} scenarios={','.join(scenarios)} "
+            f"requests={opts['requests']} concurrency={opts['concurrency']}"
+        )
+
+        # test client ใช้ host "testserver"
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for name in scenarios:
+                # หา conversation ตอนถึง chat (upload ที่รันก่อนหน้าอาจเพิ่งสร้างเอกสารให้)
+                chat_path = self._chat_path(owner, opts["doc_id"]) if name == "chat" else ""
+                self._run(name, opts["requests"], opts["concurrency"], chat_path)
+
+        self.stdout.write("Done.")
+
+    # -------------------------
+    # scenarios
+    # -------------------------
+    def _chat_path(self, owner, doc_id):
+        if doc_id is None:
+            if owner is None:
+                raise CommandError("--doc-id is required in live mode for the chat scenario")
+            doc = Document.objects.filter(owner=owner, status="done").order_by("-id").first()
+            if doc is None:
+                raise CommandError("No processed document to chat with (run the upload scenario first or pass --doc-id).")
+            doc_id = doc.id
+
+        s = self.new_session()
+        try:
+            status, location = s.get(reverse("documents:chat_document", kwargs={"pk": doc_id}))
+        finally:
+            s.close()
+        m = re.search(r"/chat/(\d+)/", location or "")
+        if status != 302 or not m:
+            raise CommandError(f"Cannot open chat for document {doc_id} (status {status}).")
+        return reverse("documents:chat_stream_api", kwargs={"conv_id": int(m.group(1))})
+
+    def _one(self, name, session, i, chat_path):
+        """
+        คืน (ok, latency_s, ttft_s)
+        """
+        t0 = time.time()
+        if name == "upload":
+            body = _synthetic_text(random.Random(self.seed * 100_003 + i)).encode("utf-8")
+            status = session.upload(reverse("documents:upload"), f"{LOADTEST_PREFIX}{uuid.uuid4().hex[:8]}.txt", body)
+            # upload สำเร็จ redirect (302); form ไม่ผ่าน validation render หน้าเดิมด้วย 200
+            return status == 302, time.time() - t0, None
+
+        if name == "search":
+            q = self.queries[i % len(self.queries)]
+            status, _ = session.get(reverse("documents:search_api"), {"q": q})
+            return status == 200, time.time() - t0, None
+
+        status, ttft, event = session.stream(chat_path, {
+            "message": CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)],
+            "request_id": uuid.uuid4().hex,
+        })
+        # สำเร็จ = ได้ event: done (mock error / throttle ที่ฉีดเข้าไปจะมาเป็น event: error)
+        return status == 200 and event == "done", time.time() - t0, ttft
+
+    def _run(self, name, n, concurrency, chat_path):
+        local = threading.local()
+        sessions = []
+        lock = threading.Lock()
+
+        def task(i):
+            if not hasattr(local, "session"):
+                local.session = self.new_session()
+                with lock:
+                    sessions.append(local.session)
+            try:
+                return self._one(name, local.session, i, chat_path)
+            except Exception as e:
+                self.stderr.write(f"{name}#{i}: {e}")
+                return False, 0.0, None
+
+        t0 = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            results = list(pool.map(task, range(n)))
+        wall = time.time() - t0
+        for s in sessions:
+            s.close()
+
+        lat = [r[1] * 1000 for r in results if r[0]]
+        ttft = [r[2] * 1000 for r in results if r[0] and r[2] is not None]
+        errors = sum(1 for r in results if not r[0])
+        line = (
+            f"{name:<7} n={n} ok={n - errors} err={errors} wall={wall:.1f}s rps={n / wall if wall else 0:.1f} "
+            f"p50={_pct(lat, 50):.0f}ms p95={_pct(lat, 95):.0f}ms p99={_pct(lat, 99):.0f}ms "
+            f"mean={statistics.mean(lat) if lat else 0:.0f}ms"
+        )
+        if ttft:
+            line += f" ttft_p50={_pct(ttft, 50):.0f}ms ttft_p95={_pct(ttft, 95):.0f}ms"
+        self.stdout.write(line)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from documents.models import Document, CombinedSummary
+from documents.services.search.suggest import index_document_terms, index_notebook_terms
+from documents.services.search.search_cache import bump_generation
+
+class Command(BaseCommand):
+    help = "Rebuild the autocomplete prefix index (SuggestTerm) for documents and notebooks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner-id", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        docs = Document.objects.all().order_by("id")
+        notebooks = CombinedSummary.objects.all().order_by("id")
+        owner_id = opts.get("owner_id")
+        if owner_id:
+            docs = docs.filter(owner_id=owner_id)
+            notebooks = notebooks.filter(owner_id=owner_id)
+
+        total = docs.count()
+        self.stdout.write(f"Indexing suggest terms for {total} documents...")
+
+        owners = set()
+        for i, d in enumerate(docs.only("id", "owner_id", "file_name", "extracted_text").iterator(chunk_size=200), start=1):
+            index_document_terms(d, d.extracted_text)
+            owners.add(d.owner_id)
+            if i % 200 == 0:
+                self.stdout.write(f"  {i}/{total}")
+
+        for cs in notebooks.only("id", "owner_id", "title").iterator(chunk_size=200):
+            index_notebook_terms(cs)
+
+        for uid in owners:
+            bump_generation(uid)
+
+        self.stdout.write("Done.")
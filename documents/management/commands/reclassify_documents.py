@@ -0,0 +1,83 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Substr
+
+from documents.models import Document
+from documents.services.analysis.classifier import classify_batch_with_source, _excerpt_chars
+from documents.services.search.search_cache import bump_generation
+from documents.services.storage.file_organizer import move_document_file_to_type_folder
+
+
+class Command(BaseCommand):
+    help = "Reclassify documents in batches (several documents per LLM request)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner-id", type=int, default=None)
+        parser.add_argument("--type", dest="dtype", default="", help="only documents currently of this type")
+        parser.add_argument("--chunk", type=int, default=200, help="documents loaded per round")
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--move-files", action="store_true", help="also move changed files to their type folder")
+        parser.add_argument("--llm-only", action="store_true", help="skip the local classifier (e.g. to relabel training data)")
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        docs = Document.objects.filter(status="done").order_by("owner_id", "id")
+        if opts["owner_id"]:
+            docs = docs.filter(owner_id=opts["owner_id"])
+        if opts["dtype"]:
+            docs = docs.filter(document_type=opts["dtype"])
+
+        total = docs.count()
+        self.stdout.write(f"Reclassifying {total} documents...")
+
+        # โหลดแค่ส่วนต้นของ extracted_text ที่ classifier ใช้จริง
+        rows = docs.annotate(excerpt=Substr("extracted_text", 1, _excerpt_chars())).values_list(
+            "id", "owner_id", "document_type", "type_source", "excerpt"
+        )
+
+        t0 = time.perf_counter()
+        done = changed = 0
+        owners = {}
+        buf = []
+
+        def flush():
+            nonlocal changed
+            by_owner = {}
+            for r in buf:
+                by_owner.setdefault(r[1], []).append(r)
+            for owner_id, items in by_owner.items():
+                owner = owners.get(owner_id)
+                if owner is None:
+                    owner = owners[owner_id] = User.objects.filter(pk=owner_id).first()
+                labels = classify_batch_with_source([r[4] for r in items], owner=owner, use_local=not opts["llm_only"])
+
+                # จัดกลุ่มตาม (label, source): label เดิมแต่ source เปลี่ยน (เช่น --llm-only ยืนยันคำตอบ local) ก็ต้องบันทึก
+                moves, relabeled = {}, 0
+                for (doc_id, _, old, old_source, _), new in zip(items, labels):
+                    if new != (old, old_source):
+                        moves.setdefault(new, []).append(doc_id)
+                        relabeled += new[0] != old
+                changed += relabeled
+                for (label, source), ids in moves.items():
+                    if not opts["dry_run"]:
+                        Document.objects.filter(id__in=ids).update(document_type=label, type_source=source)
+                        if opts["move_files"]:
+                            for d in Document.objects.filter(id__in=ids).only("id", "owner_id", "file", "document_type"):
+                                move_document_file_to_type_folder(d)
+                if relabeled and not opts["dry_run"]:
+                    bump_generation(owner_id)
+            buf.clear()
+
+        for r in rows.iterator(chunk_size=opts["chunk"]):
+            buf.append(r)
+            done += 1
+            if len(buf) >= opts["chunk"]:
+                flush()
+                self.stdout.write(f"  {done}/{total}")
+        if buf:
+            flush()
+
+        verb = "would change" if opts["dry_run"] else "changed"
+        self.stdout.write(f"Done: {done} documents, {verb} {changed}, {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from documents.services.search.search_cache import stats, reset_stats
+
+class Command(BaseCommand):
+    help = "Show hit/miss metrics of the search response cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true")
+
+    def handle(self, *args, **opts):
+        s = stats()
+        self.stdout.write(
+            f"hits={s['hits']} misses={s['misses']} skipped={s['skipped']} hit_ratio={s['hit_ratio']:.2%}"
+        )
+        if opts["reset"]:
+            reset_stats()
+            self.stdout.write("Counters reset.")
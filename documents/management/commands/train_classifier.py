@@ -0,0 +1,141 @@
+import random, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from documents.models import Document
+from documents.services.analysis import local_classifier
+from documents.services.analysis.classifier import LABELS
+
+THRESHOLDS = (0.5, 0.7, 0.8, 0.9, 0.95, 0.99)
+TEMPERATURES = (0.5, 1, 2, 3, 5, 8, 12, 20, 30, 50, 80)
+
+
+def _fit(np, docs, labels, dim, alpha):
+    """
+    multinomial naive Bayes: docs = [(label index, idx array, weight array)]
+    """
+    counts = np.zeros((len(labels), dim), dtype=np.float64)
+    n = np.zeros(len(labels), dtype=np.float64)
+    for y, idx, w in docs:
+        np.add.at(counts[y], idx, w)
+        n[y] += 1
+    log_prob = np.log(counts + alpha) - np.log(counts.sum(axis=1, keepdims=True) + alpha * dim)
+    log_prior = np.log(n / n.sum())
+    return log_prior, log_prob
+
+
+def _scores(model, docs):
+    return [(y, model.scores(idx, w)) for y, idx, w in docs]
+
+
+def _log_loss(np, model, scored, t):
+    return -sum(float(np.log(model.posterior(s, t)[y] + 1e-12)) for y, s in scored) / max(1, len(scored))
+
+
+class Command(BaseCommand):
+    help = "Train the local document classifier (hashed n-grams + naive Bayes) from LLM-assigned document types"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner-id", type=int, default=None)
+        parser.add_argument("--limit", type=int, default=50000)
+        parser.add_argument("--min-docs", type=int, default=200)
+        parser.add_argument(
+            "--min-per-label", type=int, default=20,
+            help="labels with fewer docs are left out of the model (it never predicts them; their documents may be "
+                 "confidently assigned to a trained label, so check the holdout report)",
+        )
+        parser.add_argument(
+            "--include-unknown", action="store_true",
+            help="also train on documents with no recorded label source (classified before type_source existed); "
+                 "only safe if no local model was in use back then",
+        )
+        parser.add_argument("--holdout", type=float, default=0.2)
+        parser.add_argument("--dim", type=int, default=local_classifier.DEFAULT_DIM)
+        parser.add_argument("--max-chars", type=int, default=local_classifier.DEFAULT_MAX_CHARS)
+        parser.add_argument("--alpha", type=float, default=0.1, help="additive smoothing")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError("numpy is required to train the local classifier (pip install numpy).")
+
+        # เฉพาะ label ที่ LLM ให้ -> ไม่เอาคำตอบของ local model มา train ตัวเองซ้ำ (ดู Document.type_source)
+        sources = ["llm", ""] if opts["include_unknown"] else ["llm"]
+        docs = Document.objects.filter(status="done", document_type__in=LABELS, type_source__in=sources).exclude(extracted_text="")
+        if opts["owner_id"]:
+            docs = docs.filter(owner_id=opts["owner_id"])
+        # โหลดแค่ส่วนต้นของ extracted_text ที่ model ใช้จริง
+        rows = (
+            docs.order_by("-id")
+            .annotate(excerpt=Substr("extracted_text", 1, opts["max_chars"]))
+            .values_list("document_type", "excerpt")[: opts["limit"]]
+        )
+
+        t0 = time.perf_counter()
+        dim, max_chars = opts["dim"], opts["max_chars"]
+        by_label = {}
+        for label, text in rows.iterator(chunk_size=500):
+            f = local_classifier.features(text, dim=dim, max_chars=max_chars)
+            if not f:
+                continue
+            idx = np.fromiter(f.keys(), dtype=np.int64, count=len(f))
+            w = np.log1p(np.fromiter(f.values(), dtype=np.float64, count=len(f)))
+            by_label.setdefault(label, []).append((idx, w))
+        load_s = time.perf_counter() - t0
+
+        labels = sorted(k for k, v in by_label.items() if len(v) >= opts["min_per_label"])
+        skipped = {k: len(v) for k, v in by_label.items() if k not in labels}
+        total = sum(len(by_label[k]) for k in labels)
+        self.stdout.write(f"docs={total} labels={len(labels)} features={load_s:.1f}s")
+        for k in labels:
+            self.stdout.write(f"  {k:<13} {len(by_label[k])}")
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"  too few examples (not in the model): {skipped}"))
+        if total < opts["min_docs"] or len(labels) < 2:
+            raise CommandError(f"Only {total} usable documents in {len(labels)} labels (need --min-docs={opts['min_docs']}).")
+
+        rnd = random.Random(opts["seed"])
+        train, test = [], []
+        for y, k in enumerate(labels):
+            for idx, w in by_label[k]:
+                (test if rnd.random() < opts["holdout"] else train).append((y, idx, w))
+
+        # fit บน train -> เลือก temperature ที่ log loss ของ holdout ต่ำสุด -> รายงาน accuracy / coverage
+        model = local_classifier.Model(labels, *_fit(np, train, labels, dim, opts["alpha"]), max_chars=max_chars)
+        scored = _scores(model, test)
+        temperature = min(TEMPERATURES, key=lambda t: _log_loss(np, model, scored, t)) if scored else 1.0
+        model.temperature = temperature
+
+        t1 = time.perf_counter()
+        post = [(y, model.posterior(s)) for y, s in scored]
+        per_doc_us = (time.perf_counter() - t1) / max(1, len(post)) * 1e6
+        correct = sum(1 for y, p in post if int(p.argmax()) == y)
+        self.stdout.write(
+            f"holdout={len(post)} accuracy={100.0 * correct / max(1, len(post)):.1f}% "
+            f"temperature={temperature} scoring={per_doc_us:.0f}us/doc"
+        )
+        for th in THRESHOLDS:
+            kept = [(y, p) for y, p in post if float(p.max()) >= th]
+            ok = sum(1 for y, p in kept if int(p.argmax()) == y)
+            mark = " <- LOCAL_CLASSIFIER_THRESHOLD" if th == local_classifier.threshold() else ""
+            self.stdout.write(
+                f"  conf>={th:<5} coverage={100.0 * len(kept) / max(1, len(post)):.1f}% "
+                f"accuracy={100.0 * ok / max(1, len(kept)):.1f}%{mark}"
+            )
+
+        if opts["dry_run"]:
+            return
+
+        # model ที่บันทึก fit จากข้อมูลทั้งหมด (temperature จาก holdout)
+        final = local_classifier.Model(
+            labels, *_fit(np, train + test, labels, dim, opts["alpha"]), temperature=temperature, max_chars=max_chars,
+        )
+        path = local_classifier.save_model(final, {
+            "docs": total, "accuracy": round(correct / max(1, len(post)), 4), "trained_at": timezone.now().isoformat(),
+        })
+        self.stdout.write(self.style.SUCCESS(f"Saved {path}"))
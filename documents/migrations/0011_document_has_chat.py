@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 09:44
+
+from django.db import migrations, models
+
+
+def backfill_has_chat(apps, schema_editor):
+    Document = apps.get_model("documents", "Document")
+    Conversation = apps.get_model("documents", "Conversation")
+    doc_ids = Conversation.objects.filter(document__isnull=False).values("document_id")
+    Document.objects.filter(id__in=doc_ids).update(has_chat=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_message_edited_from_message_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='has_chat',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_has_chat, migrations.RunPython.noop),
+    ]
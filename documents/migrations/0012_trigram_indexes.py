@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-19 09:45
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_document_has_chat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='combinedsummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='combined_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='combinedsummary',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='combined_title_upper_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='combinedsummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['combined_summary'], name='combined_summary_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['file_name'], name='doc_file_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('file_name'), name='gin_trgm_ops'), name='doc_file_name_upper_trgm'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 09:47
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0012_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('file', 'File'), ('notebook', 'Notebook'), ('term', 'Term')], max_length=10)),
+                ('term', models.CharField(max_length=64)),
+                ('display', models.CharField(max_length=255)),
+                ('weight', models.IntegerField(default=1)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='suggest_terms', to='documents.document')),
+                ('notebook', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='suggest_terms', to='documents.combinedsummary')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggest_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(models.F('owner'), django.contrib.postgres.indexes.OpClass(models.F('term'), name='text_pattern_ops'), name='suggest_owner_term_prefix')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 09:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0013_suggestterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('purpose', models.CharField(blank=True, max_length=50)),
+                ('provider', models.CharField(blank=True, max_length=30)),
+                ('model_id', models.CharField(blank=True, max_length=255)),
+                ('response', models.TextField()),
+                ('input_tokens', models.IntegerField(default=0)),
+                ('output_tokens', models.IntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='cache_hit',
+            field=models.BooleanField(default=False),
+        ),
+    ]
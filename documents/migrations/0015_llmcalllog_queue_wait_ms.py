@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0014_llm_response_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='queue_wait_ms',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0015_llmcalllog_queue_wait_ms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='input_profile',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 10:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0016_llmcalllog_input_profile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='llmcalllog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
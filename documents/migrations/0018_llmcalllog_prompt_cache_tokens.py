@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0017_llmcalllog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='cache_read_tokens',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='cache_write_tokens',
+            field=models.IntegerField(default=0),
+        ),
+    ]
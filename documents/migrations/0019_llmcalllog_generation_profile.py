@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0018_llmcalllog_prompt_cache_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='gen_params',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='profile',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='stop_reason',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-19 10:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0019_llmcalllog_generation_profile'),
+    ]
+
+    operations = [
+        # notebook ที่มีอยู่แล้วไม่รู้ว่าผู้ใช้ตั้งชื่อเองหรือไม่ -> คงชื่อเดิมไว้ (False); notebook ใหม่ค่าเริ่มต้น True
+        migrations.AddField(
+            model_name='combinedsummary',
+            name='auto_title',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='combinedsummary',
+            name='auto_title',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='combinedsummary',
+            name='summary_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='CombinedSummaryNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('input_hash', models.CharField(max_length=64)),
+                ('output', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notebook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nodes', to='documents.combinedsummary')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('notebook', 'input_hash'), name='combined_node_notebook_hash')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0020_combined_summary_nodes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='lang',
+            field=models.CharField(blank=True, default='', max_length=2),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='thai_ratio',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='documentchunk',
+            name='lang',
+            field=models.CharField(blank=True, default='', max_length=2),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0021_language_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='type_source',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 10:32
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0022_document_type_source'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='combinedsummary',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('combined_summary'), name='gin_trgm_ops'), name='combined_summary_upper_trgm'),
+        ),
+    ]
@@ -1,9 +1,11 @@
 import os
 from django.conf import settings
 from django.db import models
+from django.db.models import F
 from django.core.exceptions import ValidationError
 from django.contrib.postgres.search import SearchVectorField
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from django.utils.timezone import now
 
 def upload_to_document(instance, filename):
@@ -33,11 +35,21 @@ class Document(models.Model):
     word_count = models.IntegerField(default=0)
     char_count = models.IntegerField(default=0)
 
+    # ภาษาของ extracted_text คำนวณครั้งเดียวตอน ingest ("" = ยังไม่คำนวณ ดู backfill_language)
+    lang = models.CharField(max_length=2, blank=True, default="")
+    thai_ratio = models.FloatField(default=0.0)
+
     status = models.CharField(max_length=20, default="queued")
     error = models.TextField(blank=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
     document_type = models.CharField(max_length=50, default="other")
+    # ใครให้ document_type: "llm" / "local" (local classifier) / "" (ไม่ทราบ: ก่อนมี field นี้ หรือ LLM ล้มแล้วตกเป็น other)
+    # train_classifier ใช้เฉพาะ "llm" -> model ไม่ได้เรียนจากคำตอบของตัวเอง
+    type_source = models.CharField(max_length=10, blank=True, default="")
+
+    # denormalized: มี Conversation ผูกกับเอกสารนี้แล้วหรือยัง (ไม่ต้อง Exists ต่อแถวในหน้า list)
+    has_chat = models.BooleanField(default=False)
     
     search_vector = SearchVectorField(null=True, blank=True)
 
@@ -46,6 +58,8 @@ class Document(models.Model):
     class Meta:
         indexes = [
             GinIndex(fields=["search_vector"], name="doc_search_vector_gin"),
+            GinIndex(fields=["file_name"], name="doc_file_name_trgm", opclasses=["gin_trgm_ops"]),
+            GinIndex(OpClass(Upper("file_name"), name="gin_trgm_ops"), name="doc_file_name_upper_trgm"),
         ]
 
     def __str__(self):
@@ -66,11 +80,44 @@ class CombinedSummary(models.Model):
     doc_count = models.IntegerField(default=0)
     total_words = models.IntegerField(default=0)
 
+    # False = ผู้ใช้ตั้งชื่อเอง -> ไม่สร้าง title ใหม่ตอนเอกสารในชุดเปลี่ยน
+    auto_title = models.BooleanField(default=True)
+    # hash ของ input ชั้นบนสุดของ reduce tree (เหมือนเดิม = ไม่ต้องสรุปใหม่)
+    summary_hash = models.CharField(max_length=64, blank=True, default="")
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=["title"], name="combined_title_trgm", opclasses=["gin_trgm_ops"]),
+            GinIndex(OpClass(Upper("title"), name="gin_trgm_ops"), name="combined_title_upper_trgm"),
+            GinIndex(fields=["combined_summary"], name="combined_summary_trgm", opclasses=["gin_trgm_ops"]),
+            GinIndex(OpClass(Upper("combined_summary"), name="gin_trgm_ops"), name="combined_summary_upper_trgm"),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.doc_count} docs)"
     
+class CombinedSummaryNode(models.Model):
+    """
+    node กลางของ reduce tree ของ combined summary: output ของกลุ่มหนึ่ง memo ด้วย hash ของ input
+    เอกสารในชุดเปลี่ยน -> สรุปใหม่เฉพาะกลุ่มที่ input เปลี่ยน (กิ่งที่กระทบ + root)
+    """
+    notebook = models.ForeignKey(CombinedSummary, on_delete=models.CASCADE, related_name="nodes")
+    level = models.PositiveSmallIntegerField()
+    input_hash = models.CharField(max_length=64)
+    output = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["notebook", "input_hash"], name="combined_node_notebook_hash"),
+        ]
+
+    def __str__(self):
+        return f"{self.notebook_id}:L{self.level}:{self.input_hash[:8]}"
+
+
 class Conversation(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -162,19 +209,52 @@ class LLMCallLog(models.Model):
     error = models.TextField(blank=True)
 
     latency_ms = models.IntegerField(default=0)
+    input_tokens = models.IntegerField(default=0)  # รวมส่วนที่อ่าน/เขียน prompt cache ของ provider แล้ว
+    output_tokens = models.IntegerField(default=0)
+    cache_read_tokens = models.IntegerField(default=0)  # input ที่ provider อ่านจาก prompt cache (Bedrock)
+    cache_write_tokens = models.IntegerField(default=0)  # input ที่ถูกเขียนลง prompt cache ใน call นี้
+    profile = models.CharField(max_length=50, blank=True)  # generation profile (profiles.py)
+    gen_params = models.JSONField(null=True, blank=True)  # ค่าจริงที่ใช้: model tier / max_tokens / temperature / stop / timeout
+    stop_reason = models.CharField(max_length=30, blank=True)  # end_turn / max_tokens / stop_sequence (ตามที่ provider คืน)
+    cache_hit = models.BooleanField(default=False)  # ตอบจาก LLMResponseCache (ไม่ได้เรียก model จริง)
+    queue_wait_ms = models.IntegerField(default=0)  # เวลารอใน limiter ก่อนได้ส่ง request
+    # จำนวนตัวอักษรต่อ class ของ input (ไทย/ละติน/ตัวเลข/...) เฉพาะ call ที่ provider คืน usage จริง -> ใช้ calibrate token estimator
+    input_profile = models.JSONField(null=True, blank=True)
+
+    # ใส่เวลาตอนเกิด call (writer ใน call_log.py flush ทีหลังเป็น batch)
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class LLMResponseCache(models.Model):
+    """
+    cache คำตอบของ LLM แบบ content-addressed (key = sha256 ของ provider/model/prompt/params)
+    last_used_at ใช้ทำ LRU
+    """
+    key = models.CharField(max_length=64, unique=True)
+    purpose = models.CharField(max_length=50, blank=True)
+    provider = models.CharField(max_length=30, blank=True)
+    model_id = models.CharField(max_length=255, blank=True)
+
+    response = models.TextField()
     input_tokens = models.IntegerField(default=0)
     output_tokens = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=now, db_index=True)
 
-    class Meta:
-        ordering = ["-created_at"]
+    def __str__(self):
+        return f"{self.purpose}:{self.key[:12]}"
         
         
 class DocumentChunk(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="chunks")
     idx = models.IntegerField()
     content = models.TextField()
+    lang = models.CharField(max_length=2, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -183,3 +263,36 @@ class DocumentChunk(models.Model):
 
     def __str__(self):
         return f"{self.document_id}#{self.idx}"
+
+
+class SuggestTerm(models.Model):
+    """
+    prefix index สำหรับ autocomplete (ต่อ user)
+    term = คำที่ normalize แล้ว (lowercase) ใช้ค้นแบบ LIKE 'prefix%'
+    """
+    KIND_CHOICES = [
+        ("file", "File"),
+        ("notebook", "Notebook"),
+        ("term", "Term"),
+    ]
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="suggest_terms")
+    document = models.ForeignKey(
+        Document, null=True, blank=True, on_delete=models.CASCADE, related_name="suggest_terms"
+    )
+    notebook = models.ForeignKey(
+        CombinedSummary, null=True, blank=True, on_delete=models.CASCADE, related_name="suggest_terms"
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    term = models.CharField(max_length=64)
+    display = models.CharField(max_length=255)
+    weight = models.IntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(F("owner"), OpClass(F("term"), name="text_pattern_ops"), name="suggest_owner_term_prefix"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.term}"
@@ -1,13 +1,34 @@
 from __future__ import annotations
-from documents.services.llm.client import generate_text, LLMError
+import logging, re
+
+from django.conf import settings
+
+from documents.services.analysis import local_classifier
+from documents.services.llm.client import generate_text, LLMError, _estimate_tokens, _estimate_prompt_tokens
+from documents.services.llm.token_ledger import budget_for, get_remaining
+
+logger = logging.getLogger(__name__)
 
 LABELS = ["invoice","announcement","policy","proposal","report","research","resume","other"]
 DOC_TYPES = set(LABELS)
 
-def classify_text(text: str, *, owner=None) -> str:
+def classify_text(text: str, *, owner=None, use_local: bool = True) -> str:
+    return classify_text_with_source(text, owner=owner, use_local=use_local)[0]
+
+
+def classify_text_with_source(text: str, *, owner=None, use_local: bool = True) -> tuple[str, str]:
+    """
+    คืน (label, source) source = "llm" / "local" / "" (ข้อความว่าง หรือ LLM ล้มแล้วตกเป็น other)
+    """
     clean = (text or "").strip()
     if not clean:
-        return "other"
+        return "other", ""
+
+    # model ในเครื่องมั่นใจพอ -> ไม่ต้องเสีย LLM call
+    if use_local:
+        label = local_classifier.confident_label(clean)
+        if label in DOC_TYPES:
+            return label, "local"
 
     clean = clean[:8000]
 
@@ -27,6 +48,129 @@ DOCUMENT:
     try:
         out = (generate_text(system, user, owner=owner, purpose="classify") or "").lower().strip()
         out = out.strip().strip(" .,:;\"'")
-        return out if out in DOC_TYPES else "other"
+        return (out, "llm") if out in DOC_TYPES else ("other", "")
     except LLMError:
-        return "other"
\ No newline at end of file
+        return "other", ""
+
+
+# -------------------------
+# batch
+# -------------------------
+BATCH_SYSTEM = "You are a strict document classifier. You label many documents at once."
+# "3: invoice", "[3] invoice", "3) Invoice", "#3 - invoice"
+ANSWER_LINE = re.compile(r"^\W*(\d+)\W+([a-z]+)", re.M)
+SLOT_OUTPUT_TOKENS = 6  # "12: announcement\n"
+
+
+def _excerpt_chars() -> int:
+    return int(getattr(settings, "CLASSIFY_BATCH_EXCERPT_CHARS", 1500))
+
+def _max_items() -> int:
+    return max(1, int(getattr(settings, "CLASSIFY_BATCH_MAX_ITEMS", 20)))
+
+def _max_input_tokens() -> int:
+    return int(getattr(settings, "CLASSIFY_BATCH_MAX_INPUT_TOKENS", 6000))
+
+
+def _batch_prompt(excerpts: list[str]) -> str:
+    slots = "\n\n".join(f"[{i}]\n{t}" for i, t in enumerate(excerpts, start=1))
+    return f"""
+Classify each numbered document into one of these labels:
+{", ".join(LABELS)}
+
+Rules:
+- Reply with exactly one line per document, in order: "<number>: <label>"
+- Use only the labels above.
+- No extra text.
+
+DOCUMENTS:
+{slots}
+"""
+
+
+def parse_batch_answer(raw: str, n: int) -> list[str | None]:
+    """
+    คืน label ต่อ slot (None = slot นั้น parse ไม่ได้ -> ให้ caller fallback ทีละตัว)
+    """
+    out: list[str | None] = [None] * n
+    for m in ANSWER_LINE.finditer((raw or "").lower()):
+        i = int(m.group(1)) - 1
+        label = m.group(2)
+        if 0 <= i < n and out[i] is None and label in DOC_TYPES:
+            out[i] = label
+    return out
+
+
+def _token_cap(owner) -> int:
+    # ถ้ามี budget ต่อวัน อย่าส่ง batch ที่ใหญ่เกินกว่างบที่เหลือ
+    cap = _max_input_tokens()
+    if owner and getattr(owner, "id", None) and budget_for("classify") > 0:
+        cap = min(cap, get_remaining(owner.id, "classify"))
+    return cap
+
+
+def plan_batches(excerpts: list[str], *, owner=None) -> list[list[int]]:
+    """
+    แบ่ง index เป็น batch โดยรวม token (input + output ของทุก slot) ไม่เกิน cap และไม่เกิน CLASSIFY_BATCH_MAX_ITEMS
+    """
+    cap = _token_cap(owner)
+    overhead = _estimate_prompt_tokens(BATCH_SYSTEM, _batch_prompt([]))
+    batches, cur, used = [], [], overhead
+    for i, t in enumerate(excerpts):
+        cost = _estimate_tokens(t) + SLOT_OUTPUT_TOKENS + 2
+        if cur and (len(cur) >= _max_items() or used + cost > cap):
+            batches.append(cur)
+            cur, used = [], overhead
+        cur.append(i)
+        used += cost
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def classify_batch(texts: list[str], *, owner=None, use_local: bool = True) -> list[str]:
+    return [label for label, _ in classify_batch_with_source(texts, owner=owner, use_local=use_local)]
+
+
+def classify_batch_with_source(texts: list[str], *, owner=None, use_local: bool = True) -> list[tuple[str, str]]:
+    """
+    จัดประเภทหลายเอกสารใน LLM call เดียว (slot มีหมายเลข)
+    slot ที่ local classifier มั่นใจแล้วไม่ส่งเข้า LLM
+    slot ไหนคำตอบหาย/ผิดรูปแบบ -> classify_text ทีละตัวเฉพาะ slot นั้น
+    """
+    excerpts = [(t or "").strip()[:_excerpt_chars()] for t in texts]
+    results: list[tuple[str, str] | None] = [("other", "") if not e else None for e in excerpts]
+    if use_local:
+        for i, t in enumerate(texts):
+            if results[i] is None:
+                label = local_classifier.confident_label(t)
+                results[i] = (label, "local") if label else None
+    todo = [i for i, e in enumerate(excerpts) if e and results[i] is None]
+
+    for batch in plan_batches([excerpts[i] for i in todo], owner=owner):
+        idx = [todo[j] for j in batch]
+        if len(idx) == 1:
+            results[idx[0]] = classify_text_with_source(texts[idx[0]], owner=owner, use_local=False)
+            continue
+
+        try:
+            raw = generate_text(
+                BATCH_SYSTEM, _batch_prompt([excerpts[i] for i in idx]), owner=owner, purpose="classify",
+                profile="classify_batch", max_tokens=SLOT_OUTPUT_TOKENS * len(idx) + 16,
+            )
+            labels = parse_batch_answer(raw, len(idx))
+        except LLMError as e:
+            logger.warning("batch classify failed (%s items): %s", len(idx), e)
+            labels = [None] * len(idx)
+
+        missing = 0
+        for i, label in zip(idx, labels):
+            if label is None:
+                missing += 1
+                results[i] = classify_text_with_source(texts[i], owner=owner, use_local=False)
+            else:
+                results[i] = (label, "llm")
+        if missing:
+            logger.info("batch classify: %s/%s slots fell back to single calls", missing, len(idx))
+
+    return [r or ("other", "") for r in results]
@@ -1,55 +1,192 @@
 from __future__ import annotations
-import logging
-from typing import List, Tuple
+import hashlib, logging, zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Sequence, Tuple, TypeVar
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import Substr
 
 logger = logging.getLogger(__name__)
 
 from .summarizer import summarize_text
+from .extractive import select, similarity
 from .lang_detect import detect_language
 from .title_generator import generate_title
 from documents.services.llm.client import generate_text, LLMError
-from documents.models import Document
+from documents.services.llm.tokens import estimate_tokens, chars_for_tokens
+from documents.models import CombinedSummaryNode, Document
 
-def _pick_language(docs: List[Document]) -> str:
-    votes = {"th": 0, "en": 0}
-    for d in docs:
-        txt = (d.summary or d.extracted_text or "").strip()
-        votes[detect_language(txt)] += 1
-    return "th" if votes["th"] >= votes["en"] else "en"
+T = TypeVar("T")
+
+# -------------------------
+# combined summary แบบ map-reduce หลายชั้น
+# - map: summary ของแต่ละไฟล์ (ไฟล์ที่ยังไม่มี summary -> สรุปให้ขนานกันแล้วเก็บลง Document)
+# - reduce: แบ่ง item เป็นกลุ่มตามงบ token -> สรุปแต่ละกลุ่มขนานกัน -> ทำซ้ำทีละชั้นจนเหลือกลุ่มเดียว
+# - ชั้นบนสุด: ได้ combined summary (4-6 bullets) + title พร้อมกัน
+# โหลดเฉพาะคอลัมน์ที่ใช้ (ไม่โหลด extracted_text ทั้งก้อน)
+#
+# incremental (refresh_notebook): output ของแต่ละกลุ่มเก็บเป็น CombinedSummaryNode memo ด้วย hash ของ input
+# รอยต่อกลุ่มกำหนดจาก hash ของ key (doc id) ไม่ใช่ตำแหน่ง -> เพิ่ม/ลบเอกสารกระทบแค่กลุ่มของมันกับ root
+# -------------------------
+
+MAX_LEVELS = 6
+FALLBACK_TEXT = "(combined summary not available: quota reached)"
+
+FINAL_SYSTEM = "You summarize multiple documents into one consolidated summary."
+PARTIAL_SYSTEM = "You condense groups of document summaries without losing key facts."
+
+
+def _concurrency() -> int:
+    return max(1, int(getattr(settings, "COMBINED_SUMMARY_CONCURRENCY", 4)))
+
+
+def _group_tokens() -> int:
+    return max(500, int(getattr(settings, "COMBINED_REDUCE_INPUT_TOKENS", 4000)))
+
+
+def _group_size() -> int:
+    return max(2, int(getattr(settings, "COMBINED_REDUCE_GROUP_SIZE", 8)))
 
-def build_combined_summary(docs: List[Document], *, owner=None) -> str:
+
+def _in_thread(fn: Callable[..., T], *args) -> T:
+    # แต่ละ thread เปิด DB connection ของตัวเอง (token ledger / call log) -> ปิดเมื่อจบงาน
+    try:
+        return fn(*args)
+    finally:
+        connection.close()
+
+
+def _parallel(fn: Callable[..., T], items: Sequence) -> List[T]:
+    if len(items) <= 1 or _concurrency() == 1:
+        return [fn(x) for x in items]
+    with ThreadPoolExecutor(max_workers=min(_concurrency(), len(items)), thread_name_prefix="combined") as pool:
+        return list(pool.map(lambda x: _in_thread(fn, x), items))
+
+
+def _lang_instruction(lang: str) -> str:
+    return "Write in Thai." if lang == "th" else "Write in English."
+
+
+# -------------------------
+# map
+# -------------------------
+def _doc_rows(docs) -> List[dict]:
     """
-    Map-Reduce summary:
-    - map: ใช้ summary ของแต่ละไฟล์ (ถ้าไม่มี ให้สรุปจาก extracted_text)
-    - reduce: รวม map summaries แล้วสรุปภาพรวมอีกครั้ง
+    docs: Document หรือ id -> [{"id", "file_name", "summary", "word_count", "lang"}] เรียงตาม id (เอกสารใหม่ต่อท้าย)
     """
-    if not docs:
-        return ""
+    ids = [getattr(d, "id", d) for d in docs]
+    return list(
+        Document.objects.filter(id__in=ids).order_by("id").values("id", "file_name", "summary", "word_count", "lang")
+    )
+
+
+def _fill_missing_summaries(rows: List[dict], *, owner=None) -> None:
+    missing = [r for r in rows if not (r["summary"] or "").strip()]
+    if not missing:
+        return
 
-    # Map
-    per_doc_summaries: List[str] = []
-    for d in docs:
-        s = (d.summary or "").strip()
-        if not s:
-            raw = (d.extracted_text or "").strip().replace("\n", " ")
-            s = (raw[:400] + "…") if raw else ""
+    max_chars = int(getattr(settings, "SUMMARY_INPUT_MAX_CHARS", 12000)) * 4
+    excerpts = dict(
+        Document.objects.filter(id__in=[r["id"] for r in missing])
+        .annotate(excerpt=Substr("extracted_text", 1, max_chars))
+        .values_list("id", "excerpt")
+    )
 
+    def one(r):
+        text = (excerpts.get(r["id"]) or "").strip()
+        return summarize_text(text, owner=owner, lang=r["lang"]) if text else ""
+
+    for r, s in zip(missing, _parallel(one, missing)):
+        r["summary"] = s
         if s:
-            per_doc_summaries.append(f"- {d.file_name}: {s}")
+            Document.objects.filter(id=r["id"], summary="").update(summary=s)
+
+
+def _pick_language(rows: List[dict]) -> str:
+    # ใช้ Document.lang ที่คำนวณไว้ตอน ingest; เอกสารเก่าที่ยังไม่มีค่า -> ตรวจจาก summary
+    votes = {"th": 0, "en": 0}
+    for r in rows:
+        votes[r.get("lang") or detect_language(r["summary"] or "")] += 1
+    return "th" if votes["th"] >= votes["en"] else "en"
+
+
+# -------------------------
+# reduce
+# -------------------------
+Item = Tuple[str, str]  # (key, text): key คงที่ต่อเอกสาร/กิ่ง ใช้กำหนดรอยต่อกลุ่ม
+
+
+@dataclass
+class Tree:
+    top: List[str] = field(default_factory=list)
+    lang: str = "en"
+    # input hash -> (level, output) ของทุก node ที่อยู่ใน tree ปัจจุบัน (เฉพาะที่ LLM สรุปสำเร็จ)
+    nodes: Dict[str, Tuple[int, str]] = field(default_factory=dict)
+    reused: int = 0
+    computed: int = 0
+    rows: List[dict] = field(default_factory=list)
+
+
+def _hash(kind: str, lang: str, texts: List[str]) -> str:
+    h = hashlib.sha256(f"{kind}|{lang}".encode("utf-8"))
+    for t in texts:
+        h.update(b"\x00" + t.encode("utf-8"))
+    return h.hexdigest()
 
-    if not per_doc_summaries:
-        return ""
 
-    joined = "\n".join(per_doc_summaries)
+def _fit(text: str, max_tokens: int) -> str:
+    n = chars_for_tokens(text, max_tokens)
+    return text if n >= len(text) else text[:n].rstrip() + "…"
 
-    lang = _pick_language(docs)
-    lang_instruction = "Write in Thai." if lang == "th" else "Write in English."
 
-    # กันยาวเกิน
-    joined = joined[:12000]
+def _is_boundary(key: str) -> bool:
+    return zlib.crc32(key.encode("utf-8")) % _group_size() == 0
 
-    system = "You summarize multiple documents into one consolidated summary."
-    user = f"""
+
+def _groups(items: List[Item], budget: int) -> List[List[Item]]:
+    """
+    แบ่ง item ตามลำดับเป็นกลุ่ม: จบกลุ่มหลัง item ที่ key เป็นรอยต่อ (เฉลี่ย COMBINED_REDUCE_GROUP_SIZE ต่อกลุ่ม)
+    หรือเมื่อ token รวมจะเกิน budget (item เดียวยาวเกิน -> ตัดให้พอดี)
+    """
+    groups, cur, used = [], [], 0
+    for key, text in items:
+        text = _fit(text, budget)
+        cost = estimate_tokens(text) + 1
+        if cur and used + cost > budget:
+            groups.append(cur)
+            cur, used = [], 0
+        cur.append((key, text))
+        used += cost
+        if _is_boundary(key):
+            groups.append(cur)
+            cur, used = [], 0
+    if cur:
+        groups.append(cur)
+    return groups
+
+
+def _partial_prompt(items: List[str], lang: str) -> str:
+    joined = "\n".join(items)
+    return f"""
+Condense the document summaries below into 4-8 bullet points.
+
+Requirements:
+- Keep concrete facts, figures and names.
+- Mention which documents each point comes from.
+- Use "-" at the start of each bullet.
+- No intro, no headings.
+- {_lang_instruction(lang)}
+
+DOCUMENT SUMMARIES:
+{joined}
+"""
+
+
+def _final_prompt(items: List[str], lang: str) -> str:
+    joined = "\n".join(items)
+    return f"""
 Create a consolidated summary from the document summaries below.
 
 Requirements:
@@ -57,59 +194,180 @@ Requirements:
 - Use "-" at the start of each bullet.
 - No intro, no headings, no extra lines.
 - Each bullet captures a key theme across documents.
-- {lang_instruction}
+- {_lang_instruction(lang)}
 
 DOCUMENT SUMMARIES:
 {joined}
 """
+
+
+def _extractive_bullets(items: List[str], n: int) -> str:
+    sentences = [s for _, s in select("\n".join(items), max_sentences=n)]
+    return "\n".join(f"- {s.lstrip('- ').strip()}" for s in sentences if s.strip())
+
+
+def _reduce_group(items: List[str], lang: str, *, owner=None) -> Tuple[str, bool]:
+    """
+    คืน (output, ok): ok=False = ใช้ extractive แทน -> ไม่ memo (รอบหน้าลอง LLM ใหม่)
+    """
     try:
-        return (generate_text(system, user, owner=owner, purpose="combined") or "").strip()
+        out = (generate_text(PARTIAL_SYSTEM, _partial_prompt(items, lang), owner=owner, purpose="combined") or "").strip()
+    except LLMError as e:
+        logger.warning("combined_summary partial reduce failed: %s", e)
+        out = ""
+    if out:
+        return out, True
+    # LLM ใช้ไม่ได้ -> เอาประโยคสำคัญของกลุ่มแทน (ยังดีกว่าทิ้งเอกสารทั้งกลุ่ม)
+    return _extractive_bullets(items, 8), False
+
+
+def reduce_to_top(items: List[Item], lang: str, *, owner=None, memo: Dict[str, str] | None = None) -> Tree:
+    """
+    reduce ทีละชั้นจน item ทั้งหมดอยู่ในกลุ่มเดียว -> Tree.top = input ของ final prompt
+    memo: input hash -> output ของ node ที่เคยสรุปไว้ (กลุ่มที่ input เหมือนเดิมไม่เรียก LLM ซ้ำ)
+    """
+    memo = memo or {}
+    tree = Tree(lang=lang)
+    budget = _group_tokens()
+    level = 0
+    while True:
+        if sum(estimate_tokens(t) + 1 for _, t in items) <= budget:
+            tree.top = [t for _, t in items]
+            return tree
+        if level >= MAX_LEVELS:
+            # reduce ไม่ลดขนาดลง (คำตอบยาวเกิน) -> แบ่งงบเท่า ๆ กัน ไม่ทิ้ง item ไหน
+            share = max(1, budget // len(items))
+            tree.top = [_fit(t, share) for _, t in items]
+            return tree
+
+        level += 1
+        groups = _groups(items, budget)
+        texts = [[t for _, t in g] for g in groups]
+        hashes = [_hash("partial", lang, t) for t in texts]
+        todo = [i for i, h in enumerate(hashes) if h not in memo]
+        logger.info(
+            "combined_summary: level %s reduces %s items in %s groups (%s cached)",
+            level, len(items), len(groups), len(groups) - len(todo),
+        )
+
+        outputs = {i: memo[h] for i, h in enumerate(hashes) if h in memo}
+        for i in outputs:
+            tree.nodes[hashes[i]] = (level, outputs[i])
+        tree.reused += len(outputs)
+        for i, (out, ok) in zip(todo, _parallel(lambda i: _reduce_group(texts[i], lang, owner=owner), todo)):
+            outputs[i] = out
+            tree.computed += 1
+            if ok:
+                tree.nodes[hashes[i]] = (level, out)
+
+        # key ของกิ่ง = key ของ item แรก (คงที่ตราบที่เอกสารแรกของกลุ่มยังอยู่)
+        items = [(g[0][0], outputs[i]) for i, g in enumerate(groups)]
+
+
+def _final_summary(items: List[str], lang: str, *, owner=None) -> Tuple[str, bool]:
+    try:
+        out = (generate_text(FINAL_SYSTEM, _final_prompt(items, lang), owner=owner, purpose="combined") or "").strip()
+        return out, True
     except LLMError as e:
         logger.warning("combined_summary failed: %s", e)
-        return "(combined summary not available: quota reached)"
+        return _extractive_bullets(items, 5) or FALLBACK_TEXT, False
+
+
+def _build_tree(docs, *, owner=None, memo: Dict[str, str] | None = None) -> Tree:
+    rows = _doc_rows(docs)
+    _fill_missing_summaries(rows, owner=owner)
+    leaves = [(str(r["id"]), f"- {r['file_name']}: {r['summary'].strip()}") for r in rows if (r["summary"] or "").strip()]
+    if not leaves:
+        return Tree(rows=rows)
+    lang = _pick_language([r for r in rows if r["summary"]])
+    tree = reduce_to_top(leaves, lang, owner=owner, memo=memo)
+    tree.rows = rows
+    return tree
+
 
-def build_combined_title_and_summary(docs: List[Document], *, owner=None) -> Tuple[str, str]:
+def _title_and_summary(tree: Tree, *, owner=None) -> Tuple[str, Tuple[str, bool]]:
+    # title และ summary ใช้ input ชั้นบนสุดชุดเดียวกัน -> เรียกพร้อมกัน
+    joined = "\n".join(tree.top)
+    title, final = _parallel(
+        lambda job: job(),
+        [lambda: generate_title(joined, owner=owner, lang=tree.lang), lambda: _final_summary(tree.top, tree.lang, owner=owner)],
+    )
+    return title, final
+
+
+def build_combined_summary(docs, *, owner=None) -> str:
+    """
+    docs: Document หรือ id ของเอกสารในชุด
+    """
     if not docs:
-        return ("Combined Summary", "")
+        return ""
+    tree = _build_tree(docs, owner=owner)
+    return _final_summary(tree.top, tree.lang, owner=owner)[0] if tree.top else ""
 
-    # map: ใช้ summary ของแต่ละไฟล์ (ถ้าไม่มีให้สรุป)
-    per_doc = []
-    for d in docs:
-        s = (d.summary or "").strip()
-        if not s:
-            raw = (d.extracted_text or "").strip().replace("\n", " ")
-            s = (raw[:400] + "…") if raw else ""
 
-        if s:
-            per_doc.append(f"- {d.file_name}: {s}")
+def build_combined_title_and_summary(docs, *, owner=None) -> Tuple[str, str]:
+    if not docs:
+        return ("Combined Summary", "")
 
-    joined = "\n".join(per_doc).strip()
-    if not joined:
+    tree = _build_tree(docs, owner=owner)
+    if not tree.top:
         return ("Combined Summary", "")
 
-    title = generate_title(joined, owner=owner)
+    title, (combined, _) = _title_and_summary(tree, owner=owner)
+    return (title or "Combined Summary", combined)
 
-    # reduce summary จาก joined
-    lang = "th" if detect_language(joined) == "th" else "en"
-    lang_instruction = "Write in Thai." if lang == "th" else "Write in English."
 
-    joined = joined[:12000]
+# -------------------------
+# incremental: notebook ที่มี reduce tree เก็บไว้แล้ว
+# -------------------------
+def _title_keep_similarity() -> float:
+    return float(getattr(settings, "COMBINED_TITLE_KEEP_SIMILARITY", 0.6))
 
-    system = "You summarize multiple documents into one consolidated summary."
-    user = f"""
-Create a consolidated summary from the document summaries below.
 
-Requirements:
-- Exactly 4-6 bullet points.
-- No intro, no disclaimers.
-- {lang_instruction}
+def refresh_notebook(cs, *, owner=None) -> dict:
+    """
+    สร้าง/อัปเดต combined summary ของ notebook ตามเอกสารชุดปัจจุบัน
+    - กลุ่มที่ input เหมือนเดิมใช้ node เดิม; สรุปใหม่เฉพาะกิ่งที่เปลี่ยน + root
+    - input ของ root เหมือนเดิม -> ไม่เรียก LLM เลย
+    - title สร้างใหม่เฉพาะเมื่อ auto_title และ summary ใหม่ต่างจากเดิมมากพอ
+    คืนสถิติ {"reused", "computed", "summary_changed", "title_changed"}
+    """
+    memo = dict(cs.nodes.values_list("input_hash", "output"))
+    tree = _build_tree(list(cs.documents.values_list("id", flat=True)), owner=owner, memo=memo)
 
-DOCUMENT SUMMARIES:
-{joined}
-"""
-    try:
-        combined = (generate_text(system, user, owner=owner, purpose="combined") or "").strip()
-    except LLMError as e:
-        logger.warning("combined_summary failed: %s", e)
-        return (title or "Combined Summary", "(combined summary not available: quota reached)")
-    return (title, combined)
\ No newline at end of file
+    old_summary, old_title = cs.combined_summary, cs.title
+    root_hash = _hash("final", tree.lang, tree.top) if tree.top else ""
+    stats = {"reused": tree.reused, "computed": tree.computed, "summary_changed": False, "title_changed": False}
+
+    if not tree.top:
+        cs.combined_summary, cs.summary_hash = "", ""
+    elif root_hash != cs.summary_hash or not old_summary:
+        if cs.auto_title and not old_summary:
+            title, (combined, ok) = _title_and_summary(tree, owner=owner)
+            cs.title = (title or cs.title)[:200]
+        else:
+            combined, ok = _final_summary(tree.top, tree.lang, owner=owner)
+            if cs.auto_title and similarity(old_summary, combined) < _title_keep_similarity():
+                cs.title = (generate_title("\n".join(tree.top), owner=owner, lang=tree.lang) or cs.title)[:200]
+        cs.combined_summary = combined
+        # LLM ล้ม (ได้ extractive) -> ไม่จำ hash เพื่อให้รอบหน้าสรุปใหม่
+        cs.summary_hash = root_hash if ok else ""
+
+    stats["summary_changed"] = cs.combined_summary != old_summary
+    stats["title_changed"] = cs.title != old_title
+    cs.doc_count = len(tree.rows)
+    cs.total_words = sum(r["word_count"] or 0 for r in tree.rows)
+
+    with transaction.atomic():
+        cs.nodes.exclude(input_hash__in=list(tree.nodes)).delete()
+        CombinedSummaryNode.objects.bulk_create(
+            [
+                CombinedSummaryNode(notebook_id=cs.pk, level=level, input_hash=h, output=out)
+                for h, (level, out) in tree.nodes.items() if h not in memo
+            ],
+            ignore_conflicts=True,
+        )
+        cs.save(update_fields=["title", "combined_summary", "summary_hash", "doc_count", "total_words"])
+
+    logger.info("combined_summary %s refreshed: %s", cs.pk, stats)
+    return stats
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import logging, re
+from typing import List, Tuple
+
+from .local_classifier import features
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# extractive summary (ไม่เรียก LLM): centroid scoring บน TF-IDF ของประโยค
+# - ใช้ hashed feature ชุดเดียวกับ local classifier (คำ/bigram อังกฤษ + trigram ตัวอักษรไทย) -> ใช้ได้ทั้งไทยและอังกฤษ
+# - คำนวณแบบ sparse ด้วย np.unique + np.bincount (ไม่สร้าง matrix ประโยค x คำ)
+# - ตัดประโยคที่ซ้ำกับที่เลือกไปแล้ว (cosine > MAX_OVERLAP)
+# ใช้เป็น summary สำรองตอน LLM ใช้ไม่ได้ และย่อเอกสารยาวก่อนส่ง LLM
+# -------------------------
+
+FEATURE_DIM = 1 << 20
+MIN_SENT_CHARS = 30
+MAX_SENT_CHARS = 400
+MAX_OVERLAP = 0.6
+POSITION_WEIGHT = 0.05
+
+SENT_END = re.compile(r"(?<=[.!?])\s+")
+THAI = re.compile(r"[ก-๙]")
+
+
+def _pieces(part: str) -> List[str]:
+    # ภาษาไทยใช้เว้นวรรคแทนการจบประโยค -> แยกที่ช่องว่าง แล้วรวมชิ้นเล็กให้ยาวพอ
+    if not THAI.search(part):
+        return [part]
+    out, cur = [], ""
+    for w in part.split():
+        cur = f"{cur} {w}" if cur else w
+        if len(cur) >= MIN_SENT_CHARS * 2:
+            out.append(cur)
+            cur = ""
+    if cur:
+        if out and len(cur) < MIN_SENT_CHARS:
+            out[-1] = f"{out[-1]} {cur}"
+        else:
+            out.append(cur)
+    return out
+
+
+def split_sentences(text: str) -> List[str]:
+    out = []
+    for line in (text or "").splitlines():
+        for part in SENT_END.split(line.strip()):
+            for s in _pieces(part.strip()):
+                while len(s) > MAX_SENT_CHARS:
+                    cut = s.rfind(" ", 0, MAX_SENT_CHARS)
+                    cut = cut if cut > MIN_SENT_CHARS else MAX_SENT_CHARS
+                    out.append(s[:cut].strip())
+                    s = s[cut:].strip()
+                if not s:
+                    continue
+                # ชิ้นสั้นมาก (หัวข้อ / เลขข้อ) ต่อท้ายประโยคก่อนหน้า
+                if out and len(s) < MIN_SENT_CHARS // 2:
+                    out[-1] = f"{out[-1]} {s}"
+                else:
+                    out.append(s)
+    return out
+
+
+def _score(np, sentences: List[str]):
+    """
+    คืน (score ต่อประโยค, sparse vector ต่อประโยค {column: weight} ที่ normalize แล้ว)
+    """
+    rows, cols, tf = [], [], []
+    for i, s in enumerate(sentences):
+        f = features(s, dim=FEATURE_DIM, max_chars=len(s))
+        rows.extend([i] * len(f))
+        cols.extend(f.keys())
+        tf.extend(f.values())
+
+    n = len(sentences)
+    if not cols:
+        return np.zeros(n), [{} for _ in sentences]
+
+    rows = np.asarray(rows, dtype=np.int64)
+    uniq, inv = np.unique(np.asarray(cols, dtype=np.int64), return_inverse=True)
+    df = np.bincount(inv, minlength=len(uniq))
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    vals = np.log1p(np.asarray(tf, dtype=np.float64)) * idf[inv]
+
+    norms = np.sqrt(np.bincount(rows, vals * vals, minlength=n))
+    vals = vals / np.maximum(norms[rows], 1e-12)
+
+    centroid = np.bincount(inv, vals, minlength=len(uniq)) / n
+    centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+    scores = np.bincount(rows, vals * centroid[inv], minlength=n)
+    # เอกสารส่วนใหญ่ใส่ใจความไว้ต้นเรื่อง -> ให้ตำแหน่งต้น ๆ ได้คะแนนเพิ่มเล็กน้อย
+    scores = scores + POSITION_WEIGHT * (1.0 - np.arange(n) / n)
+
+    vectors = [{} for _ in sentences]
+    for r, c, v in zip(rows.tolist(), inv.tolist(), vals.tolist()):
+        vectors[r][c] = v
+    return scores, vectors
+
+
+def _cos(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def select(text: str, *, max_sentences: int = 0, max_chars: int = 0) -> List[Tuple[int, str]]:
+    """
+    เลือกประโยคสำคัญ คืน [(ลำดับในเอกสาร, ประโยค)] เรียงตามลำดับเดิม
+    หยุดเมื่อครบ max_sentences หรือความยาวรวมเกิน max_chars (0 = ไม่จำกัด)
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    try:
+        import numpy as np
+    except ImportError:
+        # ไม่มี numpy -> เอาประโยคต้นเรื่อง
+        order, vectors = list(range(len(sentences))), None
+    else:
+        scores, vectors = _score(np, sentences)
+        order = sorted(range(len(sentences)), key=lambda i: -scores[i])
+
+    picked, used = [], 0
+    for i in order:
+        s = sentences[i]
+        if max_chars and picked and used + len(s) + 1 > max_chars:
+            continue
+        if vectors is not None and any(_cos(vectors[i], vectors[j]) > MAX_OVERLAP for j in picked):
+            continue
+        picked.append(i)
+        used += len(s) + 1
+        if (max_sentences and len(picked) >= max_sentences) or (max_chars and used >= max_chars):
+            break
+    return [(i, sentences[i]) for i in sorted(picked)]
+
+
+def extract_summary(text: str, *, max_sentences: int = 3, max_chars: int = 700) -> str:
+    return " ".join(s for _, s in select(text, max_sentences=max_sentences, max_chars=max_chars))
+
+
+def compress(text: str, max_chars: int) -> str:
+    """
+    ย่อเอกสารยาวเหลือเฉพาะประโยคสำคัญ (ไม่เกิน max_chars) ก่อนส่งให้ LLM
+    """
+    if len(text or "") <= max_chars:
+        return text or ""
+    return "\n".join(s for _, s in select(text, max_chars=max_chars))
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    cosine ของ hashed feature สองข้อความ (0..1) ใช้ตัดสินว่าข้อความเปลี่ยนไปมากแค่ไหน
+    """
+    fa = features(a, dim=FEATURE_DIM, max_chars=len(a or ""))
+    fb = features(b, dim=FEATURE_DIM, max_chars=len(b or ""))
+    if not fa or not fb:
+        return 0.0
+    dot = sum(v * fb.get(k, 0) for k, v in fa.items())
+    na = sum(v * v for v in fa.values()) ** 0.5
+    nb = sum(v * v for v in fb.values()) ** 0.5
+    return dot / (na * nb)
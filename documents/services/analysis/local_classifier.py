@@ -0,0 +1,182 @@
+from __future__ import annotations
+import logging, os, re, threading, zlib
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# classifier ในเครื่อง: hashed n-gram + multinomial naive Bayes (NumPy)
+# - train ด้วย manage.py train_classifier จาก Document.document_type ที่ LLM ให้ (type_source="llm") -> ไฟล์ .npz
+# - confidence (posterior หลังปรับ temperature) >= LOCAL_CLASSIFIER_THRESHOLD -> ใช้เลย ไม่เรียก LLM
+# - ไม่มีไฟล์ model / ไม่มี numpy -> คืน None ให้ caller ไปใช้ LLM ตามเดิม
+# -------------------------
+
+WORD = re.compile(r"[a-z0-9]+|[ก-๙]+")
+THAI_NGRAM = 3
+DEFAULT_DIM = 1 << 16
+DEFAULT_MAX_CHARS = 4000
+
+
+def model_path() -> Path:
+    return Path(getattr(settings, "LOCAL_CLASSIFIER_PATH", "") or Path(settings.BASE_DIR) / "doc_classifier.npz")
+
+
+def threshold() -> float:
+    return float(getattr(settings, "LOCAL_CLASSIFIER_THRESHOLD", 0.9))
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "LOCAL_CLASSIFIER_ENABLED", True))
+
+
+def _h(s: str, dim: int) -> int:
+    # crc32 แทน hash() -> index เดิมทุก process (hash ของ str สุ่มต่อ process)
+    return zlib.crc32(s.encode("utf-8")) % dim
+
+
+def features(text: str, *, dim: int = DEFAULT_DIM, max_chars: int = DEFAULT_MAX_CHARS) -> Counter:
+    """
+    คืน Counter {hash index: จำนวน}
+    อังกฤษ/ตัวเลข: unigram + bigram ของคำ; ไทย (ไม่มีเว้นวรรค): character trigram ของแต่ละช่วงตัวอักษรไทย
+    """
+    out = Counter()
+    prev = ""
+    for w in WORD.findall((text or "")[:max_chars].lower()):
+        if "ก" <= w[0] <= "๙":
+            prev = ""
+            if len(w) <= THAI_NGRAM:
+                out[_h("t:" + w, dim)] += 1
+                continue
+            for i in range(len(w) - THAI_NGRAM + 1):
+                out[_h("t:" + w[i:i + THAI_NGRAM], dim)] += 1
+            continue
+        if len(w) <= 1 and not w.isdigit():
+            continue
+        # ตัวเลขยาว ๆ (เลขที่เอกสาร / จำนวนเงิน) รวมเป็น feature เดียวตามจำนวนหลัก
+        tok = f"#{len(w)}" if w.isdigit() and len(w) > 2 else w
+        out[_h("w:" + tok, dim)] += 1
+        if prev:
+            out[_h(f"b:{prev} {tok}", dim)] += 1
+        prev = tok
+    return out
+
+
+# -------------------------
+# model (โหลดใหม่เมื่อ mtime ของไฟล์เปลี่ยน เหมือน token estimator)
+# -------------------------
+class Model:
+    def __init__(self, labels, log_prior, log_prob, temperature: float = 1.0, max_chars: int = DEFAULT_MAX_CHARS):
+        self.labels = [str(x) for x in labels]
+        self.log_prior = log_prior
+        self.log_prob = log_prob
+        self.temperature = float(temperature) or 1.0
+        self.max_chars = int(max_chars)
+        self.dim = int(log_prob.shape[1])
+
+    def vectorize(self, text: str):
+        import numpy as np
+        f = features(text, dim=self.dim, max_chars=self.max_chars)
+        idx = np.fromiter(f.keys(), dtype=np.int64, count=len(f))
+        cnt = np.fromiter(f.values(), dtype=np.float32, count=len(f))
+        # log(1 + tf) ลดน้ำหนักคำที่ซ้ำมาก ๆ -> posterior ไม่สุดโต่งตามความยาวเอกสาร
+        return idx, np.log1p(cnt)
+
+    def scores(self, idx, weights):
+        return self.log_prior + self.log_prob[:, idx] @ weights
+
+    def posterior(self, scores, temperature: float | None = None):
+        import numpy as np
+        z = scores / (temperature or self.temperature)
+        z = z - z.max()
+        p = np.exp(z)
+        return p / p.sum()
+
+    def predict(self, text: str) -> tuple[str, float] | None:
+        idx, w = self.vectorize(text)
+        if not len(idx):
+            return None
+        p = self.posterior(self.scores(idx, w))
+        best = int(p.argmax())
+        return self.labels[best], float(p[best])
+
+
+_lock = threading.Lock()
+_model = None
+_model_mtime = None
+
+
+def load_model() -> Model | None:
+    global _model, _model_mtime
+    path = model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    if _model is None or mtime != _model_mtime:
+        with _lock:
+            try:
+                import numpy as np
+                with np.load(path, allow_pickle=False) as data:
+                    _model = Model(
+                        data["labels"], data["log_prior"], data["log_prob"].astype(np.float32),
+                        temperature=float(data["temperature"]), max_chars=int(data["max_chars"]),
+                    )
+            except ImportError:
+                logger.warning("local classifier: numpy is not installed; using the LLM only")
+                _model = None
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning("local classifier: cannot read %s: %s", path, e)
+                _model = None
+            _model_mtime = mtime
+    return _model
+
+
+def save_model(model: Model, meta: dict | None = None) -> Path:
+    import numpy as np
+    global _model
+    path = model_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # np.savez เติม .npz ให้ถ้าชื่อไม่ลงท้ายด้วย .npz -> ตั้งชื่อ tmp ให้ลงท้ายเอง
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        labels=np.array(model.labels),
+        log_prior=model.log_prior.astype(np.float32),
+        log_prob=model.log_prob.astype(np.float16),
+        temperature=np.float32(model.temperature),
+        max_chars=np.int64(model.max_chars),
+        **{f"meta_{k}": np.array(v) for k, v in (meta or {}).items()},
+    )
+    os.replace(tmp, path)
+    _model = None
+    return path
+
+
+def predict(text: str) -> tuple[str, float] | None:
+    """
+    คืน (label, confidence) หรือ None ถ้าไม่มี model
+    """
+    if not enabled():
+        return None
+    model = load_model()
+    if model is None or not (text or "").strip():
+        return None
+    return model.predict(text)
+
+
+def confident_label(text: str) -> str | None:
+    """
+    label ที่มั่นใจพอจะไม่ต้องถาม LLM (ต่ำกว่า threshold -> None)
+    """
+    guess = predict(text)
+    if guess is None:
+        return None
+    label, conf = guess
+    if conf >= threshold():
+        logger.debug("local classifier: %s (%.3f)", label, conf)
+        return label
+    return None
@@ -1,16 +1,29 @@
 import logging
+from django.conf import settings
 from documents.services.llm.client import generate_text, LLMError
+from .extractive import compress, extract_summary
 from .lang_detect import detect_language
 
 logger = logging.getLogger(__name__)
 
-def summarize_text(text: str, *, owner=None) -> str:
+def summarize_text(text: str, *, owner=None, fallback: bool = True, lang: str = "") -> str:
+    """
+    fallback=True: LLM ใช้ไม่ได้ (quota หมด / error) -> คืน extractive summary แทนการ raise
+    lang: ภาษาที่เก็บไว้ใน Document.lang (ว่าง = ตรวจจากข้อความ)
+    """
     clean = (text or "").strip()
     if not clean:
         return ""
 
-    clean = _trim_for_summary(clean, max_chars=12000)
-    lang = detect_language(clean)
+    # เอกสารสั้น ๆ: ประโยคเด่น 2-3 ประโยคก็เป็น summary ได้เลย ไม่ต้องรอ LLM
+    if len(clean) < int(getattr(settings, "SUMMARY_LLM_MIN_CHARS", 500)):
+        return extract_summary(clean)
+
+    source = clean
+    # เอกสารยาว: ส่งเฉพาะประโยคสำคัญแทนการตัดหัว/ท้าย
+    max_chars = int(getattr(settings, "SUMMARY_INPUT_MAX_CHARS", 12000))
+    clean = compress(clean, max_chars) or _trim_for_summary(clean, max_chars=max_chars)
+    lang = lang or detect_language(clean)
     lang_instruction = "Write in Thai." if lang == "th" else "Write in English."
 
     system = "You summarize documents for a web app."
@@ -28,8 +41,11 @@ DOCUMENT:
     try:
         return (generate_text(system, user, owner=owner, purpose="summarize") or "").strip()
     except LLMError as e:
-        logger.exception("LLM summarize failed: %s", e)
-        raise
+        if not fallback:
+            logger.exception("LLM summarize failed: %s", e)
+            raise
+        logger.warning("LLM summarize failed, using extractive summary: %s", e)
+        return extract_summary(source)
 
 
 def _trim_for_summary(text: str, max_chars: int = 12000) -> str:
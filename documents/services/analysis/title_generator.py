@@ -1,14 +1,28 @@
 from __future__ import annotations
 from documents.services.llm.client import generate_text, LLMError
+from documents.services.llm.profiles import get_profile
+from documents.services.llm.tokens import estimate_tokens
 from .lang_detect import detect_language
 
+TITLE_MAX_CHARS = 120
 
-def generate_title(context_text: str, *, owner=None) -> str:
+
+def _title_max_tokens(lang: str) -> int:
+    """
+    งบ output token ของ title ตาม script: title ไทย 120 ตัวอักษรใช้ token มากกว่าอังกฤษหลายเท่า
+    ใช้ค่าที่มากกว่าระหว่าง profile กับ estimate ของ title ยาวสุด (+50% เผื่อ estimate เป็นค่าเฉลี่ย)
+    -> ไม่ถูกตัดกลางคำ; ความยาวจริงยังถูกคุมด้วย prompt (max 8 words) และ t[:TITLE_MAX_CHARS]
+    """
+    sample = ("ก" if lang == "th" else "a") * TITLE_MAX_CHARS
+    return max(get_profile("title").max_tokens, -(-estimate_tokens(sample) * 3 // 2))
+
+
+def generate_title(context_text: str, *, owner=None, lang: str = "") -> str:
     clean = (context_text or "").strip()
     if not clean:
         return "Notebook Summary"
 
-    lang = detect_language(clean)
+    lang = lang or detect_language(clean)
     lang_instruction = "Write in Thai." if lang == "th" else "Write in English."
 
     # กันยาวเกิน
@@ -28,11 +42,13 @@ TEXT:
 {clean}
 """
     try:
-        t = (generate_text(system, user, owner=owner, purpose="title") or "").strip()
+        t = (generate_text(
+            system, user, owner=owner, purpose="title", max_tokens=_title_max_tokens(lang),
+        ) or "").strip()
         # กันโมเดลตอบหลายบรรทัด
         t = t.splitlines()[0].strip()
         # กัน punctuation ปลาย
         t = t.rstrip(" .,:;\"'`")
-        return (t[:120] or "Notebook Summary")
+        return (t[:TITLE_MAX_CHARS] or "Notebook Summary")
     except LLMError:
         return "Notebook Summary"
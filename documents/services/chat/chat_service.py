@@ -1,25 +1,29 @@
 from __future__ import annotations
 
+import logging
 from dataclasses import dataclass
 from typing import List, Optional
 
-from documents.services.llm.client import generate_text, LLMError, generate_text_stream
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from documents.services.llm.client import generate_text, LLMError, generate_text_stream, agenerate_text_stream
+from documents.services.llm.tokens import estimate_prompt_tokens
+from documents.services.chat.prompt_assembler import Packed, Section, budget_for, merge, pack
 from documents.services.analysis.lang_detect import detect_language
 from documents.services.pipeline.retrieval import retrieve_top_chunks
 from documents.models import Conversation, Message, Document, CombinedSummary
 
+logger = logging.getLogger(__name__)
 
-# กัน prompt ยาวเกิน (Ollama บางรุ่นหลุดง่ายถ้ายาวมาก)
-MAX_CONTEXT_CHARS = 12000
 MAX_HISTORY_TURNS = 8  # เอาเฉพาะท้าย ๆ (user+assistant) เพื่อคุมความยาว
+RECENT_HISTORY_MESSAGES = 2  # คู่ถาม-ตอบล่าสุด สำคัญกว่า summary ที่ตัดได้
 
 
-def _trim(text: str, max_chars: int = MAX_CONTEXT_CHARS) -> str:
-    t = (text or "").strip()
-    if len(t) <= max_chars:
-        return t
-    half = max_chars // 2
-    return t[:half] + "\n\n...[TRUNCATED]...\n\n" + t[-half:]
+def _max_excerpts() -> int:
+    # ดึง candidate มากกว่าที่ใส่ได้ แล้วให้งบ token เป็นตัวตัดสิน
+    return int(getattr(settings, "CHAT_CONTEXT_MAX_EXCERPTS", 10))
 
 def _build_history(conv: Conversation, until_message: Message | None = None) -> List[dict]:
     qs = conv.messages.filter(
@@ -42,29 +46,23 @@ def _build_history(conv: Conversation, until_message: Message | None = None) ->
         })
     return out
 
-def _notebook_context(nb: CombinedSummary) -> str:
+def _notebook_sections(nb: CombinedSummary) -> List[Section]:
     """
     Context สำหรับ notebook (combined):
     - title
     - combined_summary (bullet)
     - per-doc summary (ชื่อไฟล์ + summary) เพื่อให้ตอบละเอียดขึ้น
     """
-    parts = [f"NOTEBOOK TITLE:\n{nb.title}"]
-
-    if (nb.combined_summary or "").strip():
-        parts.append(f"COMBINED SUMMARY:\n{nb.combined_summary.strip()}")
-
-    # เพิ่ม per-doc summaries เพื่อให้ถามเจาะไฟล์ได้บ้าง
-    per_doc_lines = []
-    for d in nb.documents.all().order_by("-uploaded_at"):
+    out = [
+        Section("notebook_title", "title", nb.title, priority=20, order=10),
+        Section("combined_summary", "combined_summary", nb.combined_summary, priority=30, order=20, shrinkable=True),
+    ]
+    # per-doc summaries: ไฟล์ใหม่กว่ามาก่อน ทิ้งจากท้าย
+    for i, d in enumerate(nb.documents.all().order_by("-uploaded_at")):
         s = (d.summary or "").strip()
         if s:
-            per_doc_lines.append(f"- {d.file_name}: {s}")
-    if per_doc_lines:
-        joined = "\n".join(per_doc_lines)
-        parts.append(f"PER-DOCUMENT SUMMARIES:\n{_trim(joined, max_chars=8000)}")
-
-    return "\n\n".join(parts).strip()
+            out.append(Section(f"doc_summary:D{d.id}", "doc_summaries", f"- {d.file_name}: {s}", priority=60 + i, order=30))
+    return out
 
 def _looks_general_question(q: str) -> bool:
     ql = (q or "").strip().lower()
@@ -80,28 +78,24 @@ def _looks_general_question(q: str) -> bool:
 
     return False
 
-def _build_context(conv: Conversation, question: str) -> str:
+def _context_sections(conv: Conversation, question: str) -> List[Section]:
     q = (question or "").strip()
     if not q:
-        return ""
+        return []
 
     if conv.document_id:
         doc = conv.document
-        parts = []
-
-        if (doc.summary or "").strip():
-            parts.append(f"SUMMARY:\n{doc.summary.strip()}")
-
-        chunks = retrieve_top_chunks(doc.id, q, k=6)
-        if chunks:
-            lines = [f"[D{doc.id}-C{ch.idx}] {ch.content}" for ch in chunks]
-            parts.append("RELEVANT EXCERPTS:\n" + "\n\n".join(lines))
-
-        return "\n\n".join(parts).strip()
+        out = [Section("summary", "summary", doc.summary, priority=30, order=20, shrinkable=True)]
+        for rank, ch in enumerate(retrieve_top_chunks(doc.id, q, k=_max_excerpts())):
+            out.append(Section(
+                f"excerpt:D{doc.id}-C{ch.idx}", "excerpts", f"[D{doc.id}-C{ch.idx}] {ch.content}",
+                priority=10 + rank, order=40,
+            ))
+        return out
 
     if conv.notebook_id:
         nb = conv.notebook
-        parts = [_notebook_context(nb)]
+        out = _notebook_sections(nb)
 
         scored_all = []
         for d in nb.documents.all():
@@ -109,16 +103,68 @@ def _build_context(conv: Conversation, question: str) -> str:
                 scored_all.append((ch.score, d.id, d.file_name, ch.idx, ch.content))
 
         scored_all.sort(key=lambda x: x[0], reverse=True)
-        top = scored_all[:6]
-        if top:
-            lines = []
-            for _, doc_id, fname, idx, content in top:
-                lines.append(f"[D{doc_id}-C{idx}] ({fname}) {content}")
-            parts.append("RELEVANT EXCERPTS:\n" + "\n\n".join(lines))
+        for rank, (_, doc_id, fname, idx, content) in enumerate(scored_all[:_max_excerpts()]):
+            out.append(Section(
+                f"excerpt:D{doc_id}-C{idx}", "excerpts", f"[D{doc_id}-C{idx}] ({fname}) {content}",
+                priority=10 + rank, order=40,
+            ))
+        return out
+
+    return []
+
+def _history_sections(history: List[dict]) -> List[Section]:
+    # ใหม่ -> เก่า: ข้อความล่าสุดตัดได้, เก่ากว่าทิ้งทั้งก้อน และห้ามข้ามช่อง (contiguous)
+    out = []
+    n = len(history)
+    for age, i in enumerate(range(n - 1, -1, -1)):
+        m = history[i]
+        recent = age < RECENT_HISTORY_MESSAGES
+        out.append(Section(
+            f"history:{i}", "history", f"{m['role'].upper()}: {m['content']}",
+            priority=(40 if recent else 50) + age, order=i, shrinkable=recent, contiguous=True,
+        ))
+    return out
+
+# stable = ไม่ขึ้นกับคำถาม (เหมือนเดิมทุก turn) -> ส่งเป็น prefix ที่ provider cache ได้
+STABLE_HEADINGS = (
+    ("title", "NOTEBOOK TITLE", "\n"),
+    ("summary", "SUMMARY", "\n"),
+    ("combined_summary", "COMBINED SUMMARY", "\n"),
+    ("doc_summaries", "PER-DOCUMENT SUMMARIES", "\n"),
+)
+VOLATILE_HEADINGS = (
+    ("excerpts", "RELEVANT EXCERPTS", "\n\n"),
+)
+STABLE_GROUPS = {g for g, _, _ in STABLE_HEADINGS}
+
+def _render_groups(packed: Packed | None, headings) -> str:
+    parts = []
+    if packed is not None:
+        for group, heading, sep in headings:
+            if packed.has(group):
+                parts.append(f"{heading}:\n{packed.join(group, sep)}")
+    return "\n\n".join(parts)
+
+def _render_stable(packed: Packed) -> str:
+    body = _render_groups(packed, STABLE_HEADINGS)
+    return f"CONTEXT:\n{body}" if body else ""
+
+def _render_user(lang_instruction: str, q: str, packed: Packed | None) -> str:
+    context = _render_groups(packed, VOLATILE_HEADINGS)
+
+    user = f"""
+{lang_instruction}
+
+CONTEXT (optional):
+{context or "(none)"}
 
-        return "\n\n".join([p for p in parts if p]).strip()
+USER QUESTION:
+{q}
+""".strip()
 
-    return ""
+    if packed is not None and packed.has("history"):
+        user += f"\n\nCHAT HISTORY (most recent):\n{packed.join('history', chr(10))}"
+    return user
 
 def _system(has_source: bool) -> str:
     if has_source:
@@ -139,71 +185,87 @@ def _system(has_source: bool) -> str:
 
 
 
-def answer_chat(conv: Conversation, user_question: str, history_until: Message | None = None) -> str:
-    q = (user_question or "").strip()
-    if not q:
-        return ""
+def _stable_share() -> float:
+    return min(1.0, max(0.0, float(getattr(settings, "CHAT_STABLE_CONTEXT_SHARE", 0.5))))
 
+def _build_prompt(conv: Conversation, q: str, history_until: Message | None = None, *, purpose: str) -> tuple[str, str, str, Packed]:
+    """
+    prompt ของ chat (ใช้ทั้งแบบ stream และไม่ stream) คืน (system, context, user, packed)
+    - context (stable prefix): title / summary -> งบคงที่ต่อ conversation เพื่อให้ข้อความเหมือนเดิมทุก turn
+    - user (volatile): excerpt ตาม score > history ล่าสุด > history เก่า ใช้งบที่เหลือ
+    """
     q_lang = detect_language(q)
     lang = q_lang if q_lang in ("th", "en") else "th"
-
     lang_instruction = "Write in Thai." if lang == "th" else "Write in English."
 
     history = _build_history(conv, until_message=history_until)
-    context = _build_context(conv, q)
+    sections = _context_sections(conv, q)
+    stable = [s for s in sections if s.group in STABLE_GROUPS]
+    volatile = [s for s in sections if s.group not in STABLE_GROUPS] + _history_sections(history)
 
     has_source = bool(conv.document_id or conv.notebook_id)
     system = _system(has_source)
 
-    if has_source and not context:
+    # งบของ stable prefix คิดจากงบรวมคงที่ต่อ purpose (ไม่หักคำถาม) -> จุดตัด summary เหมือนเดิมทุก turn, cache hit ได้
+    # volatile ใช้งบที่เหลือหลังหัก system + โครง prompt (หัวข้อ/คำถาม) + stable
+    skeleton = estimate_prompt_tokens(system, _render_user(lang_instruction, q, None))
+    avail = max(0, budget_for(purpose) - skeleton)
+    stable_packed = pack(stable, int(budget_for(purpose) * _stable_share()))
+    packed = merge(stable_packed, pack(volatile, max(0, avail - stable_packed.used_tokens)))
+    packed.budget = budget_for(purpose)
+    packed.used_tokens += skeleton
+
+    if has_source and not stable_packed.kept and not packed.has("excerpts"):
         system += "If there is no CONTEXT, reply that you don't have enough information.\n"
 
-    user = f"""
-{lang_instruction}
+    if packed.dropped or packed.truncated:
+        logger.info(
+            "chat prompt conv=%s purpose=%s budget=%s used=%s dropped=%s truncated=%s",
+            conv.id, purpose, packed.budget, packed.used_tokens,
+            [s.key for s in packed.dropped], packed.truncated,
+        )
+    return system, _render_stable(stable_packed), _render_user(lang_instruction, q, packed), packed
 
-CONTEXT (optional):
-{_trim(context, max_chars=MAX_CONTEXT_CHARS) if context else "(none)"}
 
-USER QUESTION:
-{q}
-""".strip()
+def answer_chat(conv: Conversation, user_question: str, history_until: Message | None = None) -> str:
+    q = (user_question or "").strip()
+    if not q:
+        return ""
 
-    if history:
-        hist_text = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in history])
-        user += f"\n\nCHAT HISTORY (most recent):\n{_trim(hist_text, max_chars=4000)}"
+    system, context, user, _ = _build_prompt(conv, q, history_until, purpose="chat")
+    return (generate_text(system, user, owner=conv.owner, purpose="chat", context=context) or "").strip()
 
-    return (generate_text(system, user, owner=conv.owner, purpose="chat") or "").strip()
+def _stream_prompt(conv: Conversation, q: str, history_until: Message | None = None) -> tuple[str, str, str]:
+    system, context, user, _ = _build_prompt(conv, q, history_until, purpose="chat_stream")
+    return system, context, user
 
 def answer_chat_stream(conv: Conversation, user_question: str, should_stop=None, history_until: Message | None = None):
     q = (user_question or "").strip()
     if not q:
         return
 
-    q_lang = detect_language(q)
-    lang = q_lang if q_lang in ("th", "en") else "th"
-    lang_instruction = "Write in Thai." if lang == "th" else "Write in English."
-
-    history = _build_history(conv, until_message=history_until)
-    context = _build_context(conv, q)
-
-    has_source = bool(conv.document_id or conv.notebook_id)
-    system = _system(has_source)
-
-    user = f"""
-{lang_instruction}
+    system, context, user = _stream_prompt(conv, q, history_until)
 
-CONTEXT (optional):
-{_trim(context, max_chars=MAX_CONTEXT_CHARS) if context else "(none)"}
+    for t in generate_text_stream(system, user, owner=conv.owner, purpose="chat_stream", context=context):
+        if should_stop and should_stop():
+            return
+        yield t
 
-USER QUESTION:
-{q}
-""".strip()
+async def aanswer_chat_stream(conv: Conversation, user_question: str, should_stop=None, history_until: Message | None = None):
+    """
+    async ของ answer_chat_stream: สร้าง prompt (DB + retrieval) ใน thread ครั้งเดียว
+    แล้วคืน DB connection ก่อนเริ่มรอ token -> stream ยาว ๆ ไม่ถือ connection ค้าง
+    should_stop เป็น async callable
+    """
+    q = (user_question or "").strip()
+    if not q:
+        return
 
-    if history:
-        hist_text = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in history])
-        user += f"\n\nCHAT HISTORY (most recent):\n{_trim(hist_text, max_chars=4000)}"
+    system, context, user = await sync_to_async(_stream_prompt)(conv, q, history_until)
+    owner = await sync_to_async(lambda: conv.owner)()
+    await sync_to_async(connection.close)()
 
-    for t in generate_text_stream(system, user, owner=conv.owner, purpose="chat_stream"):
-        if should_stop and should_stop():
+    async for t in agenerate_text_stream(system, user, owner=owner, purpose="chat_stream", context=context):
+        if should_stop and await should_stop():
             return
-        yield t
\ No newline at end of file
+        yield t
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List
+
+from django.conf import settings
+
+from documents.services.llm.tokens import estimate_tokens, chars_for_tokens
+
+# -------------------------
+# ประกอบ prompt ตามงบ token
+# แต่ละ section มี priority (น้อย = สำคัญ) -> เลือกแบบ greedy จนเต็มงบ
+# shrinkable: ใส่ไม่พอดี -> ตัดท้ายให้เหลือเท่าที่งบเหลือ (ถ้ายังเหลือ >= MIN_SHRINK_TOKENS)
+# contiguous: ใน group เดียวกัน ถ้าทิ้งตัวหนึ่งไปแล้ว ตัวที่ priority ต่ำกว่าทิ้งด้วย (เช่น history เก่ากว่าห้ามข้ามช่อง)
+# -------------------------
+
+MIN_SHRINK_TOKENS = 120
+SEPARATOR_TOKENS = 2
+TRUNCATED_MARK = "\n...[TRUNCATED]"
+
+
+@dataclass
+class Section:
+    key: str
+    group: str
+    text: str
+    priority: int
+    order: int = 0
+    required: bool = False
+    shrinkable: bool = False
+    contiguous: bool = False
+    tokens: int = 0
+
+    def __post_init__(self):
+        self.text = (self.text or "").strip()
+        if not self.tokens:
+            self.tokens = estimate_tokens(self.text) + SEPARATOR_TOKENS
+
+
+@dataclass
+class Packed:
+    budget: int
+    used_tokens: int = 0
+    kept: List[Section] = field(default_factory=list)
+    dropped: List[Section] = field(default_factory=list)
+    truncated: List[str] = field(default_factory=list)
+
+    def join(self, group: str, sep: str = "\n\n") -> str:
+        return sep.join(s.text for s in self.kept if s.group == group)
+
+    def has(self, group: str) -> bool:
+        return any(s.group == group for s in self.kept)
+
+    def report(self) -> dict:
+        return {
+            "budget": self.budget,
+            "used_tokens": self.used_tokens,
+            "kept": [s.key for s in self.kept],
+            "dropped": [s.key for s in self.dropped],
+            "truncated": list(self.truncated),
+        }
+
+
+def budget_for(purpose: str, default: int = 6000) -> int:
+    budgets = getattr(settings, "CHAT_PROMPT_TOKEN_BUDGETS", {}) or {}
+    return int(budgets.get(purpose) or budgets.get("chat") or default)
+
+
+def _shrink(s: Section, max_tokens: int) -> Section:
+    n = chars_for_tokens(s.text, max_tokens - SEPARATOR_TOKENS - estimate_tokens(TRUNCATED_MARK))
+    text = s.text[:n].rstrip() + TRUNCATED_MARK
+    return Section(
+        key=s.key, group=s.group, text=text, priority=s.priority, order=s.order,
+        required=s.required, shrinkable=False, contiguous=s.contiguous,
+    )
+
+
+def pack(sections: List[Section], budget: int) -> Packed:
+    """
+    คืน Packed: kept เรียงตาม order (ลำดับใน prompt) ไม่ใช่ priority
+    section required ใส่เสมอ (นับ token ด้วย แม้จะเกินงบ)
+    """
+    out = Packed(budget=budget)
+    broken_groups = set()
+    kept = []
+
+    ranked = sorted(enumerate(sections), key=lambda x: (not x[1].required, x[1].priority, x[0]))
+    for i, s in ranked:
+        remaining = budget - out.used_tokens
+
+        if s.required:
+            kept.append((i, s))
+            out.used_tokens += s.tokens
+            continue
+
+        if not s.text:
+            continue
+
+        if s.contiguous and s.group in broken_groups:
+            out.dropped.append(s)
+            continue
+
+        if s.tokens <= remaining:
+            kept.append((i, s))
+            out.used_tokens += s.tokens
+            continue
+
+        if s.shrinkable and remaining >= MIN_SHRINK_TOKENS:
+            small = _shrink(s, remaining)
+            if small.tokens <= remaining:
+                kept.append((i, small))
+                out.used_tokens += small.tokens
+                out.truncated.append(s.key)
+                continue
+
+        out.dropped.append(s)
+        if s.contiguous:
+            broken_groups.add(s.group)
+
+    out.kept = [s for _, s in sorted(kept, key=lambda x: (x[1].order, x[0]))]
+    return out
+
+
+def merge(*parts: Packed) -> Packed:
+    out = Packed(budget=sum(p.budget for p in parts))
+    for p in parts:
+        out.used_tokens += p.used_tokens
+        out.kept.extend(p.kept)
+        out.dropped.extend(p.dropped)
+        out.truncated.extend(p.truncated)
+    return out
@@ -0,0 +1,227 @@
+from __future__ import annotations
+import json, logging, re, time, zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from documents.models import CombinedSummary, Document, DocumentChunk
+from documents.services.storage.s3 import s3_client
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 256 * 1024
+TEXT_SLICE = 64 * 1024
+
+
+class _ZipSink:
+    """
+    ปลายทางของ ZipFile แบบ seek ไม่ได้: เก็บ bytes ที่ถูกเขียนไว้จนกว่า generator จะ drain ออกไป
+    ZipFile จะใช้ data descriptor แทนการย้อนกลับไปแก้ header
+    """
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+
+def _concurrency() -> int:
+    return max(1, int(getattr(settings, "EXPORT_ZIP_CONCURRENCY", 4)))
+
+
+def _safe_name(name: str) -> str:
+    name = re.sub(r"[\\/\x00-\x1f]", "_", (name or "").strip())
+    return name or "file"
+
+
+# -------------------------
+# progress
+# -------------------------
+def progress_key(user_id: int, export_id: str) -> str:
+    return f"notebook_export:{user_id}:{export_id}"
+
+def get_progress(user_id: int, export_id: str) -> dict | None:
+    return cache.get(progress_key(user_id, export_id))
+
+def _set_progress(user_id: int, export_id: str, **data):
+    if export_id:
+        cache.set(progress_key(user_id, export_id), {**data, "updated_at": time.time()}, timeout=3600)
+
+
+# -------------------------
+# storage
+# -------------------------
+def _open_object(name: str):
+    """
+    เปิด object ต้นฉบับแบบ stream (ยังไม่อ่าน body) -> คืน iterator ของ bytes
+    S3: get_object แล้วใช้ StreamingBody.iter_chunks, อย่างอื่น: default_storage.open().chunks()
+    """
+    bucket = getattr(settings, "AWS_STORAGE_BUCKET_NAME", "")
+    if bucket:
+        body = s3_client().get_object(Bucket=bucket, Key=name)["Body"]
+        return body.iter_chunks(chunk_size=READ_CHUNK), body.close
+
+    f = default_storage.open(name, "rb")
+    return f.chunks(chunk_size=READ_CHUNK), f.close
+
+
+def _open_object_safe(name: str):
+    try:
+        return _open_object(name), None
+    except Exception as e:
+        return None, e
+
+
+def _close_pending(pending) -> None:
+    """
+    ทิ้งไฟล์ที่เปิดล่วงหน้าแต่ยังไม่ได้ stream (client ตัดการเชื่อมต่อ / error กลางทาง)
+    future ที่ยังไม่เริ่ม -> cancel, ที่เริ่มแล้ว -> รอให้เปิดเสร็จแล้วปิด body (ไม่งั้น connection ของ S3 ค้าง)
+    """
+    while pending:
+        _, fut = pending.popleft()
+        if fut is None or fut.cancel():
+            continue
+        opened, _ = fut.result()
+        if opened is not None:
+            try:
+                opened[1]()
+            except Exception:
+                pass
+
+
+# -------------------------
+# zip stream
+# -------------------------
+def _write_text(zf: zipfile.ZipFile, sink: _ZipSink, arcname: str, text: str) -> Iterator[bytes]:
+    with zf.open(arcname, "w", force_zip64=True) as entry:
+        for i in range(0, len(text), TEXT_SLICE):
+            entry.write(text[i:i + TEXT_SLICE].encode("utf-8"))
+            yield sink.drain()
+
+
+def stream_notebook_zip(cs: CombinedSummary, *, user_id: int, export_id: str = "") -> Iterator[bytes]:
+    """
+    zip ของ notebook แบบ stream:
+    - notebook.md / manifest.json
+    - files/      ไฟล์ต้นฉบับ (ดึงจาก storage ล่วงหน้าแบบขนานได้สูงสุด EXPORT_ZIP_CONCURRENCY ไฟล์)
+    - text/       extracted_text ทีละเอกสาร
+    - summaries/  summary ทีละเอกสาร
+    - chunks/     DocumentChunk เป็น JSONL
+    ไม่มีไฟล์ไหนถูกอ่านทั้งก้อนเข้า memory
+    """
+    docs = list(
+        cs.documents.order_by("id").values("id", "file", "file_name", "document_type", "word_count", "summary")
+    )
+    total = len(docs)
+    sink = _ZipSink()
+    zf = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED)
+    sent = 0
+    done = 0
+    finished = False
+
+    _set_progress(user_id, export_id, status="running", done=0, total=total, bytes=0)
+
+    def emit(b: bytes):
+        nonlocal sent
+        sent += len(b)
+        return b
+
+    try:
+        header = f"# {cs.title}\n\n{(cs.combined_summary or '').strip()}\n"
+        for b in _write_text(zf, sink, "notebook.md", header):
+            yield emit(b)
+
+        manifest = {
+            "notebook": {"id": cs.id, "title": cs.title, "doc_count": cs.doc_count, "total_words": cs.total_words},
+            "documents": [
+                {k: d[k] for k in ("id", "file_name", "document_type", "word_count")} for d in docs
+            ],
+        }
+        for b in _write_text(zf, sink, "manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2)):
+            yield emit(b)
+
+        with ThreadPoolExecutor(max_workers=_concurrency()) as pool:
+            # หน้าต่างของไฟล์ที่เปิดล่วงหน้า: ได้ first byte ขนานกัน แต่ stream ลง zip ทีละไฟล์ตามลำดับ
+            pending = deque()
+            queue = iter(docs)
+
+            def submit_next():
+                d = next(queue, None)
+                if d is not None:
+                    pending.append((d, pool.submit(_open_object_safe, d["file"]) if d["file"] else None))
+
+            for _ in range(_concurrency()):
+                submit_next()
+
+            try:
+                while pending:
+                    d, fut = pending.popleft()
+                    submit_next()
+
+                    prefix = f"{d['id']}_{_safe_name(d['file_name'])}"
+
+                    if fut is not None:
+                        opened, err = fut.result()
+                        if opened is None:
+                            logger.warning("notebook export: cannot open %s: %s", d["file"], err)
+                            for b in _write_text(zf, sink, f"files/{prefix}.error.txt", str(err)):
+                                yield emit(b)
+                        else:
+                            chunks, close = opened
+                            try:
+                                with zf.open(f"files/{prefix}", "w", force_zip64=True) as entry:
+                                    for part in chunks:
+                                        entry.write(part)
+                                        yield emit(sink.drain())
+                            finally:
+                                close()
+
+                    text = Document.objects.filter(id=d["id"]).values_list("extracted_text", flat=True).first() or ""
+                    for b in _write_text(zf, sink, f"text/{prefix}.txt", text):
+                        yield emit(b)
+                    del text
+
+                    for b in _write_text(zf, sink, f"summaries/{prefix}.txt", d["summary"] or ""):
+                        yield emit(b)
+
+                    with zf.open(f"chunks/{prefix}.jsonl", "w", force_zip64=True) as entry:
+                        rows = DocumentChunk.objects.filter(document_id=d["id"]).order_by("idx").values_list("idx", "content")
+                        for idx, content in rows.iterator(chunk_size=200):
+                            line = json.dumps({"document_id": d["id"], "idx": idx, "content": content}, ensure_ascii=False)
+                            entry.write((line + "\n").encode("utf-8"))
+                            yield emit(sink.drain())
+
+                    done += 1
+                    _set_progress(user_id, export_id, status="running", done=done, total=total, bytes=sent)
+            finally:
+                _close_pending(pending)
+
+        zf.close()
+        yield emit(sink.drain())
+        _set_progress(user_id, export_id, status="done", done=total, total=total, bytes=sent)
+        finished = True
+
+    except Exception as e:
+        logger.exception("notebook export failed: %s", e)
+        _set_progress(user_id, export_id, status="error", error=str(e), total=total, bytes=sent)
+        finished = True
+        raise
+    finally:
+        # client ตัดการเชื่อมต่อ -> GeneratorExit (ไม่ใช่ Exception) ไม่งั้น progress ค้าง "running" จน cache หมดอายุ
+        if not finished:
+            _set_progress(user_id, export_id, status="aborted", done=done, total=total, bytes=sent)
+        connection.close_if_unusable_or_obsolete()
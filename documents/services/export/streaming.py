@@ -0,0 +1,88 @@
+from __future__ import annotations
+import csv, json
+from itertools import islice
+from typing import Iterator
+
+from django.conf import settings
+
+from documents.models import DocumentChunk
+from documents.services.search.document_query import DocumentFilters, filtered_documents
+
+BASE_COLUMNS = ["id", "file_name", "document_type", "word_count", "char_count", "summary", "uploaded_at"]
+
+
+class _Echo:
+    """file-like ที่คืนค่าที่เขียนกลับมาเลย (ให้ csv.writer ใช้กับ generator ได้)"""
+    def write(self, value):
+        return value
+
+
+def _batch_size(include_text: bool = False) -> int:
+    # มี extracted_text ต่อแถว -> batch เล็กลงเพื่อคุม memory
+    if include_text:
+        return int(getattr(settings, "EXPORT_TEXT_BATCH_SIZE", 50))
+    return int(getattr(settings, "EXPORT_BATCH_SIZE", 500))
+
+
+def _columns(include_text: bool) -> list[str]:
+    return BASE_COLUMNS + (["extracted_text"] if include_text else [])
+
+
+def iter_document_rows(owner, f: DocumentFilters, *, include_text: bool = False) -> Iterator[tuple]:
+    """
+    ดึงเฉพาะคอลัมน์ที่ export ผ่าน server-side cursor (iterator) -> memory คงที่
+    """
+    cols = _columns(include_text)
+    qs = filtered_documents(owner, f, ranked=False).order_by("-uploaded_at", "-id").values_list(*cols)
+    return qs.iterator(chunk_size=_batch_size(include_text))
+
+
+def stream_csv(owner, f: DocumentFilters, *, include_text: bool = False) -> Iterator[str]:
+    cols = _columns(include_text)
+    writer = csv.writer(_Echo())
+    yield writer.writerow(cols)
+
+    for row in iter_document_rows(owner, f, include_text=include_text):
+        d = dict(zip(cols, row))
+        d["summary"] = (d["summary"] or "").replace("\n", " ").strip()
+        d["uploaded_at"] = d["uploaded_at"].isoformat()
+        yield writer.writerow([d[c] for c in cols])
+
+
+def _jsonl(obj: dict) -> str:
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+def _iter_chunk_lines(doc_ids: list[int]) -> Iterator[str]:
+    qs = (
+        DocumentChunk.objects.filter(document_id__in=doc_ids)
+        .order_by("document_id", "idx")
+        .values_list("document_id", "idx", "content")
+    )
+    for doc_id, idx, content in qs.iterator(chunk_size=_batch_size(include_text=True)):
+        yield _jsonl({"type": "chunk", "document_id": doc_id, "idx": idx, "content": content})
+
+
+def stream_jsonl(owner, f: DocumentFilters, *, include_text: bool = False, include_chunks: bool = False) -> Iterator[str]:
+    """
+    1 บรรทัด = 1 record ({"type": "document"} หรือ {"type": "chunk"})
+    chunk ของเอกสารแต่ละ batch ตามหลัง document ของ batch นั้น
+    memory ขึ้นกับขนาด batch ไม่ใช่จำนวนเอกสารทั้งหมด
+    """
+    cols = _columns(include_text)
+    rows = iter_document_rows(owner, f, include_text=include_text)
+
+    while True:
+        batch = list(islice(rows, _batch_size(include_text)))
+        if not batch:
+            break
+
+        ids = []
+        for row in batch:
+            d = dict(zip(cols, row))
+            d["uploaded_at"] = d["uploaded_at"].isoformat()
+            ids.append(d["id"])
+            yield _jsonl({"type": "document", **d})
+
+        if include_chunks:
+            yield from _iter_chunk_lines(ids)
@@ -0,0 +1,217 @@
+from __future__ import annotations
+import atexit, json, logging, os, threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from documents.models import LLMCallLog
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# buffered LLMCallLog writer
+# - record() แค่ต่อท้าย buffer ใน memory (ไม่แตะ DB บน request path)
+# - thread เบื้องหลัง flush ด้วย bulk_create เมื่อครบ LLM_LOG_BATCH_SIZE หรือทุก LLM_LOG_FLUSH_SECONDS
+# - DB ล่ม -> เขียนลง spool (JSON lines) แล้ว replay ตอน flush ครั้งถัดไปที่สำเร็จ
+# - batch มีแถวเสีย (owner ถูกลบ / ค่าเกิน column) -> insert ทีละแถว ทิ้งเฉพาะแถวที่ใส่ไม่ได้
+# - process จบ -> flush ที่เหลือ (atexit)
+# -------------------------
+
+_lock = threading.Lock()
+_wake = threading.Condition(_lock)
+_buffer: list[dict] = []
+_thread = None
+_pid = None
+
+
+def _enabled() -> bool:
+    return bool(getattr(settings, "LLM_LOG_ASYNC", True))
+
+def _batch_size() -> int:
+    return max(1, int(getattr(settings, "LLM_LOG_BATCH_SIZE", 100)))
+
+def _interval() -> float:
+    return max(0.1, float(getattr(settings, "LLM_LOG_FLUSH_SECONDS", 2.0)))
+
+def spool_path() -> Path:
+    return Path(getattr(settings, "LLM_LOG_SPOOL_PATH", "") or Path(settings.BASE_DIR) / ".llm_log_spool.jsonl")
+
+
+def _row(rec: dict) -> LLMCallLog:
+    return LLMCallLog(**rec)
+
+
+def _to_json(rec: dict) -> str:
+    out = dict(rec)
+    out["created_at"] = rec["created_at"].isoformat()
+    return json.dumps(out, ensure_ascii=False)
+
+
+def _from_json(line: str) -> dict:
+    rec = json.loads(line)
+    rec["created_at"] = parse_datetime(rec["created_at"]) or timezone.now()
+    return rec
+
+
+def _insert_one(rec: dict) -> bool:
+    try:
+        _row(rec).save(force_insert=True)
+        return True
+    except IntegrityError:
+        # ส่วนใหญ่คือ owner ถูกลบไประหว่างรอ flush -> เก็บ log ไว้แบบไม่มี owner
+        if rec.get("owner_id") is None:
+            raise
+        _row({**rec, "owner_id": None}).save(force_insert=True)
+        return True
+
+
+def _write_rows(records: list[dict]) -> None:
+    """
+    fallback เมื่อ bulk_create ล้มทั้ง batch เพราะข้อมูล: ทีละแถว
+    แถวที่ยังใส่ไม่ได้ทิ้ง (ถ้า spool ไว้จะ replay ล้มซ้ำทุกรอบ) ส่วน error ของ DB เอง (เช่น connection) โยนต่อให้ spool
+    """
+    dropped = 0
+    for rec in records:
+        try:
+            _insert_one(rec)
+        except (IntegrityError, DataError, TypeError) as e:
+            dropped += 1
+            logger.warning("LLM call log: drop undeliverable record (purpose=%s): %s", rec.get("purpose"), e)
+    if dropped:
+        logger.error("LLM call log: dropped %s of %s records", dropped, len(records))
+
+
+def _write_db(records: list[dict]) -> None:
+    close_old_connections()
+    try:
+        try:
+            # atomic: batch ย่อยที่ insert ไปแล้วต้อง rollback ด้วย ไม่งั้น fallback ทีละแถวจะได้แถวซ้ำ
+            with transaction.atomic():
+                LLMCallLog.objects.bulk_create([_row(r) for r in records], batch_size=500)
+        except (IntegrityError, DataError, TypeError):
+            # TypeError = record จาก spool มี field ที่ model ไม่มีแล้ว
+            _write_rows(records)
+    finally:
+        # thread นี้ไม่ได้อยู่ใน request cycle -> ปิด connection เองกันค้าง
+        connection.close()
+
+
+def _spool(records: list[dict]) -> None:
+    path = spool_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for r in records:
+                f.write(_to_json(r) + "\n")
+    except OSError as e:
+        logger.error("LLM call log: cannot spool %s records to %s: %s", len(records), path, e)
+
+
+def replay_spool() -> int:
+    """
+    ย้าย record จาก spool เข้า DB (ล้มเหลว -> ไฟล์ยังอยู่ ลองใหม่รอบหน้า)
+    """
+    path = spool_path()
+    if not path.exists():
+        return 0
+    work = path.with_suffix(f".{os.getpid()}.replay")
+    try:
+        os.replace(path, work)
+    except OSError:
+        return 0
+
+    records = []
+    with open(work, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(_from_json(line))
+            except (ValueError, KeyError):
+                logger.warning("LLM call log: skip bad spool line")
+
+    try:
+        if records:
+            _write_db(records)
+    except Exception as e:
+        logger.warning("LLM call log: replay failed, keep spool: %s", e)
+        _spool(records)
+        work.unlink(missing_ok=True)
+        return 0
+
+    work.unlink(missing_ok=True)
+    return len(records)
+
+
+def flush() -> int:
+    with _lock:
+        records = _buffer[:]
+        _buffer.clear()
+    if not records:
+        return 0
+
+    try:
+        _write_db(records)
+    except Exception as e:
+        logger.warning("LLM call log: DB unavailable, spooling %s records: %s", len(records), e)
+        _spool(records)
+        return 0
+
+    replay_spool()
+    return len(records)
+
+
+def _run() -> None:
+    while True:
+        with _wake:
+            _wake.wait_for(lambda: len(_buffer) >= _batch_size(), timeout=_interval())
+        try:
+            flush()
+        except Exception:
+            logger.exception("LLM call log: flush failed")
+
+
+def _ensure_thread() -> None:
+    global _thread, _pid
+    # หลัง fork (gunicorn preload) thread ของ parent ไม่ตามมา -> เริ่มใหม่ต่อ pid
+    if _thread is not None and _pid == os.getpid() and _thread.is_alive():
+        return
+    with _lock:
+        if _thread is not None and _pid == os.getpid() and _thread.is_alive():
+            return
+        _pid = os.getpid()
+        _thread = threading.Thread(target=_run, name="llm-call-log", daemon=True)
+        _thread.start()
+
+
+def record(**fields) -> None:
+    """
+    เก็บ LLMCallLog หนึ่งแถว (owner ส่งเป็น object หรือ owner_id ก็ได้)
+    """
+    owner = fields.pop("owner", None)
+    if owner is not None and "owner_id" not in fields:
+        fields["owner_id"] = getattr(owner, "id", None)
+    fields.setdefault("created_at", timezone.now())
+
+    if not _enabled():
+        _row(fields).save()
+        return
+
+    _ensure_thread()
+    with _wake:
+        _buffer.append(fields)
+        if len(_buffer) >= _batch_size():
+            _wake.notify()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if _buffer:
+        try:
+            flush()
+        except Exception:
+            logger.exception("LLM call log: flush at exit failed")
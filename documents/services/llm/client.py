@@ -1,9 +1,11 @@
 from __future__ import annotations
-import boto3, time, json, logging
-from botocore.config import Config
-from typing import Any, Dict, Iterator
-from documents.models import LLMCallLog
+import asyncio, threading, time, json, logging
+from typing import Any, AsyncIterator, Dict, Iterator, Tuple
 
+from asgiref.sync import sync_to_async
+
+from documents.services.llm.clients import bedrock_runtime, ollama_client, ollama_async_client, stream_executor
+from documents.services.llm import call_log, limiter, mock_provider, profiles, response_cache, router, tokens
 from documents.services.llm.guardrails import check_daily_limit, incr_daily_limit
 from documents.services.llm.token_ledger import can_spend, spend, _normalize_purpose
 
@@ -17,31 +19,40 @@ class LLMError(Exception):
 # -------------------------
 # Bedrock (Claude 3) client
 # -------------------------
-def _bedrock_runtime():
-    region = getattr(settings, "AWS_REGION", "us-east-1")
-    cfg = Config(
-        retries={"max_attempts": 3, "mode": "standard"},
-        connect_timeout=5,
-        read_timeout=60,
-    )
-    return boto3.client("bedrock-runtime", region_name=region, config=cfg)
+def _bedrock_runtime(timeout: float | None = None):
+    # client ถูก cache ต่อ process (ดู clients.py)
+    return bedrock_runtime(timeout)
 
 
-def _bedrock_model_id() -> str:
-    # ใช้ inference profile ARN เป็น modelId ได้เลย
-    model_id = getattr(settings, "BEDROCK_INFERENCE_PROFILE_ARN", "") or ""
+def _bedrock_model_id(prof: profiles.Profile | None = None) -> str:
+    # ใช้ inference profile ARN เป็น modelId ได้เลย (profile "fast" -> BEDROCK_FAST_MODEL_ID ถ้าตั้งไว้)
+    model_id = profiles.model_for("bedrock", prof or profiles.get_profile("default"))
     if not model_id:
         raise LLMError("Missing BEDROCK_INFERENCE_PROFILE_ARN in settings.")
     return model_id
 
-def _build_claude_payload(system: str, user: str, *, max_tokens: int, temperature: float) -> Dict[str, Any]:
+def _system_blocks(system: str, context: str) -> Any:
+    """
+    context = ส่วน prompt ที่ซ้ำทุก turn (เช่น summary ของ notebook) ต่อท้าย system
+    ยาวพอ -> ใส่ cache_control ให้ Bedrock cache prefix (system + context) ไว้ใช้ call ถัดไป
+    """
+    if not context:
+        return system or ""
+    block = {"type": "text", "text": context}
+    if getattr(settings, "BEDROCK_PROMPT_CACHE", True) and _estimate_tokens(_flat_system(system, context)) >= int(
+        getattr(settings, "BEDROCK_PROMPT_CACHE_MIN_TOKENS", 1024)
+    ):
+        block["cache_control"] = {"type": "ephemeral"}
+    return [{"type": "text", "text": system or ""}, block]
+
+def _build_claude_payload(system: str, user: str, *, max_tokens: int, temperature: float, context: str = "", stop=()) -> Dict[str, Any]:
     # Claude 3.5 on Bedrock uses "anthropic_version": "bedrock-2023-05-31"
     # messages[].content is an array of blocks
-    return {
+    payload = {
         "anthropic_version": "bedrock-2023-05-31",
         "max_tokens": max_tokens,
         "temperature": temperature,
-        "system": system or "",
+        "system": _system_blocks(system, context),
         "messages": [
             {
                 "role": "user",
@@ -49,6 +60,12 @@ def _build_claude_payload(system: str, user: str, *, max_tokens: int, temperatur
             }
         ],
     }
+    # Bedrock (Claude) ไม่รับ stop sequence ที่เป็น whitespace ล้วน (เช่น "\n") -> ตัดทิ้ง
+    # งานที่ต้องจบในบรรทัดเดียวพึ่ง max_tokens ของ profile แทน (Ollama ยังได้ stop ครบ)
+    stop = [s for s in (stop or ()) if s and s.strip()]
+    if stop:
+        payload["stop_sequences"] = stop
+    return payload
 
 def _extract_claude_text(resp_json: Dict[str, Any]) -> str:
     # Typically: {"content":[{"type":"text","text":"..."}], ...}
@@ -60,22 +77,70 @@ def _extract_claude_text(resp_json: Dict[str, Any]) -> str:
     return ("".join(parts)).strip()
 
 def _estimate_tokens(text: str) -> int:
-    # heuristic: 1 token ~ 4 chars (คร่าว ๆ)
-    t = (text or "").strip()
-    return max(1, len(t) // 4)
+    # ประมาณแยกตามชนิดตัวอักษร (ไทยใช้ token ต่อตัวอักษรมากกว่าอังกฤษมาก) ดู tokens.py
+    return max(1, tokens.estimate_tokens((text or "").strip()))
+
+def _estimate_prompt_tokens(system: str, user: str) -> int:
+    return tokens.estimate_prompt_tokens(system or "", user or "")
+
+def _flat_system(system: str, context: str) -> str:
+    # system + context เป็นข้อความเดียว (ใช้ประมาณ token / cache key / provider ที่ไม่มี block)
+    return f"{system or ''}\n\n{context}" if context else (system or "")
+
+def _bedrock_body(system: str, user: str, context: str = "", prof: profiles.Profile | None = None) -> Dict[str, Any]:
+    prof = prof or profiles.get_profile("default")
+    return _build_claude_payload(
+        system, user, max_tokens=prof.max_tokens, temperature=prof.temperature, context=context, stop=prof.stop,
+    )
+
+def _usage_fields(usage: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    usage ของ Anthropic: input_tokens ไม่รวมส่วนที่อ่าน/เขียน prompt cache
+    -> input_tokens ใน log = ทั้งหมด, แยก cache_read/cache_write ไว้ดูผลของ cache
+    """
+    read = int(usage.get("cache_read_input_tokens") or 0)
+    write = int(usage.get("cache_creation_input_tokens") or 0)
+    return {
+        "input_tokens": int(usage.get("input_tokens") or 0) + read + write,
+        "output_tokens": int(usage.get("output_tokens") or 0),
+        "cache_read_tokens": read,
+        "cache_write_tokens": write,
+        "stop_reason": str(usage.get("stop_reason") or "")[:30],
+    }
 
 # -------------------------
 # Ollama client (fallback)
 # -------------------------
-def _ollama_client():
-    import ollama
-    host = getattr(settings, "OLLAMA_HOST", "http://localhost:11434")
-    return ollama.Client(host=host)
+def _ollama_client(timeout: float | None = None):
+    # client ถูก cache ต่อ thread (ดู clients.py)
+    return ollama_client(timeout)
+
+def _ollama_options(prof: profiles.Profile) -> Dict[str, Any]:
+    opts = {"temperature": prof.temperature, "num_predict": prof.max_tokens}
+    if prof.stop:
+        opts["stop"] = list(prof.stop)
+    return opts
+
+def _ollama_messages(system: str, user: str, context: str = "") -> list[dict]:
+    # prefix (system + context) เหมือนเดิมทุก turn -> Ollama ใช้ KV cache ของ prefix ซ้ำได้ถ้า model ยังโหลดอยู่
+    return [
+        {"role": "system", "content": _flat_system(system, context)},
+        {"role": "user", "content": user},
+    ]
+
+def _ollama_keep_alive():
+    # ให้ model (และ prompt cache) อยู่ใน memory ระหว่าง turn ของ chat
+    return getattr(settings, "OLLAMA_KEEP_ALIVE", "30m") or None
 
 
 def _provider() -> str:
     return (getattr(settings, "LLM_PROVIDER", "") or "ollama").lower().strip()
 
+def _model_id(prov: str, prof: profiles.Profile | None = None) -> str:
+    if prov == "bedrock":
+        return _bedrock_model_id(prof)
+    return profiles.model_for(prov, prof or profiles.get_profile("default"))
+
 def _enforce_daily_limit(owner, purpose: str):
     if not owner or not getattr(owner, "id", None):
         return
@@ -84,254 +149,420 @@ def _enforce_daily_limit(owner, purpose: str):
     if not check_daily_limit(owner.id, purpose):
         raise LLMError("Daily LLM limit reached. Please try again tomorrow.")
 
-def generate_text(system: str, user: str, *, owner=None, purpose="") -> str:
-    prov = _provider()
-    t0 = time.time()
-    
+def _precheck(system: str, user: str, *, owner, purpose: str) -> None:
     _enforce_daily_limit(owner, purpose)
 
     # ---- precheck (token budget) ----
     if owner and getattr(owner, "id", None):
-        est_in = _estimate_tokens((system or "") + "\n" + (user or ""))
+        est_in = _estimate_prompt_tokens(system, user)
         logger.info("LLM precheck user=%s purpose=%s norm=%s est_in=%s",
                     getattr(owner, "id", None), purpose, _normalize_purpose(purpose), est_in)
         if not can_spend(owner.id, purpose, est_in):
             raise LLMError("Token budget is low or exhausted for this feature. Please try again tomorrow.")
-    
+
+def _settle(owner, purpose: str, tokens: int) -> None:
+    if owner and getattr(owner, "id", None):
+        incr_daily_limit(owner.id, purpose)
+        spend(owner.id, purpose, tokens)
+
+def _input_profile(system: str, user: str) -> dict:
+    return tokens.merge_profiles(tokens.char_profile(system), tokens.char_profile(user))
+
+def _log(owner, prov: str, model_id: str, purpose: str, t0: float, prof: profiles.Profile | None = None, **fields) -> None:
+    if prof is not None:
+        fields.setdefault("profile", prof.name)
+        fields.setdefault("gen_params", prof.as_log())
+    # ไม่เขียน DB ตรงนี้: ต่อคิวให้ call_log flush เป็น batch เบื้องหลัง
+    call_log.record(
+        owner=owner,
+        provider=prov,
+        model_id=model_id,
+        purpose=purpose,
+        latency_ms=int((time.time() - t0) * 1000),
+        **fields,
+    )
+
+
+# -------------------------
+# provider calls (ไม่มี log / budget -> ทำที่ generate_* )
+# -------------------------
+def _complete(prov: str, system: str, user: str, context: str, prof: profiles.Profile) -> Tuple[str, Dict[str, Any]]:
+    """
+    คืน (text, usage) usage = input_tokens / output_tokens / cache_read_tokens / cache_write_tokens / stop_reason
+    """
     if prov == "bedrock":
-        model_id = _bedrock_model_id()
+        resp = _bedrock_runtime(prof.timeout).invoke_model(
+            modelId=_bedrock_model_id(prof),
+            body=json.dumps(_bedrock_body(system, user, context, prof)).encode("utf-8"),
+            contentType="application/json",
+            accept="application/json",
+        )
+        data = json.loads(resp["body"].read().decode("utf-8"))
+        return _extract_claude_text(data), _usage_fields({**(data.get("usage") or {}), "stop_reason": data.get("stop_reason")})
+
+    if prov == "mock":
+        return mock_provider.complete(_flat_system(system, context), user)
+
+    resp = _ollama_client(prof.timeout).chat(
+        model=_model_id(prov, prof),
+        messages=_ollama_messages(system, user, context),
+        options=_ollama_options(prof),
+        keep_alive=_ollama_keep_alive(),
+    )
+    text = (resp.get("message", {}).get("content") or "").strip()
+    return text, {
+        "input_tokens": _estimate_prompt_tokens(_flat_system(system, context), user),
+        "output_tokens": _estimate_tokens(text),
+        "stop_reason": str(resp.get("done_reason") or "")[:30],
+    }
+
+
+def _bedrock_stream_text(stream, usage: Dict[str, Any] | None = None) -> Iterator[str]:
+    # event stream ของ invoke_model_with_response_stream -> เฉพาะ text delta
+    # usage (ถ้าส่ง dict มา) ถูกเติมจาก message_start / message_delta
+    for event in stream:
+        chunk = event.get("chunk")
+        if not chunk:
+            continue
+        b = chunk.get("bytes")
+        if not b:
+            continue
+
         try:
-            client = _bedrock_runtime()
-            max_tokens = int(getattr(settings, "BEDROCK_MAX_TOKENS", 800))
-            temperature = float(getattr(settings, "BEDROCK_TEMPERATURE", 0.2))
+            payload = json.loads(b.decode("utf-8"))
+        except Exception:
+            continue
+
+        if usage is not None:
+            if payload.get("type") == "message_start":
+                usage.update((payload.get("message") or {}).get("usage") or {})
+            elif payload.get("type") == "message_delta":
+                usage.update(payload.get("usage") or {})
+                usage["stop_reason"] = (payload.get("delta") or {}).get("stop_reason")
+
+        if payload.get("type") == "content_block_delta":
+            delta = payload.get("delta") or {}
+            if delta.get("type") == "text_delta":
+                text = delta.get("text") or ""
+                if text:
+                    yield text
+
+
+def _stream_tokens(prov: str, system: str, user: str, context: str, prof: profiles.Profile, usage: Dict[str, Any] | None = None) -> Iterator[str]:
+    if prov == "bedrock":
+        resp = _bedrock_runtime(prof.timeout).invoke_model_with_response_stream(
+            modelId=_bedrock_model_id(prof),
+            body=json.dumps(_bedrock_body(system, user, context, prof)).encode("utf-8"),
+            contentType="application/json",
+            accept="application/json",
+        )
+        stream = resp.get("body")
+        if stream:
+            yield from _bedrock_stream_text(stream, usage)
+        return
 
-            body = _build_claude_payload(system, user, max_tokens=max_tokens, temperature=temperature)
-            resp = client.invoke_model(
-                modelId=model_id,
-                body=json.dumps(body).encode("utf-8"),
-                contentType="application/json",
-                accept="application/json",
-            )
+    if prov == "mock":
+        yield from mock_provider.stream(_flat_system(system, context), user)
+        return
 
-            raw = resp["body"].read()
-            data = json.loads(raw.decode("utf-8"))
-            text = _extract_claude_text(data)
-            
-            if owner and getattr(owner, "id", None):
-                incr_daily_limit(owner.id, purpose)
-
-            usage = data.get("usage") or {}
-            in_tok = int(usage.get("input_tokens") or 0)
-            out_tok = int(usage.get("output_tokens") or 0)
-
-            if owner and getattr(owner, "id", None):
-                spend(owner.id, purpose, in_tok + out_tok)
-                
-            LLMCallLog.objects.create(
-                owner=owner,
-                provider="bedrock",
-                model_id=model_id,
-                purpose=purpose,
-                ok=True,
-                latency_ms=int((time.time() - t0) * 1000),
-                input_tokens=in_tok,
-                output_tokens=out_tok,
-            )
-            return text
+    stream = _ollama_client(prof.timeout).chat(
+        model=_model_id(prov, prof),
+        messages=_ollama_messages(system, user, context),
+        options=_ollama_options(prof),
+        stream=True,
+        keep_alive=_ollama_keep_alive(),
+    )
+    for part in stream:
+        chunk = (part.get("message", {}) or {}).get("content") or ""
+        if chunk:
+            yield chunk
+
+
+# -------------------------
+# public
+# -------------------------
+def _response_cache_key(prov: str, system: str, user: str, purpose: str, prof: profiles.Profile) -> str:
+    # คืน "" ถ้า call นี้ไม่ควร cache (purpose ไม่ได้ opt-in / temperature สูง / ปิด cache)
+    if not response_cache.is_cacheable(purpose, prof.temperature):
+        return ""
+    return response_cache.cache_key(
+        provider=prov, model=_model_id(prov, prof), system=system, user=user,
+        temperature=prof.temperature, max_tokens=prof.max_tokens, purpose=purpose, stop=prof.stop,
+    )
+
+def _stream_usage(usage: Dict[str, Any], est_in: int, out_parts: list[str]) -> Dict[str, Any]:
+    # Bedrock ส่ง usage มากับ message_start/message_delta; ไม่มี (Ollama) -> ประมาณเอง
+    if usage.get("input_tokens"):
+        return _usage_fields(usage)
+    return {"input_tokens": est_in, "output_tokens": _estimate_tokens("".join(out_parts))}
+
+def _cancelled_usage(usage: Dict[str, Any], est_in: int, out_parts: list[str]) -> Dict[str, Any]:
+    # ปิดก่อน message_delta (ที่มี output_tokens จริง) -> output ประมาณจากข้อความที่ได้มาแล้ว
+    used = _stream_usage(usage, est_in, out_parts)
+    if out_parts:
+        used["output_tokens"] = max(used.get("output_tokens") or 0, _estimate_tokens("".join(out_parts)))
+    used["stop_reason"] = "cancelled"
+    return used
+
+def generate_text(
+    system: str, user: str, *, owner=None, purpose="", cache=True, context: str = "",
+    profile: str = "", max_tokens: int | None = None,
+) -> str:
+    """
+    cache=False: บังคับเรียก model จริง (เช่น regenerate ที่ต้องการคำตอบใหม่)
+    context: ส่วนที่เหมือนเดิมทุก call (ต่อท้าย system) -> provider cache prefix นี้ได้
+    profile: ชื่อ generation profile (ว่าง = ใช้ชื่อ purpose) ดู profiles.py; max_tokens override ของ call นี้
+    provider เลือกผ่าน router: primary = LLM_PROVIDER, fallback = LLM_FALLBACK_PROVIDERS
+    """
+    prov = _provider()
+    t0 = time.time()
+    flat_system = _flat_system(system, context)
+    prof = profiles.get_profile(profile or purpose).with_max_tokens(max_tokens)
+
+    # ---- response cache (ไม่นับ daily limit / token budget เพราะไม่ได้เรียก model) ----
+    ckey = _response_cache_key(prov, flat_system, user, purpose, prof) if cache else ""
+    if ckey:
+        hit = response_cache.lookup(ckey)
+        if hit is not None:
+            _log(owner, prov, _model_id(prov, prof), purpose, t0, prof=prof, ok=True, cache_hit=True, input_tokens=0, output_tokens=0)
+            return hit.text
+
+    _precheck(flat_system, user, owner=owner, purpose=purpose)
 
+    est_in = _estimate_prompt_tokens(flat_system, user)
+
+    def attempt(p: str) -> str:
+        t1 = time.time()
+        model_id = ""
+        wait_ms = 0
+        try:
+            model_id = _model_id(p, prof)
+            with limiter.acquire(p, est_in) as lease:
+                wait_ms = lease.queue_wait_ms
+                text, usage = _complete(p, system, user, context, prof)
+                in_tok, out_tok = usage["input_tokens"], usage["output_tokens"]
+                lease.used_tokens = in_tok + out_tok
+        except limiter.QueueTimeout as e:
+            _log(owner, p, model_id, purpose, t1, prof=prof, ok=False, error=str(e), queue_wait_ms=int((time.time() - t1) * 1000))
+            raise
         except Exception as e:
-            LLMCallLog.objects.create(
-                owner=owner,
-                provider="bedrock",
-                model_id=model_id,
-                purpose=purpose,
-                ok=False,
-                error=str(e),
-                latency_ms=int((time.time() - t0) * 1000),
-            )
+            _log(owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof, ok=False, error=str(e), queue_wait_ms=wait_ms)
             raise LLMError(str(e)) from e
 
-    model = getattr(settings, "OLLAMA_MODEL", "llama3")
-    try:
-        resp = _ollama_client().chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            options={"temperature": 0.2},
-        )
-        text = (resp.get("message", {}).get("content") or "").strip()
-        in_tok = _estimate_tokens((system or "") + "\n" + (user or ""))
-        out_tok = _estimate_tokens(text)
-
-        if owner and getattr(owner, "id", None):
-            incr_daily_limit(owner.id, purpose)
-            spend(owner.id, purpose, in_tok + out_tok)
-
-        LLMCallLog.objects.create(
-            owner=owner,
-            provider="ollama",
-            model_id=model,
-            purpose=purpose,
-            ok=True,
-            latency_ms=int((time.time() - t0) * 1000),
-            input_tokens=in_tok,
-            output_tokens=out_tok
+        _settle(owner, purpose, in_tok + out_tok)
+        _log(
+            owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof,
+            ok=True, queue_wait_ms=wait_ms, **usage,
+            # usage ของ Bedrock เป็นค่าจริง -> เก็บ profile ไว้ calibrate (Ollama เป็นค่าประมาณ)
+            input_profile=_input_profile(flat_system, user) if p == "bedrock" and in_tok else None,
         )
+        # key ผูกกับ provider/model ที่ตอบจริง: คำตอบจาก fallback ไม่ไปอยู่ใต้ key ของ primary
+        pkey = ckey if p == prov else (_response_cache_key(p, flat_system, user, purpose, prof) if ckey else "")
+        if pkey:
+            response_cache.store(
+                pkey, response_cache.CachedResponse(text, in_tok, out_tok),
+                purpose=purpose, provider=p, model=model_id,
+            )
         return text
 
-    except Exception as e:
-        LLMCallLog.objects.create(
-            owner=owner,
-            provider="ollama",
-            model_id=model,
-            purpose=purpose,
-            ok=False,
-            error=str(e),
-            latency_ms=int((time.time() - t0) * 1000),
-        )
+    try:
+        return router.call(prov, attempt)
+    except (router.ProviderUnavailable, limiter.QueueTimeout) as e:
         raise LLMError(str(e)) from e
 
 
-def generate_text_stream(system: str, user: str, *, owner=None, purpose="") -> Iterator[str]:
+def generate_text_stream(system: str, user: str, *, owner=None, purpose="", context: str = "", profile: str = "") -> Iterator[str]:
     prov = _provider()
-    t0 = time.time()
+    flat_system = _flat_system(system, context)
+    prof = profiles.get_profile(profile or purpose)
 
-    _enforce_daily_limit(owner, purpose)
+    _precheck(flat_system, user, owner=owner, purpose=purpose)
 
-    # ---- precheck (token budget) ----
-    if owner and getattr(owner, "id", None):
-        est_in = _estimate_tokens((system or "") + "\n" + (user or ""))
-        logger.info("LLM precheck user=%s purpose=%s norm=%s est_in=%s",
-                    getattr(owner, "id", None), purpose, _normalize_purpose(purpose), est_in)
-        if not can_spend(owner.id, purpose, est_in):
-            raise LLMError("Token budget is low or exhausted for this feature. Please try again tomorrow.")
+    # ใช้จองโควตา; token จริงมาจาก usage ใน event stream (Bedrock) หรือประมาณ (Ollama)
+    est_in = _estimate_prompt_tokens(flat_system, user)
 
-    # ---- Bedrock streaming ----
-    if prov == "bedrock":
-        model_id = _bedrock_model_id()
+    def attempt(p: str) -> Iterator[str]:
+        t1 = time.time()
+        model_id = ""
+        wait_ms = 0
+        out_parts = []
+        usage: Dict[str, Any] = {}
+        try:
+            model_id = _model_id(p, prof)
+            with limiter.acquire(p, est_in) as lease:
+                wait_ms = lease.queue_wait_ms
+                for text in _stream_tokens(p, system, user, context, prof, usage):
+                    lease.on_token()
+                    out_parts.append(text)
+                    yield text
+                used = _stream_usage(usage, est_in, out_parts)
+                lease.used_tokens = used["input_tokens"] + used["output_tokens"]
+        except GeneratorExit:
+            # stream ถูกปิดกลางทาง (hedge ที่แพ้ / client ตัดการเชื่อมต่อ) -> token ที่ใช้ไปแล้วยังต้องนับงบและ log
+            used = _cancelled_usage(usage, est_in, out_parts)
+            _settle(owner, purpose, used["input_tokens"] + used["output_tokens"])
+            _log(owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof, ok=True, queue_wait_ms=wait_ms, **used)
+            raise
+        except limiter.QueueTimeout as e:
+            _log(owner, p, model_id, purpose, t1, prof=prof, ok=False, error=str(e), queue_wait_ms=int((time.time() - t1) * 1000))
+            raise
+        except Exception as e:
+            _log(owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof, ok=False, error=str(e), queue_wait_ms=wait_ms)
+            raise LLMError(str(e)) from e
 
-        # จะใช้ประมาณ token เพราะ stream ไม่ได้คืน usage ให้แบบตรง ๆ
-        est_in = _estimate_tokens((system or "") + "\n" + (user or ""))
-        est_out_acc = 0
+        _settle(owner, purpose, used["input_tokens"] + used["output_tokens"])
+        _log(owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof, ok=True, queue_wait_ms=wait_ms, **used)
 
-        try:
-            client = _bedrock_runtime()
-            max_tokens = int(getattr(settings, "BEDROCK_MAX_TOKENS", 800))
-            temperature = float(getattr(settings, "BEDROCK_TEMPERATURE", 0.2))
+    try:
+        yield from router.stream(prov, attempt)
+    except (router.ProviderUnavailable, limiter.QueueTimeout) as e:
+        raise LLMError(str(e)) from e
 
-            body = _build_claude_payload(system, user, max_tokens=max_tokens, temperature=temperature)
+# -------------------------
+# async streaming (ASGI)
+# -------------------------
+async def _abedrock_stream(client, model_id: str, body: dict, usage: Dict[str, Any] | None = None) -> AsyncIterator[str]:
+    """
+    boto3 ไม่มี async API -> อ่าน event stream ใน thread แล้วส่ง token เข้า asyncio.Queue
+    ฝั่ง event loop รอ queue อย่างเดียว (ไม่กิน thread ของ worker ระหว่างรอ token)
+    thread มาจาก stream_executor() (LLM_ASYNC_POOL_SIZE) ไม่ใช่ default executor ที่จำกัดไว้ราว 32 thread
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
 
+    def put(item):
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def worker():
+        stream = None
+        try:
             resp = client.invoke_model_with_response_stream(
                 modelId=model_id,
                 body=json.dumps(body).encode("utf-8"),
                 contentType="application/json",
                 accept="application/json",
             )
-
             stream = resp.get("body")
-            if not stream:
-                return
-
-            for event in stream:
-                chunk = event.get("chunk")
-                if not chunk:
-                    continue
-                b = chunk.get("bytes")
-                if not b:
-                    continue
-
+            for text in _bedrock_stream_text(stream or [], usage):
+                if stop.is_set():
+                    break
+                put(text)
+            put(done)
+        except Exception as e:
+            put(e)
+        finally:
+            if stream is not None and stop.is_set():
                 try:
-                    payload = json.loads(b.decode("utf-8"))
+                    stream.close()
                 except Exception:
-                    continue
-
-                t = payload.get("type")
-
-                if t == "content_block_delta":
-                    delta = payload.get("delta") or {}
-                    if delta.get("type") == "text_delta":
-                        text = delta.get("text") or ""
-                        if text:
-                            est_out_acc += _estimate_tokens(text)
-                            yield text
-
-            if owner and getattr(owner, "id", None):
-                incr_daily_limit(owner.id, purpose)
-                spend(owner.id, purpose, est_in + est_out_acc)
-
-            LLMCallLog.objects.create(
-                owner=owner,
-                provider="bedrock",
-                model_id=model_id,
-                purpose=purpose,
-                ok=True,
-                latency_ms=int((time.time() - t0) * 1000),
-                input_tokens=est_in,
-                output_tokens=est_out_acc,
-            )
-            return
+                    pass
+
+    loop.run_in_executor(stream_executor(), worker)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # ยกเลิก (client ตัดการเชื่อมต่อ / cancel) -> ให้ thread หยุดอ่าน stream ที่ token ถัดไป
+        stop.set()
+
+
+async def _astream_tokens(prov: str, system: str, user: str, context: str, prof: profiles.Profile, usage: Dict[str, Any] | None = None) -> AsyncIterator[str]:
+    if prov == "bedrock":
+        parts = _abedrock_stream(
+            _bedrock_runtime(prof.timeout), _bedrock_model_id(prof), _bedrock_body(system, user, context, prof), usage,
+        )
+        try:
+            async for t in parts:
+                yield t
+        finally:
+            await parts.aclose()
+        return
+
+    if prov == "mock":
+        async for t in mock_provider.astream(_flat_system(system, context), user):
+            yield t
+        return
+
+    stream = await ollama_async_client(prof.timeout).chat(
+        model=_model_id(prov, prof),
+        messages=_ollama_messages(system, user, context),
+        options=_ollama_options(prof),
+        stream=True,
+        keep_alive=_ollama_keep_alive(),
+    )
+    async for part in stream:
+        chunk = (part.get("message", {}) or {}).get("content") or ""
+        if chunk:
+            yield chunk
+
 
+async def agenerate_text_stream(system: str, user: str, *, owner=None, purpose="", context: str = "", profile: str = "") -> AsyncIterator[str]:
+    """
+    async ของ generate_text_stream: Ollama ใช้ AsyncClient (httpx async), Bedrock อ่าน stream ใน thread
+    งาน DB/cache (limit, budget, log) ทำผ่าน sync_to_async ก่อนและหลัง stream เท่านั้น
+    failover เหมือนฝั่ง sync (ก่อนได้ token แรก) แต่ไม่ทำ hedging
+    """
+    prov = _provider()
+    flat_system = _flat_system(system, context)
+    prof = profiles.get_profile(profile or purpose)
+
+    await sync_to_async(_precheck)(flat_system, user, owner=owner, purpose=purpose)
+
+    est_in = _estimate_prompt_tokens(flat_system, user)
+
+    async def attempt(p: str) -> AsyncIterator[str]:
+        t1 = time.time()
+        model_id = ""
+        wait_ms = 0
+        out_parts = []
+        usage: Dict[str, Any] = {}
+        stream = None
+        try:
+            model_id = _model_id(p, prof)
+            async with limiter.aacquire(p, est_in) as lease:
+                wait_ms = lease.queue_wait_ms
+                stream = _astream_tokens(p, system, user, context, prof, usage)
+                async for text in stream:
+                    await lease.aon_token()
+                    out_parts.append(text)
+                    yield text
+                used = _stream_usage(usage, est_in, out_parts)
+                lease.used_tokens = used["input_tokens"] + used["output_tokens"]
+        except GeneratorExit:
+            used = _cancelled_usage(usage, est_in, out_parts)
+            await sync_to_async(_settle)(owner, purpose, used["input_tokens"] + used["output_tokens"])
+            await sync_to_async(_log)(
+                owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof, ok=True, queue_wait_ms=wait_ms, **used
+            )
+            raise
+        except limiter.QueueTimeout as e:
+            await sync_to_async(_log)(
+                owner, p, model_id, purpose, t1, prof=prof, ok=False, error=str(e), queue_wait_ms=int((time.time() - t1) * 1000)
+            )
+            raise
         except Exception as e:
-            LLMCallLog.objects.create(
-                owner=owner,
-                provider="bedrock",
-                model_id=model_id,
-                purpose=purpose,
-                ok=False,
-                error=str(e),
-                latency_ms=int((time.time() - t0) * 1000),
+            await sync_to_async(_log)(
+                owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof, ok=False, error=str(e), queue_wait_ms=wait_ms
             )
             raise LLMError(str(e)) from e
+        finally:
+            if stream is not None:
+                await stream.aclose()
 
-    # ---- Ollama streaming ----
-    model = getattr(settings, "OLLAMA_MODEL", "llama3")
-    est_in = _estimate_tokens((system or "") + "\n" + (user or ""))
-    est_out_acc = 0
+        await sync_to_async(_settle)(owner, purpose, used["input_tokens"] + used["output_tokens"])
+        await sync_to_async(_log)(owner, p, model_id, purpose, t1 + wait_ms / 1000, prof=prof, ok=True, queue_wait_ms=wait_ms, **used)
 
     try:
-        stream = _ollama_client().chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            options={"temperature": 0.2},
-            stream=True,
-        )
-
-        for part in stream:
-            chunk = (part.get("message", {}) or {}).get("content") or ""
-            if chunk:
-                est_out_acc += _estimate_tokens(chunk)
-                yield chunk
-
-        if owner and getattr(owner, "id", None):
-            incr_daily_limit(owner.id, purpose)
-            spend(owner.id, purpose, est_in + est_out_acc)
-
-        LLMCallLog.objects.create(
-            owner=owner,
-            provider="ollama",
-            model_id=model,
-            purpose=purpose,
-            ok=True,
-            latency_ms=int((time.time() - t0) * 1000),
-            input_tokens=est_in,
-            output_tokens=est_out_acc,
-        )
-
-    except Exception as e:
-        LLMCallLog.objects.create(
-            owner=owner,
-            provider="ollama",
-            model_id=model,
-            purpose=purpose,
-            ok=False,
-            error=str(e),
-            latency_ms=int((time.time() - t0) * 1000),
-        )
+        async for t in router.astream(prov, attempt):
+            yield t
+    except (router.ProviderUnavailable, limiter.QueueTimeout) as e:
         raise LLMError(str(e)) from e
 
 def generate_json(system: str, user: str) -> Dict[str, Any]:
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import asyncio, os, threading, weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import boto3
+import httpx
+from botocore.config import Config
+from django.conf import settings
+
+# -------------------------
+# provider client registry
+# -------------------------
+# สร้าง client ครั้งเดียวแล้วใช้ซ้ำ: ไม่ต้อง resolve credential / endpoint / เปิด TLS ใหม่ทุก call
+# - boto3 client เป็น thread-safe -> ใช้ร่วมกันทั้ง process
+# - ollama.Client (httpx) แยกต่อ thread -> keep-alive pool ไม่ถูกแย่งกันข้าม thread
+# key มี pid ด้วย: หลัง fork (gunicorn --preload) worker จะสร้าง client ของตัวเอง ไม่ใช้ socket ร่วมกับ parent
+
+_lock = threading.Lock()
+_shared: dict[tuple, object] = {}
+_local = threading.local()
+_per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def _pool_size() -> int:
+    return max(1, int(getattr(settings, "LLM_HTTP_POOL_SIZE", 10)))
+
+def _keepalive_expiry() -> float:
+    return float(getattr(settings, "LLM_HTTP_KEEPALIVE_SECONDS", 30))
+
+def _read_timeout() -> float:
+    return float(getattr(settings, "LLM_READ_TIMEOUT", 60))
+
+
+def _get_shared(key: tuple, factory: Callable[[], object]):
+    key = (os.getpid(),) + key
+    client = _shared.get(key)
+    if client is None:
+        with _lock:
+            client = _shared.get(key)
+            if client is None:
+                client = factory()
+                _shared[key] = client
+    return client
+
+
+def _get_thread_local(key: tuple, factory: Callable[[], object]):
+    clients = getattr(_local, "clients", None)
+    if clients is None or getattr(_local, "pid", None) != os.getpid():
+        clients = _local.clients = {}
+        _local.pid = os.getpid()
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = factory()
+    return client
+
+
+def _get_loop_local(key: tuple, factory: Callable[[], object]):
+    # async client (httpx.AsyncClient) ผูกกับ event loop -> แยกต่อ loop
+    loop = asyncio.get_running_loop()
+    clients = _per_loop.get(loop)
+    if clients is None:
+        clients = _per_loop[loop] = {}
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = factory()
+    return client
+
+
+# -------------------------
+# factories
+# -------------------------
+def new_bedrock_runtime(read_timeout: float | None = None):
+    region = getattr(settings, "AWS_REGION", "us-east-1")
+    cfg = Config(
+        retries={"max_attempts": 3, "mode": "standard"},
+        connect_timeout=5,
+        read_timeout=read_timeout or _read_timeout(),
+        max_pool_connections=_pool_size(),
+        tcp_keepalive=True,
+    )
+    return boto3.client("bedrock-runtime", region_name=region, config=cfg)
+
+
+def new_ollama_client(timeout: float | None = None):
+    import ollama
+    host = getattr(settings, "OLLAMA_HOST", "http://localhost:11434")
+    limits = httpx.Limits(
+        max_connections=_pool_size(),
+        max_keepalive_connections=_pool_size(),
+        keepalive_expiry=_keepalive_expiry(),
+    )
+    return ollama.Client(host=host, limits=limits, timeout=httpx.Timeout(timeout or _read_timeout(), connect=5))
+
+
+def new_ollama_async_client(timeout: float | None = None):
+    import ollama
+    host = getattr(settings, "OLLAMA_HOST", "http://localhost:11434")
+    limits = httpx.Limits(
+        max_connections=int(getattr(settings, "LLM_ASYNC_POOL_SIZE", 200)),
+        max_keepalive_connections=_pool_size(),
+        keepalive_expiry=_keepalive_expiry(),
+    )
+    return ollama.AsyncClient(host=host, limits=limits, timeout=httpx.Timeout(timeout or _read_timeout(), connect=5))
+
+
+# -------------------------
+# public
+# timeout ตั้งที่ตัว client -> แยก client ตาม timeout (profile ที่ timeout ต่างกันได้ client คนละตัว)
+# -------------------------
+def bedrock_runtime(timeout: float | None = None):
+    key = ("bedrock-runtime", getattr(settings, "AWS_REGION", "us-east-1"), timeout)
+    return _get_shared(key, lambda: new_bedrock_runtime(timeout))
+
+
+def ollama_client(timeout: float | None = None):
+    return _get_thread_local(("ollama", getattr(settings, "OLLAMA_HOST", ""), timeout), lambda: new_ollama_client(timeout))
+
+
+def ollama_async_client(timeout: float | None = None):
+    key = ("ollama-async", getattr(settings, "OLLAMA_HOST", ""), timeout)
+    return _get_loop_local(key, lambda: new_ollama_async_client(timeout))
+
+
+def stream_executor() -> ThreadPoolExecutor:
+    """
+    thread pool สำหรับอ่าน Bedrock event stream ให้ async endpoint (boto3 ไม่มี async API)
+    แยกจาก default executor ของ loop (ขนาด min(32, cpu+4)) -> stream พร้อมกันได้ถึง LLM_ASYNC_POOL_SIZE ต่อ process
+    เกินนั้น stream ใหม่รอคิวใน pool (token แรกช้าลง ไม่ล้ม)
+    """
+    size = max(1, int(getattr(settings, "LLM_ASYNC_POOL_SIZE", 200)))
+    return _get_shared(("stream-executor", size), lambda: ThreadPoolExecutor(max_workers=size, thread_name_prefix="llm-stream"))
+
+
+def reset_clients() -> None:
+    """
+    ทิ้ง client ที่ cache ไว้ (ใช้ตอนเปลี่ยน settings / ใน benchmark)
+    """
+    with _lock:
+        for obj in _shared.values():
+            if isinstance(obj, ThreadPoolExecutor):
+                obj.shutdown(wait=False)
+        _shared.clear()
+    _local.clients = {}
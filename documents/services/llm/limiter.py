@@ -0,0 +1,305 @@
+from __future__ import annotations
+import asyncio, logging, random, time, uuid
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# outbound limiter ต่อ provider (state อยู่ใน cache -> ใช้ร่วมกันทุก process ถ้า cache เป็น Redis)
+# - token bucket: requests/นาที และ tokens/นาที
+# - concurrency แบบ AIMD: สำเร็จเร็ว -> เพิ่มทีละ 1 ต่อรอบ, throttled/ช้า -> ลดครึ่ง
+# - เกินทั้งสองอย่าง -> รอในคิว (poll + jitter) จนถึง deadline
+# หมายเหตุ: CACHES ค่าเริ่มต้นเป็น LocMem -> ทุกอย่างข้างบนเป็น "ต่อ process"
+# (gunicorn 4 worker = โควตา/concurrency จริงได้ถึง 4 เท่า) ต้องตั้ง Redis ถึงจะเป็นโควตารวม
+# -------------------------
+
+THROTTLE_MARKERS = (
+    "throttl", "toomanyrequests", "too many requests", "429", "rate exceeded",
+    "serviceunavailable", "503", "overloaded",
+)
+
+
+class QueueTimeout(Exception):
+    """
+    รอ slot/โควตาเกิน deadline
+    """
+
+
+def _rpm(prov: str) -> int:
+    return int((getattr(settings, "LLM_RATE_RPM", {}) or {}).get(prov, 0) or 0)
+
+def _tpm(prov: str) -> int:
+    return int((getattr(settings, "LLM_RATE_TPM", {}) or {}).get(prov, 0) or 0)
+
+def _min_conc() -> int:
+    return max(1, int(getattr(settings, "LLM_CONCURRENCY_MIN", 1)))
+
+def _max_conc(prov: str) -> int:
+    return max(_min_conc(), int((getattr(settings, "LLM_CONCURRENCY_MAX", {}) or {}).get(prov, 8) or 8))
+
+def _latency_target_ms() -> int:
+    return int(getattr(settings, "LLM_CONCURRENCY_LATENCY_TARGET_MS", 15000))
+
+def _deadline() -> float:
+    return float(getattr(settings, "LLM_QUEUE_DEADLINE_SECONDS", 30))
+
+def _lease_seconds() -> int:
+    # slot ที่ process ตายระหว่างถือ จะหมดอายุเอง
+    return int(getattr(settings, "LLM_READ_TIMEOUT", 60)) + 30
+
+
+def is_throttle(exc: BaseException) -> bool:
+    code = ""
+    resp = getattr(exc, "response", None)
+    if isinstance(resp, dict):
+        code = str((resp.get("Error") or {}).get("Code") or "")
+    status = getattr(exc, "status_code", None)
+    text = f"{code} {status or ''} {exc}".lower()
+    return any(m in text for m in THROTTLE_MARKERS)
+
+
+# -------------------------
+# token bucket (virtual clock: ตัวนับการใช้เทียบกับ rate * เวลาที่ผ่านไป)
+# -------------------------
+def _bucket_take(name: str, per_minute: int, cost: int) -> bool:
+    if per_minute <= 0 or cost <= 0:
+        return True
+    epoch_key = f"llm_rate:{name}:epoch"
+    used_key = f"llm_rate:{name}:used"
+    cache.add(epoch_key, time.time(), timeout=None)
+    cache.add(used_key, 0, timeout=None)
+    epoch = float(cache.get(epoch_key) or time.time())
+    allowance = per_minute * (time.time() - epoch) / 60.0 + per_minute
+
+    # ว่างนาน -> ตัดเครดิตส่วนที่เกิน burst (1 นาที) ทิ้งก่อนคิด ไม่งั้น call หลังช่วงว่างผ่านฟรี
+    used = int(cache.get(used_key) or 0)
+    idle = int(allowance - used - per_minute)
+    if idle > 0:
+        used = _bucket_incr(used_key, idle)
+
+    # call ที่ใหญ่กว่าโควตา 1 นาที: รอจน bucket เต็มแล้วผ่าน ส่วนเกินกลายเป็นหนี้ให้ call ถัดไปรอ
+    need = min(cost, per_minute)
+    if allowance - used < need:
+        return False
+    used = _bucket_incr(used_key, cost)
+    if used - cost + need <= allowance:
+        return True
+    # มี process อื่นตัดหน้าไประหว่างอ่านกับ incr
+    cache.decr(used_key, cost)
+    return False
+
+
+def _bucket_incr(key: str, delta: int) -> int:
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+def _bucket_adjust(name: str, per_minute: int, delta: int) -> None:
+    # ปรับตามจำนวน token จริงหลัง call (ตอนจองใช้ค่าประมาณ)
+    if per_minute <= 0 or not delta:
+        return
+    try:
+        cache.incr(f"llm_rate:{name}:used", delta)
+    except ValueError:
+        pass
+
+
+# -------------------------
+# AIMD concurrency (slot = key ที่มี lease)
+# -------------------------
+def current_limit(prov: str) -> int:
+    key = f"llm_conc:{prov}:limit"
+    cache.add(key, _max_conc(prov), timeout=None)
+    return max(_min_conc(), min(_max_conc(prov), int(cache.get(key) or _max_conc(prov))))
+
+
+def _take_slot(prov: str, token: str) -> str | None:
+    for i in range(current_limit(prov)):
+        if cache.add(f"llm_conc:{prov}:slot:{i}", token, timeout=_lease_seconds()):
+            return f"llm_conc:{prov}:slot:{i}"
+    return None
+
+
+def _refresh_slot(key: str, token: str) -> None:
+    # stream ยาวเกิน lease -> ต่ออายุ (เฉพาะ slot ที่ยังเป็นของเรา)
+    if cache.get(key) == token:
+        cache.touch(key, _lease_seconds())
+
+
+def _release_slot(key: str, token: str) -> None:
+    # lease หมดอายุแล้วมีคนอื่นได้ slot เดียวกันไป -> อย่าลบของเขา
+    if key and cache.get(key) == token:
+        cache.delete(key)
+
+
+def _increase(prov: str) -> None:
+    # additive increase: ครบ limit ครั้งที่สำเร็จ (ประมาณ 1 รอบ) -> +1
+    key = f"llm_conc:{prov}:ok"
+    cache.add(key, 0, timeout=300)
+    try:
+        n = cache.incr(key)
+    except ValueError:
+        return
+    limit = current_limit(prov)
+    if n >= limit and limit < _max_conc(prov):
+        cache.set(key, 0, timeout=300)
+        cache.set(f"llm_conc:{prov}:limit", limit + 1, timeout=None)
+
+
+def _decrease(prov: str, reason: str) -> None:
+    # multiplicative decrease; ลดได้ครั้งเดียวต่อช่วงสั้น ๆ กัน call ที่ล้มพร้อมกันลดซ้ำจนเหลือ 1
+    if not cache.add(f"llm_conc:{prov}:cooldown", 1, timeout=5):
+        return
+    limit = current_limit(prov)
+    new = max(_min_conc(), limit // 2)
+    cache.set(f"llm_conc:{prov}:limit", new, timeout=None)
+    cache.set(f"llm_conc:{prov}:ok", 0, timeout=300)
+    if new != limit:
+        logger.warning("LLM concurrency %s: %s -> %s (%s)", prov, limit, new, reason)
+
+
+# -------------------------
+# acquire / release
+# -------------------------
+class Lease:
+    def __init__(self, prov: str, reserved_tokens: int):
+        self.prov = prov
+        self.reserved_tokens = reserved_tokens
+        self.used_tokens = None  # ตั้งหลัง call -> ปรับ token bucket
+        self.queue_wait_ms = 0
+        self.slot = ""
+        self.token = uuid.uuid4().hex
+        self.started = 0.0
+        self.first_token_at = None
+        self.refreshed_at = 0.0
+
+    def on_token(self):
+        """
+        เรียกทุก chunk ของ stream: จำเวลา token แรก (วัด latency) และต่อ lease ของ slot เป็นระยะ
+        """
+        now = time.time()
+        if self.first_token_at is None:
+            self.first_token_at = now
+            self.refreshed_at = now
+        elif now - self.refreshed_at > _lease_seconds() / 3:
+            _refresh_slot(self.slot, self.token)
+            self.refreshed_at = now
+
+    async def aon_token(self):
+        # async: งาน cache (Redis = network I/O) ไม่ทำบน event loop
+        if self.first_token_at is not None and time.time() - self.refreshed_at > _lease_seconds() / 3:
+            await sync_to_async(self.on_token, thread_sensitive=False)()
+        else:
+            self.on_token()
+
+    def _try(self) -> bool:
+        if not _bucket_take(f"{self.prov}:req", _rpm(self.prov), 1):
+            return False
+        if not _bucket_take(f"{self.prov}:tok", _tpm(self.prov), self.reserved_tokens):
+            _bucket_adjust(f"{self.prov}:req", _rpm(self.prov), -1)
+            return False
+        slot = _take_slot(self.prov, self.token)
+        if slot is None:
+            _bucket_adjust(f"{self.prov}:req", _rpm(self.prov), -1)
+            _bucket_adjust(f"{self.prov}:tok", _tpm(self.prov), -self.reserved_tokens)
+            return False
+        self.slot = slot
+        return True
+
+    def _finish(self, exc: BaseException | None, *, aborted: bool = False):
+        _release_slot(self.slot, self.token)
+        if self.used_tokens is not None:
+            _bucket_adjust(f"{self.prov}:tok", _tpm(self.prov), self.used_tokens - self.reserved_tokens)
+
+        # client ตัดการเชื่อมต่อ / task ถูก cancel -> ไม่ได้บอกอะไรเรื่อง provider ไม่นับทั้งสำเร็จและล้ม
+        if aborted:
+            return
+        if exc is not None:
+            if is_throttle(exc):
+                _decrease(self.prov, "throttled")
+            return
+
+        ms = int(((self.first_token_at or time.time()) - self.started) * 1000)
+        if ms > _latency_target_ms():
+            _decrease(self.prov, f"latency {ms}ms")
+        else:
+            _increase(self.prov)
+
+
+def _backoff(attempt: int) -> float:
+    return min(0.5, 0.02 * (2 ** attempt)) * (0.5 + random.random())
+
+
+@contextmanager
+def acquire(prov: str, est_tokens: int, *, deadline: float | None = None):
+    """
+    with acquire("bedrock", est) as lease: ...  (รอในคิวได้ไม่เกิน deadline วินาที)
+    """
+    lease = Lease(prov, max(1, int(est_tokens)))
+    t0 = time.time()
+    limit_at = t0 + (_deadline() if deadline is None else deadline)
+    attempt = 0
+    while not lease._try():
+        if time.time() >= limit_at:
+            raise QueueTimeout(f"LLM provider {prov} is busy. Please try again shortly.")
+        time.sleep(_backoff(attempt))
+        attempt += 1
+    lease.queue_wait_ms = int((time.time() - t0) * 1000)
+    lease.started = time.time()
+    try:
+        yield lease
+    except Exception as e:
+        lease._finish(e)
+        raise
+    except BaseException:
+        # GeneratorExit (stream ถูกปิดกลางทาง) / CancelledError / KeyboardInterrupt
+        lease._finish(None, aborted=True)
+        raise
+    else:
+        lease._finish(None)
+
+
+@asynccontextmanager
+async def aacquire(prov: str, est_tokens: int, *, deadline: float | None = None):
+    """
+    async ของ acquire: งาน cache ทุกครั้ง (_try / _finish) ทำใน thread ผ่าน sync_to_async
+    ไม่งั้นกับ Redis ทุกรอบที่ poll คิวจะ block event loop
+    """
+    lease = Lease(prov, max(1, int(est_tokens)))
+    try_ = sync_to_async(lease._try, thread_sensitive=False)
+    finish = sync_to_async(lease._finish, thread_sensitive=False)
+    t0 = time.time()
+    limit_at = t0 + (_deadline() if deadline is None else deadline)
+    attempt = 0
+    while not await try_():
+        if time.time() >= limit_at:
+            raise QueueTimeout(f"LLM provider {prov} is busy. Please try again shortly.")
+        await asyncio.sleep(_backoff(attempt))
+        attempt += 1
+    lease.queue_wait_ms = int((time.time() - t0) * 1000)
+    lease.started = time.time()
+    try:
+        yield lease
+    except Exception as e:
+        await finish(e)
+        raise
+    except BaseException:
+        # GeneratorExit (stream ถูกปิดกลางทาง) / CancelledError / KeyboardInterrupt
+        await finish(None, aborted=True)
+        raise
+    else:
+        await finish(None)
+
+
+def snapshot(prov: str) -> dict:
+    limit = current_limit(prov)
+    busy = sum(1 for i in range(_max_conc(prov)) if cache.get(f"llm_conc:{prov}:slot:{i}"))
+    return {"provider": prov, "concurrency_limit": limit, "in_flight": busy, "rpm": _rpm(prov), "tpm": _tpm(prov)}
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import asyncio, hashlib, random, threading, time
+from typing import AsyncIterator, Dict, Iterator, Tuple
+
+from django.conf import settings
+
+from documents.services.llm.tokens import estimate_prompt_tokens, estimate_tokens
+
+# -------------------------
+# provider "mock" สำหรับ load test / dev: ไม่เรียก network
+# - คำตอบ deterministic จาก hash ของ prompt (prompt เดิม -> คำตอบเดิม)
+# - latency / ความเร็ว stream / อัตรา error และ throttle ตั้งผ่าน LLM_MOCK_*
+# -------------------------
+
+WORDS = (
+    "document", "summary", "analysis", "report", "budget", "project", "team", "result",
+    "data", "review", "plan", "risk", "timeline", "customer", "policy", "section",
+    "เอกสาร", "สรุป", "ข้อมูล", "รายงาน", "โครงการ", "งบประมาณ", "ผลลัพธ์", "แผนงาน",
+)
+
+_rng_lock = threading.Lock()
+_rng = None
+
+
+class MockError(Exception):
+    pass
+
+
+class MockThrottled(Exception):
+    # ข้อความมี "ThrottlingException" -> limiter.is_throttle จับได้เหมือน Bedrock จริง
+    def __init__(self):
+        super().__init__("ThrottlingException: Rate exceeded (mock)")
+
+
+def _conf(name: str, default):
+    return type(default)(getattr(settings, f"LLM_MOCK_{name}", default))
+
+
+def _roll() -> float:
+    # random สำหรับ inject error (LLM_MOCK_SEED ตั้งได้ -> ลำดับ error ซ้ำได้ระหว่าง run)
+    global _rng
+    with _rng_lock:
+        if _rng is None:
+            seed = getattr(settings, "LLM_MOCK_SEED", None)
+            _rng = random.Random(seed)
+        return _rng.random()
+
+
+def _maybe_fail() -> None:
+    r = _roll()
+    throttle = _conf("THROTTLE_RATE", 0.0)
+    if r < throttle:
+        raise MockThrottled()
+    if r < throttle + _conf("ERROR_RATE", 0.0):
+        raise MockError("Mock provider error (injected)")
+
+
+def _latency() -> float:
+    base = _conf("LATENCY_MS", 300) / 1000
+    jitter = _conf("JITTER_MS", 0) / 1000
+    return max(0.0, base + (random.uniform(-jitter, jitter) if jitter else 0.0))
+
+
+def _interval() -> float:
+    rate = _conf("TOKENS_PER_SECOND", 50.0)
+    return 1.0 / rate if rate > 0 else 0.0
+
+
+def response_for(system: str, user: str) -> str:
+    digest = hashlib.sha256(f"{system}\n\n{user}".encode("utf-8")).digest()
+    n = max(1, _conf("OUTPUT_WORDS", 60))
+    words = [WORDS[digest[i % len(digest)] % len(WORDS)] for i in range(n)]
+    return f"[mock {digest[:4].hex()}] " + " ".join(words)
+
+
+def _pieces(text: str) -> list[str]:
+    parts = text.split(" ")
+    return [p + (" " if i < len(parts) - 1 else "") for i, p in enumerate(parts)]
+
+
+def _usage(system: str, user: str, text: str) -> Dict[str, int]:
+    return {"input_tokens": estimate_prompt_tokens(system, user), "output_tokens": estimate_tokens(text)}
+
+
+def complete(system: str, user: str) -> Tuple[str, Dict[str, int]]:
+    time.sleep(_latency())
+    _maybe_fail()
+    text = response_for(system, user)
+    # เวลาผลิต output ทั้งหมด (เหมือน model จริงที่ไม่ stream)
+    time.sleep(_interval() * len(_pieces(text)))
+    return text, _usage(system, user, text)
+
+
+def stream(system: str, user: str) -> Iterator[str]:
+    time.sleep(_latency())
+    _maybe_fail()
+    gap = _interval()
+    for i, piece in enumerate(_pieces(response_for(system, user))):
+        if i and gap:
+            time.sleep(gap)
+        yield piece
+
+
+async def astream(system: str, user: str) -> AsyncIterator[str]:
+    await asyncio.sleep(_latency())
+    _maybe_fail()
+    gap = _interval()
+    for i, piece in enumerate(_pieces(response_for(system, user))):
+        if i and gap:
+            await asyncio.sleep(gap)
+        yield piece
@@ -0,0 +1,77 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field, replace
+
+from django.conf import settings
+
+# -------------------------
+# generation profile ต่อ purpose: model / max_tokens / temperature / stop / timeout
+# งานสั้น (classify, title) ใช้ model "fast" + max_tokens ต่ำ + stop ที่ขึ้นบรรทัดใหม่ -> จบเร็ว
+# (Bedrock ไม่รับ stop ที่เป็น whitespace ล้วน -> client ตัดทิ้ง เหลือ max_tokens คุมความยาว)
+# title: ภาษาไทยใช้ token ต่อตัวอักษรมากกว่าอังกฤษหลายเท่า -> title_generator ขยาย max_tokens ตาม script อีกชั้น
+# override ได้ทีละ field ผ่าน settings.LLM_PROFILES = {"title": {"max_tokens": 80}, ...}
+# -------------------------
+
+DEFAULT_PROFILES = {
+    "classify": {"model": "fast", "max_tokens": 8, "temperature": 0.0, "stop": ["\n"], "timeout": 20},
+    "classify_batch": {"model": "fast", "max_tokens": 600, "temperature": 0.0, "timeout": 60},
+    "title": {"model": "fast", "max_tokens": 80, "temperature": 0.3, "stop": ["\n"], "timeout": 20},
+    "summarize": {},
+    "combined": {},
+    "chat": {},
+    "chat_stream": {},
+}
+
+
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    model: str = "default"  # "default" / "fast"
+    max_tokens: int = 800
+    temperature: float = 0.2
+    stop: tuple = field(default_factory=tuple)
+    timeout: float = 60.0
+    # model id ตรง ๆ ต่อ provider (ว่าง = ใช้ตาม model tier)
+    bedrock_model: str = ""
+    ollama_model: str = ""
+
+    def with_max_tokens(self, n: int | None) -> "Profile":
+        return replace(self, max_tokens=int(n)) if n else self
+
+    def as_log(self) -> dict:
+        d = asdict(self)
+        d["stop"] = list(self.stop)
+        return {k: v for k, v in d.items() if k != "name" and v not in ("", None)}
+
+
+def _base() -> dict:
+    return {
+        "max_tokens": int(getattr(settings, "BEDROCK_MAX_TOKENS", 800)),
+        "temperature": float(getattr(settings, "BEDROCK_TEMPERATURE", 0.2)),
+        "timeout": float(getattr(settings, "LLM_READ_TIMEOUT", 60)),
+    }
+
+
+def get_profile(name: str) -> Profile:
+    name = (name or "").strip().lower() or "default"
+    conf = _base()
+    conf.update(DEFAULT_PROFILES.get(name, {}))
+    conf.update((getattr(settings, "LLM_PROFILES", {}) or {}).get(name, {}) or {})
+    conf["stop"] = tuple(conf.get("stop") or ())
+    known = Profile.__dataclass_fields__.keys()
+    return Profile(name=name, **{k: v for k, v in conf.items() if k in known and k != "name"})
+
+
+def model_for(prov: str, profile: Profile) -> str:
+    if prov == "mock":
+        return "mock"
+    if prov == "bedrock":
+        if profile.bedrock_model:
+            return profile.bedrock_model
+        if profile.model == "fast" and getattr(settings, "BEDROCK_FAST_MODEL_ID", ""):
+            return settings.BEDROCK_FAST_MODEL_ID
+        return getattr(settings, "BEDROCK_INFERENCE_PROFILE_ARN", "") or ""
+    if profile.ollama_model:
+        return profile.ollama_model
+    if profile.model == "fast" and getattr(settings, "OLLAMA_FAST_MODEL", ""):
+        return settings.OLLAMA_FAST_MODEL
+    return getattr(settings, "OLLAMA_MODEL", "llama3")
@@ -0,0 +1,237 @@
+from __future__ import annotations
+import hashlib, json, logging, os, threading, time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+def _backend_name() -> str:
+    return (getattr(settings, "LLM_RESPONSE_CACHE_BACKEND", "") or "").lower().strip()
+
+def _purposes() -> set[str]:
+    return {p.strip().lower() for p in (getattr(settings, "LLM_RESPONSE_CACHE_PURPOSES", []) or []) if p.strip()}
+
+def _ttl() -> int:
+    return int(getattr(settings, "LLM_RESPONSE_CACHE_TTL", 7 * 24 * 3600))
+
+def _max_entries() -> int:
+    return int(getattr(settings, "LLM_RESPONSE_CACHE_MAX_ENTRIES", 10000))
+
+def _max_temperature() -> float:
+    return float(getattr(settings, "LLM_RESPONSE_CACHE_MAX_TEMPERATURE", 0.3))
+
+
+def cache_key(*, provider: str, model: str, system: str, user: str,
+              temperature: float, max_tokens: int, purpose: str, stop=()) -> str:
+    parts = [provider, model, system or "", user or "", round(float(temperature), 3), int(max_tokens or 0), purpose or ""]
+    if stop:
+        # ต่อท้ายเฉพาะเมื่อมี stop -> key เดิมของ call ที่ไม่มี stop ยังใช้ได้
+        parts.append(list(stop))
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(purpose: str, temperature: float) -> bool:
+    """
+    cache เฉพาะ purpose ที่ opt-in ไว้ และ temperature ต่ำพอจะถือว่า deterministic
+    (stream ไม่ผ่านทางนี้เลย)
+    """
+    if not _backend_name():
+        return False
+    if (purpose or "").strip().lower() not in _purposes():
+        return False
+    return float(temperature) <= _max_temperature()
+
+
+# -------------------------
+# backends
+# -------------------------
+class DBBackend:
+    """
+    เก็บใน LLMResponseCache; LRU ด้วย last_used_at
+    """
+    def get(self, key: str) -> CachedResponse | None:
+        from documents.models import LLMResponseCache
+
+        row = LLMResponseCache.objects.filter(key=key).values(
+            "id", "response", "input_tokens", "output_tokens", "created_at"
+        ).first()
+        if not row:
+            return None
+        if row["created_at"] < timezone.now() - timedelta(seconds=_ttl()):
+            LLMResponseCache.objects.filter(id=row["id"]).delete()
+            return None
+        LLMResponseCache.objects.filter(id=row["id"]).update(last_used_at=timezone.now(), hits=F("hits") + 1)
+        return CachedResponse(row["response"], row["input_tokens"], row["output_tokens"])
+
+    def set(self, key: str, value: CachedResponse, *, purpose: str, provider: str, model: str) -> None:
+        from documents.models import LLMResponseCache
+
+        LLMResponseCache.objects.update_or_create(
+            key=key,
+            defaults={
+                "purpose": purpose[:50],
+                "provider": provider[:30],
+                "model_id": model[:255],
+                "response": value.text,
+                "input_tokens": value.input_tokens,
+                "output_tokens": value.output_tokens,
+                "last_used_at": timezone.now(),
+            },
+        )
+
+    def prune(self) -> int:
+        from documents.models import LLMResponseCache
+
+        n, _ = LLMResponseCache.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=_ttl())).delete()
+        cutoff = list(
+            LLMResponseCache.objects.order_by("-last_used_at")
+            .values_list("last_used_at", flat=True)[_max_entries():_max_entries() + 1]
+        )
+        if cutoff:
+            m, _ = LLMResponseCache.objects.filter(last_used_at__lte=cutoff[0]).delete()
+            n += m
+        return n
+
+    def clear(self) -> int:
+        from documents.models import LLMResponseCache
+
+        n, _ = LLMResponseCache.objects.all().delete()
+        return n
+
+
+class DiskBackend:
+    """
+    ไฟล์ JSON ต่อ key ใต้ LLM_RESPONSE_CACHE_DIR; LRU ด้วย mtime (แตะไฟล์ทุกครั้งที่ hit)
+    """
+    def __init__(self):
+        self.root = Path(getattr(settings, "LLM_RESPONSE_CACHE_DIR", "") or Path(settings.BASE_DIR) / ".llm_cache")
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> CachedResponse | None:
+        p = self._path(key)
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("created_at", 0) < time.time() - _ttl():
+            p.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        return CachedResponse(data.get("text", ""), int(data.get("input_tokens", 0)), int(data.get("output_tokens", 0)))
+
+    def set(self, key: str, value: CachedResponse, *, purpose: str, provider: str, model: str) -> None:
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({
+            "text": value.text,
+            "input_tokens": value.input_tokens,
+            "output_tokens": value.output_tokens,
+            "purpose": purpose,
+            "provider": provider,
+            "model": model,
+            "created_at": time.time(),
+        }, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, p)
+
+    def _files(self):
+        if not self.root.exists():
+            return []
+        out = []
+        for p in self.root.glob("*/*.json"):
+            try:
+                out.append((p.stat().st_mtime, p))
+            except OSError:
+                continue
+        return out
+
+    def prune(self) -> int:
+        files = sorted(self._files(), reverse=True)
+        expire_before = time.time() - _ttl()
+        n = 0
+        for i, (mtime, p) in enumerate(files):
+            if i >= _max_entries() or mtime < expire_before:
+                p.unlink(missing_ok=True)
+                n += 1
+        return n
+
+    def clear(self) -> int:
+        n = 0
+        for _, p in self._files():
+            p.unlink(missing_ok=True)
+            n += 1
+        return n
+
+
+BACKENDS = {
+    "db": DBBackend,
+    "disk": DiskBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+_writes = 0
+
+
+def get_backend():
+    global _backend
+    name = _backend_name()
+    if not name:
+        return None
+    if _backend is None or _backend.__class__ is not BACKENDS.get(name):
+        with _backend_lock:
+            if name not in BACKENDS:
+                logger.warning("unknown LLM_RESPONSE_CACHE_BACKEND=%s", name)
+                return None
+            _backend = BACKENDS[name]()
+    return _backend
+
+
+# -------------------------
+# public
+# -------------------------
+def lookup(key: str) -> CachedResponse | None:
+    backend = get_backend()
+    if backend is None:
+        return None
+    try:
+        return backend.get(key)
+    except Exception as e:
+        logger.warning("LLM response cache get failed: %s", e)
+        return None
+
+
+def store(key: str, value: CachedResponse, *, purpose: str, provider: str, model: str) -> None:
+    """
+    เขียนลง cache; ทุก ๆ LLM_RESPONSE_CACHE_PRUNE_EVERY ครั้งจะ prune (TTL + LRU) หนึ่งรอบ
+    """
+    global _writes
+    backend = get_backend()
+    if backend is None or not value.text:
+        return
+    try:
+        backend.set(key, value, purpose=purpose, provider=provider, model=model)
+        _writes += 1
+        if _writes % max(1, int(getattr(settings, "LLM_RESPONSE_CACHE_PRUNE_EVERY", 200))) == 0:
+            backend.prune()
+    except Exception as e:
+        logger.warning("LLM response cache set failed: %s", e)
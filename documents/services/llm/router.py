@@ -0,0 +1,487 @@
+from __future__ import annotations
+import logging, queue, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from documents.services.llm.limiter import QueueTimeout, snapshot as limiter_snapshot
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROVIDERS = ("bedrock", "ollama", "mock")
+
+
+class ProviderUnavailable(Exception):
+    """
+    ทุก provider ถูกตัดวงจร (circuit open) -> ไม่ต้องรอ timeout
+    """
+
+
+def _bucket_seconds() -> int:
+    return max(1, int(getattr(settings, "LLM_BREAKER_BUCKET_SECONDS", 10)))
+
+def _window_buckets() -> int:
+    return max(1, int(getattr(settings, "LLM_BREAKER_WINDOW_BUCKETS", 6)))
+
+def _min_calls() -> int:
+    return int(getattr(settings, "LLM_BREAKER_MIN_CALLS", 5))
+
+def _error_rate() -> float:
+    return float(getattr(settings, "LLM_BREAKER_ERROR_RATE", 0.5))
+
+def _slow_ms() -> int:
+    return int(getattr(settings, "LLM_BREAKER_SLOW_MS", 20000))
+
+def _slow_rate() -> float:
+    return float(getattr(settings, "LLM_BREAKER_SLOW_RATE", 0.8))
+
+def _cooldown() -> int:
+    return int(getattr(settings, "LLM_BREAKER_COOLDOWN_SECONDS", 30))
+
+
+# -------------------------
+# circuit breaker (state อยู่ใน cache -> ทุก process เห็นตรงกัน)
+# -------------------------
+def _state_key(prov: str) -> str:
+    return f"llm_breaker:{prov}:state"
+
+def _count_key(prov: str, bucket: int, name: str) -> str:
+    return f"llm_breaker:{prov}:{bucket}:{name}"
+
+def _incr(key: str, ttl: int):
+    cache.add(key, 0, timeout=ttl)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=ttl)
+
+
+def _window_keys(prov: str) -> list[str]:
+    now_b = int(time.time()) // _bucket_seconds()
+    return [
+        _count_key(prov, b, name)
+        for b in range(now_b - _window_buckets() + 1, now_b + 1)
+        for name in ("calls", "errors", "slow")
+    ]
+
+
+def _clear_window(prov: str) -> None:
+    # window (60s) ยาวกว่า cooldown (30s): ถ้าไม่ล้าง error ก่อน breaker เปิดยังอยู่ -> ล้มครั้งเดียวก็เปิดซ้ำทันที
+    cache.delete_many(_window_keys(prov))
+
+
+def _window(prov: str) -> dict:
+    got = cache.get_many(_window_keys(prov))
+    out = {"calls": 0, "errors": 0, "slow": 0}
+    for k, v in got.items():
+        out[k.rsplit(":", 1)[1]] += int(v or 0)
+    return out
+
+
+def allow(prov: str) -> bool:
+    """
+    closed -> ผ่าน, open -> ไม่ผ่านจนครบ cooldown, หลัง cooldown (half-open) ให้ผ่านได้ทีละ 1 probe
+    """
+    st = cache.get(_state_key(prov))
+    if not st:
+        return True
+    if time.time() < st.get("until", 0):
+        return False
+    return cache.add(f"llm_breaker:{prov}:probe", 1, timeout=_cooldown())
+
+
+def record(prov: str, ok: bool, latency_ms: int) -> None:
+    """
+    latency_ms ใช้ตัดสิน "slow call": call ปกติ = เวลาทั้ง call, stream = เวลาถึง token แรก
+    (คำตอบยาวที่ stream นานไม่ได้แปลว่า provider ช้า)
+    """
+    ttl = _bucket_seconds() * (_window_buckets() + 1)
+    b = int(time.time()) // _bucket_seconds()
+    _incr(_count_key(prov, b, "calls"), ttl)
+    if not ok:
+        _incr(_count_key(prov, b, "errors"), ttl)
+    if latency_ms >= _slow_ms():
+        _incr(_count_key(prov, b, "slow"), ttl)
+
+    st = cache.get(_state_key(prov))
+    if st:
+        # half-open probe กลับมาแล้ว
+        if time.time() >= st.get("until", 0):
+            cache.delete(f"llm_breaker:{prov}:probe")
+            if ok:
+                cache.delete(_state_key(prov))
+                _clear_window(prov)
+                logger.warning("LLM breaker closed provider=%s", prov)
+            else:
+                _open(prov, "probe failed")
+        return
+
+    w = _window(prov)
+    if w["calls"] < _min_calls():
+        return
+    if w["errors"] / w["calls"] >= _error_rate():
+        _open(prov, f"error rate {w['errors']}/{w['calls']}")
+    elif w["slow"] / w["calls"] >= _slow_rate():
+        _open(prov, f"slow calls {w['slow']}/{w['calls']}")
+
+
+def _open(prov: str, reason: str) -> None:
+    cache.set(_state_key(prov), {
+        "until": time.time() + _cooldown(),
+        "opened_at": time.time(),
+        "reason": reason,
+    }, timeout=_cooldown() * 10)
+    logger.warning("LLM breaker opened provider=%s reason=%s", prov, reason)
+
+
+def reset(prov: str | None = None) -> None:
+    for p in ([prov] if prov else PROVIDERS):
+        cache.delete_many([_state_key(p), f"llm_breaker:{p}:probe"])
+        _clear_window(p)
+
+
+def snapshot() -> list[dict]:
+    out = []
+    for p in PROVIDERS:
+        st = cache.get(_state_key(p)) or {}
+        w = _window(p)
+        if not st:
+            state = "closed"
+        elif time.time() < st.get("until", 0):
+            state = "open"
+        else:
+            state = "half_open"
+        out.append({
+            "provider": p,
+            "state": state,
+            "reason": st.get("reason", ""),
+            "open_until": st.get("until"),
+            "window_seconds": _bucket_seconds() * _window_buckets(),
+            "calls": w["calls"],
+            "errors": w["errors"],
+            "slow": w["slow"],
+            "error_rate": (w["errors"] / w["calls"]) if w["calls"] else 0.0,
+            "call_p": latency_percentile(p, "call"),
+            "first_token_p": latency_percentile(p, "ttft"),
+            **limiter_snapshot(p),
+        })
+    return out
+
+
+# -------------------------
+# latency (ต่อ process) -> ใช้กำหนดเวลาก่อนยิง hedged request
+# แยกตาม mode: "call" = เวลาได้คำตอบทั้งก้อน, "ttft" = เวลาถึง token แรกของ stream (คนละสเกลกัน)
+# -------------------------
+_lat_lock = threading.Lock()
+_latencies: dict[tuple[str, str], deque] = {}
+
+
+def observe_latency(prov: str, ms: int, mode: str = "call") -> None:
+    with _lat_lock:
+        _latencies.setdefault((prov, mode), deque(maxlen=200)).append(ms)
+
+
+def latency_percentile(prov: str, mode: str = "call") -> int | None:
+    """
+    percentile ของ latency ล่าสุดใน mode นั้น; ตัวอย่างน้อยเกินไป -> None (ไม่ hedge)
+    """
+    p = float(getattr(settings, "LLM_HEDGE_PERCENTILE", 95))
+    with _lat_lock:
+        values = sorted(_latencies.get((prov, mode)) or [])
+    if len(values) < int(getattr(settings, "LLM_HEDGE_MIN_SAMPLES", 20)):
+        return None
+    k = max(0, min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+# -------------------------
+# routing
+# -------------------------
+def provider_order(primary: str) -> list[str]:
+    fallbacks = [p.strip().lower() for p in (getattr(settings, "LLM_FALLBACK_PROVIDERS", []) or []) if p.strip()]
+    order = [primary] + [p for p in fallbacks if p != primary]
+    return [p for p in order if p in PROVIDERS]
+
+
+def _unavailable() -> ProviderUnavailable:
+    return ProviderUnavailable("All LLM providers are temporarily unavailable. Please try again shortly.")
+
+
+def _next_allowed(remaining: list[str]) -> str | None:
+    """
+    pop provider ถัดไปที่ breaker ยอม
+    ตรวจ allow() ตอนจะเรียกจริงเท่านั้น -> provider half-open ไม่เสีย probe ถ้าไม่ได้ถูกเรียก
+    """
+    while remaining:
+        prov = remaining.pop(0)
+        if allow(prov):
+            return prov
+    return None
+
+
+def _hedge_delay(prov: str, others: list[str], mode: str) -> float | None:
+    if not getattr(settings, "LLM_HEDGE_ENABLED", False) or not others:
+        return None
+    ms = latency_percentile(prov, mode)
+    return None if ms is None else ms / 1000.0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=int(getattr(settings, "LLM_HEDGE_WORKERS", 8)), thread_name_prefix="llm-hedge"
+                )
+    return _pool
+
+
+def _timed(prov: str, fn: Callable[[str], T]) -> T:
+    t0 = time.time()
+    try:
+        out = fn(prov)
+    except QueueTimeout:
+        # คิวของเราเองเต็ม ไม่ใช่ provider เสีย -> ไม่นับใน breaker
+        raise
+    except Exception:
+        record(prov, False, int((time.time() - t0) * 1000))
+        raise
+    ms = int((time.time() - t0) * 1000)
+    record(prov, True, ms)
+    observe_latency(prov, ms, "call")
+    return out
+
+
+def _in_thread(prov: str, fn: Callable[[str], T]) -> T:
+    try:
+        return _timed(prov, fn)
+    finally:
+        connection.close()
+
+
+def call(primary: str, fn: Callable[[str], T]) -> T:
+    """
+    เรียก fn(provider) ตามลำดับ primary -> fallback ข้าม provider ที่ circuit open
+    ถ้าเปิด hedging และ primary ช้ากว่า percentile -> ยิง provider ถัดไปซ้อน เอาคำตอบที่มาก่อน
+    (คำตอบที่แพ้ยังคงถูก log/นับ token ตามจริง)
+    """
+    remaining = provider_order(primary)
+    first = _next_allowed(remaining)
+    if first is None:
+        raise _unavailable()
+    delay = _hedge_delay(first, remaining, "call")
+    last = None
+
+    if delay is not None:
+        pool = _executor()
+        futures = {pool.submit(_in_thread, first, fn): first}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            second = _next_allowed(remaining)
+            if second is not None:
+                logger.info("LLM hedge: %s slower than %.0fms -> %s", first, delay * 1000, second)
+                futures[pool.submit(_in_thread, second, fn)] = second
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                try:
+                    return f.result()
+                except Exception as e:
+                    logger.warning("LLM provider %s failed, trying next: %s", futures[f], e)
+                    last = e
+        # ข้ามเฉพาะ provider ที่ยิงไปแล้วจริง (primary ล้มก่อนถึงเวลา hedge -> ยังไม่ได้ลองตัวถัดไป)
+        prov = _next_allowed(remaining)
+    else:
+        prov = first
+
+    while prov is not None:
+        try:
+            return _timed(prov, fn)
+        except Exception as e:
+            logger.warning("LLM provider %s failed, trying next: %s", prov, e)
+            last = e
+        prov = _next_allowed(remaining)
+    raise last
+
+
+_DONE = object()
+
+
+def _stream_sequential(first: str, remaining: list[str], make: Callable[[str], Iterator[str]]) -> Iterator[str]:
+    # ไม่มี hedging -> iterate ใน thread ของ caller เลย
+    last = None
+    prov = first
+    while prov is not None:
+        t0 = time.time()
+        ttft = None
+        gen = make(prov)
+        try:
+            for tok in gen:
+                if ttft is None:
+                    ttft = int((time.time() - t0) * 1000)
+                    observe_latency(prov, ttft, "ttft")
+                yield tok
+        except Exception as e:
+            if not isinstance(e, QueueTimeout):
+                record(prov, False, ttft if ttft is not None else int((time.time() - t0) * 1000))
+            if ttft is not None:
+                raise
+            logger.warning("LLM provider %s failed before first token, trying next: %s", prov, e)
+            last = e
+            prov = _next_allowed(remaining)
+            continue
+        finally:
+            gen.close()
+        record(prov, True, ttft if ttft is not None else int((time.time() - t0) * 1000))
+        return
+    raise last
+
+
+async def astream(primary: str, make: Callable[[str], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """
+    async: failover ก่อนได้ token แรก (ไม่มี hedging); งาน cache ของ breaker ทำผ่าน sync_to_async
+    """
+    remaining = provider_order(primary)
+    prov = await sync_to_async(_next_allowed)(remaining)
+    if prov is None:
+        raise _unavailable()
+    last = None
+    while prov is not None:
+        t0 = time.time()
+        ttft = None
+        gen = make(prov)
+        try:
+            async for tok in gen:
+                if ttft is None:
+                    ttft = int((time.time() - t0) * 1000)
+                    observe_latency(prov, ttft, "ttft")
+                yield tok
+        except Exception as e:
+            if not isinstance(e, QueueTimeout):
+                await sync_to_async(record)(prov, False, ttft if ttft is not None else int((time.time() - t0) * 1000))
+            if ttft is not None:
+                raise
+            logger.warning("LLM provider %s failed before first token, trying next: %s", prov, e)
+            last = e
+            prov = await sync_to_async(_next_allowed)(remaining)
+            continue
+        finally:
+            await gen.aclose()
+        await sync_to_async(record)(prov, True, ttft if ttft is not None else int((time.time() - t0) * 1000))
+        return
+    raise last
+
+
+def _pump(prov: str, make: Callable[[str], Iterator[str]], out: queue.Queue, stop: threading.Event):
+    """
+    อ่าน stream ของ provider หนึ่งลง queue (ใช้ตอน hedge)
+    ถูกสั่งหยุด (แพ้ hedge / caller เลิกอ่าน) -> ยังนับใน breaker เป็น call ที่สำเร็จ
+    และ gen.close() ทำให้ generate_text_stream log token ที่ใช้ไปแล้ว (stop_reason="cancelled")
+    """
+    t0 = time.time()
+    ttft = None
+    gen = make(prov)
+    try:
+        for tok in gen:
+            if stop.is_set():
+                break
+            if ttft is None:
+                ttft = int((time.time() - t0) * 1000)
+                observe_latency(prov, ttft, "ttft")
+            out.put((prov, tok))
+        if not stop.is_set():
+            out.put((prov, _DONE))
+        record(prov, True, ttft if ttft is not None else int((time.time() - t0) * 1000))
+    except Exception as e:
+        if not isinstance(e, QueueTimeout):
+            record(prov, False, ttft if ttft is not None else int((time.time() - t0) * 1000))
+        out.put((prov, e))
+    finally:
+        gen.close()
+        connection.close()
+
+
+def stream(primary: str, make: Callable[[str], Iterator[str]]) -> Iterator[str]:
+    """
+    stream ผ่าน provider แรกที่ให้ token แรกได้
+    - error ก่อน token แรก -> ลอง provider ถัดไป
+    - hedging: token แรกยังไม่มาภายใน percentile -> เปิด stream ที่ provider ถัดไปซ้อน ใครได้ token ก่อนชนะ
+    - error หลังส่ง token ไปแล้ว -> raise (ต่อ stream ข้าม provider ไม่ได้)
+    """
+    remaining = provider_order(primary)
+    first = _next_allowed(remaining)
+    if first is None:
+        raise _unavailable()
+    delay = _hedge_delay(first, remaining, "ttft")
+    if delay is None:
+        yield from _stream_sequential(first, remaining, make)
+        return
+
+    out: queue.Queue = queue.Queue()
+    stops: dict[str, threading.Event] = {}
+
+    def start(prov: str):
+        stops[prov] = threading.Event()
+        threading.Thread(target=_pump, args=(prov, make, out, stops[prov]), daemon=True).start()
+
+    start(first)
+    winner = None
+    last = None
+
+    try:
+        while True:
+            try:
+                prov, item = out.get(timeout=delay) if (winner is None and delay is not None) else out.get()
+            except queue.Empty:
+                # ยังไม่มี token แรก -> hedge
+                delay = None
+                second = _next_allowed(remaining)
+                if second is not None:
+                    logger.info("LLM hedge (stream): %s no first token -> %s", first, second)
+                    start(second)
+                continue
+
+            if winner is not None and prov != winner:
+                continue
+
+            if isinstance(item, Exception):
+                if winner is not None:
+                    raise item
+                last = item
+                stops[prov].set()
+                running = [p for p, ev in stops.items() if not ev.is_set()]
+                if running:
+                    continue
+                nxt = _next_allowed(remaining)
+                if nxt is None:
+                    raise last
+                logger.warning("LLM provider %s failed before first token, trying next: %s", prov, item)
+                start(nxt)
+                continue
+
+            if item is _DONE:
+                # จบปกติ (ถ้ายังไม่มี winner = คำตอบว่าง)
+                return
+
+            if winner is None:
+                winner = prov
+                for p, ev in stops.items():
+                    if p != prov:
+                        ev.set()
+            yield item
+    finally:
+        for ev in stops.values():
+            ev.set()
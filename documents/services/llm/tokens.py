@@ -0,0 +1,140 @@
+from __future__ import annotations
+import json, logging, os, threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# token estimator แบบแยกตามชนิดตัวอักษร
+# tokens ≈ Σ coef[class] * จำนวนตัวอักษร class นั้น (+ intercept ต่อ prompt)
+# นับด้วย str.translate ครั้งเดียว (ทำงานใน C) แล้ว str.count ต่อ class
+# -------------------------
+
+CLASSES = ("thai", "latin", "digit", "space", "punct", "other")
+
+# ค่าเริ่มต้น (ก่อน calibrate): อังกฤษ ~4 ตัวอักษร/token, ไทย ~1.7 ตัวอักษร/token
+DEFAULT_COEFS = {
+    "thai": 0.6,
+    "latin": 0.25,
+    "digit": 0.45,
+    "space": 0.05,
+    "punct": 0.7,
+    "other": 1.0,
+    "intercept": 8.0,
+}
+
+_MARK = {"thai": "t", "latin": "l", "digit": "d", "space": "s", "punct": "p"}
+
+
+def _build_table() -> dict:
+    table = {}
+    for cp in range(0x0E00, 0x0E80):
+        table[cp] = _MARK["thai"]
+    for ch in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ":
+        table[ord(ch)] = _MARK["latin"]
+    for cp in range(0x00C0, 0x0250):  # Latin-1 / Latin Extended
+        table[cp] = _MARK["latin"]
+    for ch in "0123456789":
+        table[ord(ch)] = _MARK["digit"]
+    for ch in " \t\n\r\f\v ":
+        table[ord(ch)] = _MARK["space"]
+    for cp in range(0x21, 0x80):
+        if cp not in table:
+            table[cp] = _MARK["punct"]
+    return table
+
+
+# ตัวอักษร a-z ทั้งหมดถูก map เป็น "l" แล้ว -> t/d/s/p ที่เหลือหลัง translate มาจากการ map เท่านั้น
+TABLE = _build_table()
+
+
+def char_profile(text: str) -> dict:
+    s = (text or "").translate(TABLE)
+    out = {name: s.count(mark) for name, mark in _MARK.items()}
+    out["other"] = len(s) - sum(out.values())
+    return out
+
+
+def merge_profiles(*profiles: dict) -> dict:
+    return {k: sum(int(p.get(k, 0)) for p in profiles) for k in CLASSES}
+
+
+# -------------------------
+# coefficients (fit ด้วย manage.py calibrate_tokens แล้วเก็บเป็น JSON)
+# -------------------------
+_lock = threading.Lock()
+_coefs = None
+_coefs_mtime = None
+
+
+def coefs_path() -> Path:
+    return Path(getattr(settings, "LLM_TOKEN_ESTIMATOR_PATH", "") or Path(settings.BASE_DIR) / "token_estimator.json")
+
+
+def coefficients() -> dict:
+    global _coefs, _coefs_mtime
+    path = coefs_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    if _coefs is None or mtime != _coefs_mtime:
+        with _lock:
+            loaded = dict(DEFAULT_COEFS)
+            if mtime is not None:
+                try:
+                    data = json.loads(path.read_text(encoding="utf-8"))
+                    loaded.update({k: float(v) for k, v in (data.get("coefs") or {}).items() if k in loaded})
+                except (OSError, ValueError) as e:
+                    logger.warning("token estimator: cannot read %s: %s", path, e)
+            _coefs, _coefs_mtime = loaded, mtime
+    return _coefs
+
+
+def save_coefficients(coefs: dict, meta: dict | None = None) -> Path:
+    global _coefs
+    path = coefs_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"coefs": coefs, "meta": meta or {}}, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    _coefs = None
+    return path
+
+
+def estimate_from_profile(profile: dict, *, coefs: dict | None = None, intercept: bool = False) -> float:
+    c = coefs or coefficients()
+    total = sum(c[k] * profile.get(k, 0) for k in CLASSES)
+    return total + (c["intercept"] if intercept else 0.0)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    token ของข้อความหนึ่งก้อน (ไม่รวม overhead ของ request)
+    """
+    if not text:
+        return 0
+    return max(1, round(estimate_from_profile(char_profile(text))))
+
+
+def estimate_prompt_tokens(system: str, user: str) -> int:
+    """
+    input token ของ request หนึ่งครั้ง (system + user + overhead ของ message format)
+    """
+    prof = merge_profiles(char_profile(system), char_profile(user))
+    return max(1, round(estimate_from_profile(prof, intercept=True)))
+
+
+def chars_for_tokens(text: str, max_tokens: int) -> int:
+    """
+    ตัดข้อความให้ไม่เกิน max_tokens: ใช้อัตรา token/ตัวอักษรเฉลี่ยของข้อความนั้นเอง
+    """
+    if not text:
+        return 0
+    est = estimate_tokens(text)
+    if est <= max_tokens:
+        return len(text)
+    return max(0, int(len(text) * max_tokens / est))
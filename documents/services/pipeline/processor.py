@@ -8,11 +8,15 @@ import logging, re
 from documents.models import Document
 from .text_extractor import extract_text, extract_text_bytes
 from documents.services.analysis.summarizer import summarize_text
-from documents.services.analysis.classifier import classify_text
+from documents.services.analysis.extractive import extract_summary
+from documents.services.analysis.lang_detect import language_from_ratio, thai_ratio
+from documents.services.analysis.classifier import classify_text_with_source
 from documents.services.storage.file_organizer import move_document_file_to_type_folder
 from documents.models import DocumentChunk
 from documents.services.pipeline.chunking import chunk_text
 from documents.services.search.search_index import update_document_search_vector
+from documents.services.search.search_cache import bump_generation
+from documents.services.search.suggest import index_document_terms
 
 logger = logging.getLogger(__name__)
 _NUL_RE = re.compile(r"\x00+")
@@ -24,66 +28,105 @@ def sanitize_text(s: str) -> str:
     s = s.replace("\r\n", "\n").replace("\r", "\n")
     return s
 
+def _bump_after_commit(owner_id) -> None:
+    # เอกสารของ user เปลี่ยน (สร้างใหม่ / reprocess / เปลี่ยนประเภท) -> invalidate search cache หลัง commit
+    transaction.on_commit(lambda: bump_generation(owner_id))
+
+
+@transaction.atomic
+def _ingest(doc: Document) -> str:
+    """
+    ช่วงที่ 1: extract text / chunk / index / summary ชั่วคราวแบบ extractive แล้ว commit
+    -> ระหว่างรอ LLM (หลายวินาที) เอกสารเปิดดู / ค้นหา / แชตได้แล้ว และไม่ถือ transaction ค้างไว้
+    """
+    _bump_after_commit(doc.owner_id)
+
+    with doc.file.open("rb") as f:
+        file_bytes = f.read()
+
+    res = extract_text_bytes(file_bytes, doc.file_ext)
+
+    clean_text = sanitize_text(res.text)
+
+    doc.extracted_text = clean_text
+    doc.word_count = res.word_count
+    doc.char_count = res.char_count
+    # ภาษาคำนวณครั้งเดียวตอนนี้ -> summarizer / combined / title อ่านค่าที่เก็บไว้
+    doc.thai_ratio = thai_ratio(clean_text)
+    doc.lang = language_from_ratio(doc.thai_ratio)
+
+    # build chunks
+    DocumentChunk.objects.filter(document=doc).delete()
+    chunks = chunk_text(clean_text, chunk_size=900, overlap=150)
+    chunks = [sanitize_text(c) for c in chunks if c]
+    DocumentChunk.objects.bulk_create([
+        DocumentChunk(document=doc, idx=i+1, content=c, lang=language_from_ratio(thai_ratio(c)))
+        for i, c in enumerate(chunks)
+    ])
+    index_document_terms(doc, clean_text)
+
+    # summary ชั่วคราวแบบ extractive (ไม่ใช้ LLM) -> เอกสารมี summary เสมอแม้ LLM ปิด/ล้ม
+    if clean_text.strip() and (not doc.summary or not getattr(settings, "ENABLE_LLM", True)):
+        doc.summary = extract_summary(clean_text)
+
+    fields = ["extracted_text", "word_count", "char_count", "lang", "thai_ratio"]
+    if doc.summary:
+        fields.append("summary")
+    doc.save(update_fields=fields)
+    update_document_search_vector(doc.id)
+    return clean_text
+
+
 @transaction.atomic
+def _finalize(doc: Document) -> None:
+    # ช่วงที่ 3: บันทึกผล LLM + สถานะ done แล้วย้ายไฟล์ตามประเภท
+    _bump_after_commit(doc.owner_id)
+
+    doc.status = "done"
+    doc.processed_at = timezone.now()
+
+    fields = ["status", "processed_at", "error"]
+
+    if doc.summary:
+        fields.append("summary")
+    if doc.document_type:
+        fields += ["document_type", "type_source"]
+
+    doc.save(update_fields=fields)
+
+    update_document_search_vector(doc.id)
+    move_document_file_to_type_folder(doc)
+
+
 def process_document(doc: Document) -> Document:
     doc.status = "processing"
     doc.error = ""
     doc.save(update_fields=["status", "error"])
 
     try:
-        with doc.file.open("rb") as f:
-            file_bytes = f.read()
-
-        res = extract_text_bytes(file_bytes, doc.file_ext)
-
-        clean_text = sanitize_text(res.text)
-        
-        doc.extracted_text = clean_text
-        doc.word_count = res.word_count
-        doc.char_count = res.char_count
-
-        # build chunks
-        DocumentChunk.objects.filter(document=doc).delete()
-        chunks = chunk_text(clean_text, chunk_size=900, overlap=150)
-        chunks = [sanitize_text(c) for c in chunks if c] 
-        DocumentChunk.objects.bulk_create([
-            DocumentChunk(document=doc, idx=i+1, content=c)
-            for i, c in enumerate(chunks)
-        ])
+        clean_text = _ingest(doc)
 
+        # ช่วงที่ 2: LLM อยู่นอก transaction (summary ชั่วคราวถูก commit ไปแล้ว)
         if getattr(settings, "ENABLE_LLM", True) and clean_text.strip():
             try:
-                s = summarize_text(clean_text, owner=doc.owner)
+                s = summarize_text(clean_text, owner=doc.owner, lang=doc.lang)
                 if s:  # ได้ summary จริงค่อยทับ
                     doc.summary = s
 
-                t = classify_text(clean_text, owner=doc.owner)
+                t, source = classify_text_with_source(clean_text, owner=doc.owner)
                 if t:
                     doc.document_type = t
+                    doc.type_source = source
 
             except Exception as e:
                 logger.exception("LLM step failed: %s", e)
                 doc.error = f"LLM failed: {e}"
 
-
-        doc.status = "done"
-        doc.processed_at = timezone.now()
-
-        fields = ["extracted_text","word_count","char_count","status","processed_at","error"]
-
-        if doc.summary:
-            fields.append("summary")
-        if doc.document_type:
-            fields.append("document_type")
-
-        doc.save(update_fields=fields)
-
-        update_document_search_vector(doc.id)
-        move_document_file_to_type_folder(doc)
+        _finalize(doc)
         return doc
 
     except Exception as e:
         doc.status = "error"
         doc.error = str(e)
         doc.save(update_fields=["status", "error"])
-        raise
\ No newline at end of file
+        raise
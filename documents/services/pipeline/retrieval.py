@@ -2,8 +2,12 @@ import re
 from collections import Counter
 from dataclasses import dataclass
 from documents.models import DocumentChunk
+from documents.services.analysis.lang_detect import detect_language
 
 WORD = re.compile(r"[A-Za-zก-๙0-9]+")
+# เอกสารสองภาษา: chunk ภาษาเดียวกับคำถาม (DocumentChunk.lang ที่คำนวณไว้ตอน ingest) ได้คะแนนเพิ่มเล็กน้อย
+# -> excerpt ที่ส่งเข้า prompt ตรงภาษาที่ผู้ใช้ถามก่อน เมื่อคะแนนใกล้กัน
+SAME_LANG_BOOST = 1.15
 
 STOP_TH = {
     "ที่","และ","หรือ","คือ","เป็น","ได้","ใน","ของ","กับ","จาก","ให้","แล้ว","ยัง","ไม่","มี","จะ","ก็","มา","ไป",
@@ -77,9 +81,10 @@ def retrieve_top_chunks(doc_id: int, query: str, k: int = 6):
 
     qcount = Counter(q)
     q_terms = set(qcount.keys())
+    q_lang = detect_language(query)
 
     scored = []
-    for ch in DocumentChunk.objects.filter(document_id=doc_id):
+    for ch in DocumentChunk.objects.filter(document_id=doc_id).only("idx", "content", "lang"):
         w = _tok(ch.content)
         if not w:
             continue
@@ -104,6 +109,8 @@ def retrieve_top_chunks(doc_id: int, query: str, k: int = 6):
         # - penalty เล็กน้อยถ้า chunk ยาวมาก (กัน spam)
         length_penalty = max(0.85, min(1.0, 900 / max(1, len(ch.content))))
         score = (raw + matched * 1.2) * length_penalty
+        if ch.lang == q_lang:
+            score *= SAME_LANG_BOOST
 
         # ทำ excerpt รอบ ๆ คำที่ match เพื่อลด noise
         excerpt = _snippet_around_terms(ch.content, list(overlap_terms), window=260)
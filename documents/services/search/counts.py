@@ -0,0 +1,67 @@
+from __future__ import annotations
+import hashlib, json, logging, threading, time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .search_cache import get_generation
+
+logger = logging.getLogger(__name__)
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "SEARCH_COUNT_CACHE_TTL", 3600))
+
+def _stale_after() -> int:
+    return int(getattr(settings, "SEARCH_COUNT_STALE_AFTER", 60))
+
+def count_key(user_id: int, filters: dict, gen: int | None = None) -> str:
+    raw = json.dumps(filters, sort_keys=True, default=str)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+    if gen is None:
+        return f"search_count:{user_id}:{digest}"
+    return f"search_count:{user_id}:{gen}:{digest}"
+
+def _store(keys: tuple[str, ...], n: int):
+    value = {"n": int(n), "at": time.time()}
+    cache.set_many({k: value for k in keys}, timeout=_ttl())
+
+def _refresh(keys: tuple[str, ...], qs):
+    try:
+        _store(keys, qs.count())
+    except Exception as e:
+        logger.warning("search count refresh failed key=%s: %s", keys[0], e)
+    finally:
+        cache.delete(f"{keys[0]}:lock")
+        # thread นี้เปิด connection ของตัวเอง ต้องปิดเองเสมอ
+        connection.close()
+
+def _refresh_async(keys: tuple[str, ...], qs):
+    # กัน refresh ซ้อน (หลาย request เห็นค่า stale พร้อมกัน)
+    if not cache.add(f"{keys[0]}:lock", 1, timeout=max(5, _stale_after())):
+        return
+    t = threading.Thread(target=_refresh, args=(keys, qs.all()), daemon=True)
+    t.start()
+
+def cached_count(qs, *, user_id: int, filters: dict) -> int:
+    """
+    COUNT(*) แบบ cache + stale-while-revalidate:
+    - ยังสด (generation เดียวกัน) -> คืนค่าจาก cache
+    - generation เดียวกันแต่เก่าเกิน SEARCH_COUNT_STALE_AFTER -> คืนค่าเดิมทันที แล้ว refresh ใน background thread
+    - generation เปลี่ยน (มีเอกสารเพิ่ม/ลบ) หรือไม่มีค่าเลย -> นับจริงแบบ sync
+      (ห้ามคืนค่าของ generation ก่อน: cached_response จะเก็บ payload นั้นไว้ใต้ key ของ generation ใหม่
+       ทำให้ count ค้างไปอีกทั้ง SEARCH_CACHE_TTL)
+    """
+    gen = get_generation(user_id)
+    keys = (count_key(user_id, filters, gen),)
+
+    hit = cache.get(keys[0])
+    if hit:
+        if time.time() - float(hit.get("at") or 0) > _stale_after():
+            _refresh_async(keys, qs)
+        return int(hit.get("n") or 0)
+
+    n = qs.count()
+    _store(keys, n)
+    return n
@@ -0,0 +1,117 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchHeadline
+from django.db.models import Q, Value, F, FloatField
+from django.db.models.functions import Coalesce, Cast, Substr
+from django.utils.dateparse import parse_date
+
+from documents.models import Document
+from .counts import cached_count
+from .pagination import KeysetPage, paginate_keyset
+from .trigram import fuzzy_q, trigram_weight, word_similarity
+
+# คอลัมน์ที่หน้า list / search API ใช้จริง (ไม่ดึง extracted_text / search_vector)
+LIST_FIELDS = ("id", "file_name", "document_type", "word_count", "char_count", "uploaded_at", "has_chat")
+
+PER_PAGE = 10
+
+
+@dataclass
+class DocumentFilters:
+    q: str = ""
+    dtype: str = ""
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+    @classmethod
+    def from_params(cls, params) -> "DocumentFilters":
+        return cls(
+            q=(params.get("q") or "").strip(),
+            dtype=(params.get("type") or "").strip().lower(),
+            date_from=parse_date(params.get("from") or ""),
+            date_to=parse_date(params.get("to") or ""),
+        )
+
+    def as_dict(self) -> dict:
+        return {"q": self.q, "type": self.dtype, "from": self.date_from, "to": self.date_to}
+
+
+def _search_query(q: str) -> SearchQuery:
+    return SearchQuery(q, search_type="websearch", config="simple")
+
+
+def filtered_documents(owner, f: DocumentFilters, *, ranked: bool = True):
+    """
+    queryset ที่ filter + เรียงลำดับแล้ว (ยังไม่ project คอลัมน์)
+    - มี q -> annotate rank แล้วเรียง (rank, uploaded_at, id)
+    - ไม่มี q -> เรียง (uploaded_at, id)
+    ranked=False -> filter อย่างเดียว (ไว้ใช้กับ aggregate ที่ไม่ต้องการ rank / ordering)
+    """
+    qs = Document.objects.filter(owner=owner)
+
+    if f.dtype:
+        qs = qs.filter(document_type=f.dtype)
+    if f.date_from:
+        qs = qs.filter(uploaded_at__date__gte=f.date_from)
+    if f.date_to:
+        qs = qs.filter(uploaded_at__date__lte=f.date_to)
+
+    if f.q and not ranked:
+        return qs.filter(Q(search_vector=_search_query(f.q)) | fuzzy_q("file_name", f.q))
+
+    if f.q:
+        query = _search_query(f.q)
+        # rank = full-text rank + (น้ำหนัก * word similarity ของชื่อไฟล์) -> พิมพ์ผิดเล็กน้อยก็ยังเจอ
+        text_rank = Coalesce(SearchRank(F("search_vector"), query), Value(0.0))
+        name_sim = word_similarity("file_name", f.q) * Value(trigram_weight())
+        qs = qs.filter(
+            Q(search_vector=query) | fuzzy_q("file_name", f.q)
+        ).annotate(
+            rank=Cast(text_rank + name_sim, FloatField()),
+        ).order_by("-rank", "-uploaded_at", "-id")
+    else:
+        qs = qs.order_by("-uploaded_at", "-id")
+
+    return qs
+
+
+def attach_snippets(items: list, q: str) -> None:
+    """
+    คำนวณ SearchHeadline เฉพาะ id ของหน้าปัจจุบัน (query ที่สอง)
+    และตัด extracted_text ไว้แค่ prefix เพื่อไม่ให้ headline สแกนทั้งเอกสาร
+    """
+    for d in items:
+        d.snippet = ""
+    if not q or not items:
+        return
+
+    prefix_chars = int(getattr(settings, "SEARCH_SNIPPET_PREFIX_CHARS", 20000))
+    ids = [d.id for d in items]
+    rows = Document.objects.filter(id__in=ids).annotate(
+        snippet=SearchHeadline(
+            Substr(Coalesce("extracted_text", Value("")), 1, prefix_chars),
+            _search_query(q),
+            config="simple",
+            start_sel="",
+            stop_sel="",
+            max_words=35,
+            min_words=15,
+        ),
+    ).values_list("id", "snippet")
+
+    by_id = {doc_id: (snippet or "").strip() for doc_id, snippet in rows}
+    for d in items:
+        d.snippet = by_id.get(d.id, "")
+
+
+def search_page(owner, f: DocumentFilters, *, cursor: str = "", per_page: int = PER_PAGE) -> tuple[KeysetPage, int]:
+    qs = filtered_documents(owner, f)
+    total = cached_count(qs, user_id=owner.id, filters=f.as_dict())
+
+    page = paginate_keyset(qs.only(*LIST_FIELDS), cursor=cursor, per_page=per_page, ranked=bool(f.q))
+    attach_snippets(page.items, f.q)
+    return page, total
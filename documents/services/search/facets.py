@@ -0,0 +1,61 @@
+from __future__ import annotations
+import calendar
+from dataclasses import replace
+
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from documents.services.analysis.classifier import LABELS
+from .document_query import DocumentFilters, filtered_documents
+from .search_cache import cached_response
+
+
+def _month_bucket(month) -> dict:
+    d = timezone.localtime(month).date() if timezone.is_aware(month) else month.date()
+    last_day = calendar.monthrange(d.year, d.month)[1]
+    return {
+        "value": d.strftime("%Y-%m"),
+        "label": d.strftime("%b %Y"),
+        "from": d.replace(day=1).isoformat(),
+        "to": d.replace(day=last_day).isoformat(),
+    }
+
+
+def _compute(owner, f: DocumentFilters) -> dict:
+    """
+    GROUP BY (document_type, เดือนที่อัปโหลด) ครั้งเดียว แล้วพับผลใน Python
+    - facet ของ type ไม่ใช้ type filter ปัจจุบัน (ให้เห็นตัวเลือกอื่นด้วย) แต่ใช้ q / ช่วงวันที่
+    - facet ของเดือนใช้ทุก filter รวม type
+    """
+    base = filtered_documents(owner, replace(f, dtype=""), ranked=False)
+    rows = (
+        base.annotate(month=TruncMonth("uploaded_at"))
+        .values("document_type", "month")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+    by_type = {label: 0 for label in LABELS}
+    by_month: dict[str, dict] = {}
+    for r in rows:
+        dtype = r["document_type"] or "other"
+        by_type[dtype] = by_type.get(dtype, 0) + r["n"]
+
+        if f.dtype and dtype != f.dtype:
+            continue
+        if r["month"] is None:
+            continue
+        bucket = _month_bucket(r["month"])
+        entry = by_month.setdefault(bucket["value"], {**bucket, "count": 0})
+        entry["count"] += r["n"]
+
+    return {
+        "types": [{"value": k, "count": v} for k, v in by_type.items()],
+        "months": sorted(by_month.values(), key=lambda m: m["value"], reverse=True),
+    }
+
+
+def facet_counts(owner, f: DocumentFilters) -> dict:
+    # cache ตาม generation ของ user เหมือนผลค้นหา (เอกสารเปลี่ยน -> facet ใหม่)
+    return cached_response(owner.id, "facets", f.as_dict(), lambda: _compute(owner, f))
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from django.db.models import Value
+from django.db.models.functions import Greatest
+
+from documents.models import CombinedSummary
+from .trigram import fuzzy_q, trigram_weight, word_similarity
+
+SORTS = {
+    "oldest": ("created_at",),
+    "title": ("title", "-created_at"),
+    "docs": ("-doc_count", "-created_at"),
+    "words": ("-total_words", "-created_at"),
+    "newest": ("-created_at",),
+}
+
+
+def filtered_notebooks(owner, q: str = "", sort: str = "newest"):
+    """
+    ค้น notebook ด้วย trigram (title และ combined_summary: substring + typo)
+    sort="relevance" ใช้ได้เฉพาะตอนมี q
+    """
+    qs = CombinedSummary.objects.filter(owner=owner)
+
+    if q:
+        qs = qs.filter(
+            fuzzy_q("title", q) |
+            fuzzy_q("combined_summary", q)
+        ).annotate(
+            relevance=Greatest(
+                word_similarity("title", q),
+                word_similarity("combined_summary", q) * Value(trigram_weight()),
+            ),
+        )
+
+    if sort == "relevance" and q:
+        return qs.order_by("-relevance", "-created_at")
+    return qs.order_by(*SORTS.get(sort, SORTS["newest"]))
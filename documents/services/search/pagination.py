@@ -0,0 +1,92 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SALT = "documents.search.cursor"
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: Optional[str]
+    has_next: bool
+    has_previous: bool
+
+
+def encode_cursor(obj, *, ranked: bool) -> str:
+    """
+    cursor = ตำแหน่งของแถวสุดท้ายในหน้า (rank, uploaded_at, id)
+    เซ็นด้วย signing เพื่อให้ client มองเป็น token ทึบ ๆ แก้ไม่ได้
+    """
+    payload = {
+        "m": "r" if ranked else "t",
+        "u": obj.uploaded_at.isoformat(),
+        "i": obj.id,
+    }
+    if ranked:
+        payload["r"] = float(getattr(obj, "rank", 0.0) or 0.0)
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token: str, *, ranked: bool) -> Optional[dict[str, Any]]:
+    token = (token or "").strip()
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+
+    # cursor จากโหมด sort อื่น (เช่นเปลี่ยน q ระหว่างทาง) -> เริ่มหน้าแรกใหม่
+    if payload.get("m") != ("r" if ranked else "t"):
+        return None
+
+    uploaded_at = parse_datetime(payload.get("u") or "")
+    if uploaded_at is None or not isinstance(payload.get("i"), int):
+        return None
+
+    out = {"uploaded_at": uploaded_at, "id": payload["i"]}
+    if ranked:
+        try:
+            out["rank"] = float(payload.get("r") or 0.0)
+        except (TypeError, ValueError):
+            return None
+    return out
+
+
+def _after(pos: dict[str, Any], *, ranked: bool) -> Q:
+    # ทุก sort เป็น DESC -> แถวถัดไปคือแถวที่ "น้อยกว่า" cursor ตามลำดับ key
+    after_time = Q(uploaded_at__lt=pos["uploaded_at"]) | Q(
+        uploaded_at=pos["uploaded_at"], id__lt=pos["id"]
+    )
+    if not ranked:
+        return after_time
+    return Q(rank__lt=pos["rank"]) | (Q(rank=pos["rank"]) & after_time)
+
+
+def paginate_keyset(qs, *, cursor: str = "", per_page: int = 10, ranked: bool = False) -> KeysetPage:
+    """
+    Keyset pagination (ไม่มี COUNT / OFFSET):
+    - ranked=True  -> qs ต้อง annotate "rank" และ order_by("-rank", "-uploaded_at", "-id")
+    - ranked=False -> qs ต้อง order_by("-uploaded_at", "-id")
+    ดึงเกินมา 1 แถวเพื่อรู้ว่ามีหน้าถัดไปหรือไม่
+    """
+    pos = decode_cursor(cursor, ranked=ranked)
+    if pos:
+        qs = qs.filter(_after(pos, ranked=ranked))
+
+    rows = list(qs[: per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = encode_cursor(rows[-1], ranked=ranked) if (has_next and rows) else None
+    return KeysetPage(
+        items=rows,
+        next_cursor=next_cursor,
+        has_next=has_next,
+        has_previous=pos is not None,
+    )
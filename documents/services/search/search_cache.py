@@ -0,0 +1,119 @@
+from __future__ import annotations
+import hashlib, json, logging
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+STATS_KEYS = ("hits", "misses", "skipped")
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "SEARCH_CACHE_TTL", 120))
+
+def _max_entries() -> int:
+    return int(getattr(settings, "SEARCH_CACHE_MAX_ENTRIES", 500))
+
+def _max_bytes() -> int:
+    return int(getattr(settings, "SEARCH_CACHE_MAX_BYTES", 256 * 1024))
+
+def _enabled() -> bool:
+    return bool(getattr(settings, "SEARCH_CACHE_ENABLED", True))
+
+
+# -------------------------
+# generation counter
+# -------------------------
+def _gen_key(user_id: int) -> str:
+    return f"search_gen:{user_id}"
+
+def get_generation(user_id: int) -> int:
+    key = _gen_key(user_id)
+    gen = cache.get(key)
+    if gen is None:
+        cache.add(key, 1, timeout=None)
+        gen = cache.get(key, 1)
+    return int(gen)
+
+def bump_generation(user_id: int | None) -> None:
+    """
+    เอกสารของ user เปลี่ยน -> ขยับ generation ทีเดียว
+    key เก่าทั้งหมดจะไม่ถูกอ่านอีก (หมดอายุเองตาม TTL) ไม่ต้องไล่ลบทีละ key
+    """
+    if not user_id:
+        return
+    key = _gen_key(user_id)
+    cache.add(key, 1, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+
+
+# -------------------------
+# metrics
+# -------------------------
+def _stat(name: str):
+    key = f"search_cache_stats:{name}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+def stats() -> dict:
+    out = {name: int(cache.get(f"search_cache_stats:{name}", 0) or 0) for name in STATS_KEYS}
+    lookups = out["hits"] + out["misses"]
+    out["hit_ratio"] = (out["hits"] / lookups) if lookups else 0.0
+    return out
+
+def reset_stats() -> None:
+    cache.delete_many([f"search_cache_stats:{name}" for name in STATS_KEYS])
+
+
+# -------------------------
+# response cache
+# -------------------------
+def _entry_key(user_id: int, gen: int, namespace: str, params: dict) -> str:
+    raw = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+    return f"search_cache:{user_id}:{gen}:{namespace}:{digest}"
+
+def _reserve_slot(user_id: int, gen: int) -> bool:
+    # size cap: จำนวน entry ต่อ user ต่อ generation
+    key = f"search_cache:{user_id}:{gen}:n"
+    cache.add(key, 0, timeout=_ttl())
+    try:
+        n = cache.incr(key)
+    except ValueError:
+        return False
+    return n <= _max_entries()
+
+def cached_response(user_id: int, namespace: str, params: dict, build: Callable[[], dict]) -> dict:
+    """
+    cache ผล JSON ของการค้นหา key = (user, generation, namespace, params)
+    - เกิน SEARCH_CACHE_MAX_BYTES หรือเกินจำนวน entry ต่อ generation -> ไม่ cache
+    """
+    if not _enabled():
+        return build()
+
+    gen = get_generation(user_id)
+    key = _entry_key(user_id, gen, namespace, params)
+
+    hit = cache.get(key)
+    if hit is not None:
+        _stat("hits")
+        return hit
+
+    _stat("misses")
+    payload = build()
+
+    size = len(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+    if size > _max_bytes() or not _reserve_slot(user_id, gen):
+        _stat("skipped")
+        return payload
+
+    cache.set(key, payload, timeout=_ttl())
+    return payload
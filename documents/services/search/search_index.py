@@ -4,11 +4,12 @@ from django.db.models.functions import Cast, Coalesce
 
 from documents.models import Document
 
+def search_vector_expression():
+    return (
+        SearchVector(Cast("file_name", TextField()), weight="A", config="simple")
+        + SearchVector(Cast("summary", TextField()), weight="A", config="simple")
+        + SearchVector(Cast("extracted_text", TextField()), weight="B", config="simple")
+    )
+
 def update_document_search_vector(doc_id: int):
-    Document.objects.filter(id=doc_id).update(
-        search_vector=(
-            SearchVector(Cast("file_name", TextField()), weight="A", config="simple")
-            + SearchVector(Cast("summary", TextField()), weight="A", config="simple")
-            + SearchVector(Cast("extracted_text", TextField()), weight="B", config="simple")
-        )
-    )
\ No newline at end of file
+    Document.objects.filter(id=doc_id).update(search_vector=search_vector_expression())
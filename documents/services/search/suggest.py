@@ -0,0 +1,100 @@
+from __future__ import annotations
+import re
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Sum
+from django.urls import reverse
+
+from documents.models import SuggestTerm
+from documents.services.pipeline.retrieval import _tok
+from .search_cache import bump_generation, cached_response
+
+NAME_WORD = re.compile(r"[A-Za-zก-๙0-9]+")
+TERM_MAX_LEN = 64
+
+
+def _norm(s: str) -> str:
+    return (s or "").strip().lower()[:TERM_MAX_LEN]
+
+
+def _name_terms(name: str) -> list[str]:
+    """
+    คำนำหน้าที่ใช้ match ชื่อ: ทั้งชื่อเต็ม + แต่ละคำในชื่อ
+    เช่น "Q3_Budget Report.pdf" -> ["q3_budget report", "q3", "budget", "report"]
+    """
+    stem = Path(name or "").stem
+    out = [_norm(stem)]
+    for w in NAME_WORD.findall(stem):
+        w = _norm(w)
+        if len(w) > 1 and w not in out:
+            out.append(w)
+    return [t for t in out if t]
+
+
+def index_document_terms(doc, text: str) -> None:
+    """
+    เรียกตอน ingest: ชื่อไฟล์ + คำที่พบบ่อยในเนื้อหา
+    """
+    top_n = int(getattr(settings, "SUGGEST_TERMS_PER_DOCUMENT", 30))
+    scan_chars = int(getattr(settings, "SUGGEST_SCAN_CHARS", 200_000))
+
+    SuggestTerm.objects.filter(document=doc).delete()
+
+    rows = [
+        SuggestTerm(owner_id=doc.owner_id, document=doc, kind="file", term=t, display=doc.file_name[:255], weight=1)
+        for t in _name_terms(doc.file_name)
+    ]
+
+    counts = Counter(t for t in _tok((text or "")[:scan_chars]) if not t.isdigit() and len(t) <= TERM_MAX_LEN)
+    rows.extend(
+        SuggestTerm(owner_id=doc.owner_id, document=doc, kind="term", term=t, display=t, weight=n)
+        for t, n in counts.most_common(top_n)
+    )
+    SuggestTerm.objects.bulk_create(rows)
+
+
+def index_notebook_terms(cs) -> None:
+    SuggestTerm.objects.filter(notebook=cs).delete()
+    SuggestTerm.objects.bulk_create([
+        SuggestTerm(owner_id=cs.owner_id, notebook=cs, kind="notebook", term=t, display=cs.title[:255], weight=1)
+        for t in _name_terms(cs.title)
+    ])
+    bump_generation(cs.owner_id)
+
+
+def _ranked(owner, prefix: str, kind: str, fields: tuple, limit: int):
+    """
+    group ตาม fields แล้วเรียงตามน้ำหนักรวม (คำนวณใน SQL ทั้งหมด)
+    แยก query ต่อ kind: term มี weight = ความถี่ต่อเอกสาร ถ้ารวมกับ file/notebook (weight=1) จะเบียดจนไม่เหลือที่
+    """
+    return (
+        SuggestTerm.objects.filter(owner=owner, kind=kind, term__startswith=prefix)
+        .values(*fields)
+        .annotate(w=Sum("weight"))
+        .order_by("-w", "display")[:limit]
+    )
+
+
+def _lookup(owner, prefix: str, limit: int) -> dict:
+    files = [
+        {"kind": "file", "text": r["display"], "url": reverse("documents:detail", kwargs={"pk": r["document_id"]})}
+        for r in _ranked(owner, prefix, "file", ("display", "document_id"), limit)
+    ]
+    notebooks = [
+        {"kind": "notebook", "text": r["display"], "url": reverse("documents:combined_detail", kwargs={"pk": r["notebook_id"]})}
+        for r in _ranked(owner, prefix, "notebook", ("display", "notebook_id"), limit)
+    ]
+    # คำเดียวกันจากหลายเอกสาร -> รวมน้ำหนักทุกเอกสาร (group ตาม display อย่างเดียว)
+    terms = [{"kind": "term", "text": r["display"], "url": ""} for r in _ranked(owner, prefix, "term", ("display",), limit)]
+    items = files + notebooks + terms
+    return {"ok": True, "items": items[:limit]}
+
+
+def suggest(owner, q: str, *, limit: int = 8) -> dict:
+    prefix = _norm(q)
+    if not prefix:
+        return {"ok": True, "items": []}
+    # ผลต่อ prefix cache ตาม generation ของ user -> พิมพ์ซ้ำ/ลบตัวอักษรกลับไม่ต้อง query ใหม่
+    return cached_response(owner.id, "suggest", {"p": prefix, "n": limit}, lambda: _lookup(owner, prefix, limit))
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+def trigram_threshold() -> float:
+    return float(getattr(settings, "SEARCH_TRIGRAM_THRESHOLD", 0.4))
+
+def trigram_weight() -> float:
+    return float(getattr(settings, "SEARCH_TRIGRAM_WEIGHT", 0.5))
+
+
+def fuzzy_q(field: str, q: str, *, substring: bool = True) -> Q:
+    """
+    match แบบ word similarity (%>) และ (ถ้า substring=True) แบบ icontains
+    - %> ใช้ GIN gin_trgm_ops บนคอลัมน์ตรง ๆ
+    - icontains ของ Django คือ UPPER(col) LIKE UPPER(...) -> ต้องมี GIN gin_trgm_ops บน UPPER(col)
+    threshold ของ %> มาจาก pg_trgm.word_similarity_threshold ที่ตั้งตอนเปิด connection
+    """
+    cond = Q(**{f"{field}__trigram_word_similar": q})
+    if substring:
+        cond |= Q(**{f"{field}__icontains": q})
+    return cond
+
+
+def word_similarity(field: str, q: str) -> TrigramWordSimilarity:
+    return TrigramWordSimilarity(q, field)
+
+
+def configure_trigram_threshold(sender, connection, **kwargs):
+    """
+    connection_created handler: ตั้ง threshold ของ pg_trgm ต่อ connection
+    (ใช้ set_config เพราะ SET ไม่รับ bind parameter)
+    """
+    if connection.vendor != "postgresql":
+        return
+    threshold = str(trigram_threshold())
+    try:
+        with connection.cursor() as cur:
+            cur.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false),"
+                " set_config('pg_trgm.similarity_threshold', %s, false)",
+                [threshold, threshold],
+            )
+    except Exception as e:
+        logger.warning("pg_trgm threshold setup failed: %s", e)
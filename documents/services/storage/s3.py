@@ -0,0 +1,35 @@
+from __future__ import annotations
+import threading
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+_lock = threading.Lock()
+_client = None
+
+
+def s3_client():
+    """
+    boto3 low-level client เป็น thread-safe -> สร้างครั้งเดียวต่อ process แล้วใช้ซ้ำ
+    (ไม่ต้อง resolve credential / เปิด TLS ใหม่ทุก request)
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                cfg = Config(
+                    max_pool_connections=int(getattr(settings, "AWS_S3_MAX_POOL_CONNECTIONS", 20)),
+                    retries={"max_attempts": 3, "mode": "standard"},
+                )
+                _client = boto3.client("s3", region_name=settings.AWS_S3_REGION_NAME, config=cfg)
+    return _client
+
+
+def presigned_get_url(key: str, *, filename_disposition: str = "", content_type: str = "", expires_in: int = 60) -> str:
+    params = {"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": key}
+    if filename_disposition:
+        params["ResponseContentDisposition"] = filename_disposition
+    if content_type:
+        params["ResponseContentType"] = content_type
+    return s3_client().generate_presigned_url(ClientMethod="get_object", Params=params, ExpiresIn=expires_in)
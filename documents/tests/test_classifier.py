@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.analysis import classifier
+
+
+class ParseBatchAnswerTests(SimpleTestCase):
+    def test_formats_and_missing_slots(self):
+        raw = "1: Invoice\n[2] report\n4) banana\n#5 - resume\n"
+        self.assertEqual(classifier.parse_batch_answer(raw, 5), ["invoice", "report", None, None, "resume"])
+
+    def test_out_of_range_and_duplicate_slots(self):
+        raw = "0: invoice\n2: policy\n2: report\n9: other"
+        self.assertEqual(classifier.parse_batch_answer(raw, 3), [None, "policy", None])
+
+    def test_empty_answer(self):
+        self.assertEqual(classifier.parse_batch_answer("", 2), [None, None])
+
+
+@override_settings(CLASSIFY_BATCH_MAX_ITEMS=3, CLASSIFY_BATCH_MAX_INPUT_TOKENS=100000)
+class ClassifyBatchTests(SimpleTestCase):
+    def test_plan_respects_item_cap(self):
+        self.assertEqual(classifier.plan_batches(["doc"] * 7), [[0, 1, 2], [3, 4, 5], [6]])
+
+    @override_settings(CLASSIFY_BATCH_MAX_INPUT_TOKENS=0)
+    def test_plan_never_returns_empty_batches(self):
+        self.assertEqual(classifier.plan_batches(["doc", "doc"]), [[0], [1]])
+
+    def test_missing_slot_falls_back_to_single_call(self):
+        single = mock.Mock(return_value=("policy", "llm"))
+        with mock.patch.object(classifier, "generate_text", return_value="1: invoice\n3: report") as gen, \
+                mock.patch.object(classifier, "classify_text_with_source", single):
+            out = classifier.classify_batch_with_source(["a", "b", "c", ""], use_local=False)
+
+        self.assertEqual(out, [("invoice", "llm"), ("policy", "llm"), ("report", "llm"), ("other", "")])
+        gen.assert_called_once()
+        single.assert_called_once_with("b", owner=None, use_local=False)
+
+    def test_llm_error_falls_back_for_every_slot(self):
+        single = mock.Mock(return_value=("other", ""))
+        with mock.patch.object(classifier, "generate_text", side_effect=classifier.LLMError("down")), \
+                mock.patch.object(classifier, "classify_text_with_source", single):
+            classifier.classify_batch_with_source(["a", "b"], use_local=False)
+        self.assertEqual(single.call_count, 2)
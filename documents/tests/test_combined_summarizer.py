@@ -0,0 +1,89 @@
+import hashlib
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.analysis import combined_summarizer as cs_mod
+
+
+class FakeNotebook:
+    def __init__(self, doc_ids):
+        self.pk = 1
+        self.doc_ids = list(doc_ids)
+        self.saved_nodes = {}
+        self.title, self.combined_summary, self.summary_hash = "Notebook", "", ""
+        self.auto_title = False
+        self.doc_count = self.total_words = 0
+        self.documents = mock.Mock()
+        self.documents.values_list.side_effect = lambda *a, **k: list(self.doc_ids)
+        self.nodes = mock.Mock()
+        self.nodes.values_list.side_effect = lambda *a: list(self.saved_nodes.items())
+        self.nodes.exclude.side_effect = self._exclude
+
+    def _exclude(self, input_hash__in):
+        keep = set(input_hash__in)
+        for h in [h for h in self.saved_nodes if h not in keep]:
+            del self.saved_nodes[h]
+        return mock.Mock()
+
+    def save(self, update_fields=None):
+        pass
+
+
+def _row(i):
+    summary = f"Document {i} reports quarterly revenue, staffing changes and the budget plan for region {i}. " * 2
+    return {"id": i, "file_name": f"doc{i}.pdf", "summary": summary, "word_count": 10, "lang": "en"}
+
+
+@override_settings(COMBINED_REDUCE_INPUT_TOKENS=500, COMBINED_REDUCE_GROUP_SIZE=4, COMBINED_SUMMARY_CONCURRENCY=1)
+class RefreshNotebookTests(SimpleTestCase):
+    def setUp(self):
+        self.prompts = []
+
+        def fake_generate(system, user, **kw):
+            self.prompts.append(system)
+            return "- partial " + hashlib.sha1(user.encode("utf-8")).hexdigest()[:8]
+
+        def fake_bulk_create(objs, ignore_conflicts=False):
+            for o in objs:
+                self.notebook.saved_nodes[o.input_hash] = o.output
+
+        patches = [
+            mock.patch.object(cs_mod, "_doc_rows", lambda ids: [_row(i) for i in sorted(ids)]),
+            mock.patch.object(cs_mod, "generate_text", fake_generate),
+            mock.patch.object(cs_mod, "generate_title", return_value="Title"),
+            mock.patch.object(cs_mod, "transaction"),
+            mock.patch.object(cs_mod.CombinedSummaryNode.objects, "bulk_create", side_effect=fake_bulk_create),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _partials(self):
+        return sum(1 for s in self.prompts if s == cs_mod.PARTIAL_SYSTEM)
+
+    def test_one_document_add_reuses_other_nodes(self):
+        self.notebook = FakeNotebook(range(1, 41))
+        first = cs_mod.refresh_notebook(self.notebook)
+        self.assertEqual(first["reused"], 0)
+        self.assertGreater(first["computed"], 3)
+        self.assertEqual(len(self.notebook.saved_nodes), first["computed"])
+
+        self.prompts.clear()
+        self.notebook.doc_ids.append(41)
+        second = cs_mod.refresh_notebook(self.notebook)
+        # เอกสารใหม่ต่อท้าย -> สรุปใหม่แค่กลุ่มท้ายของแต่ละชั้น ที่เหลือใช้ node เดิม
+        self.assertLessEqual(second["computed"], 2)
+        self.assertGreater(second["reused"], 0)
+        self.assertEqual(self._partials(), second["computed"])
+        self.assertTrue(second["summary_changed"])
+        self.assertEqual(self.notebook.doc_count, 41)
+
+    def test_unchanged_documents_make_no_llm_calls(self):
+        self.notebook = FakeNotebook(range(1, 21))
+        cs_mod.refresh_notebook(self.notebook)
+        self.prompts.clear()
+        stats = cs_mod.refresh_notebook(self.notebook)
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(stats["computed"], 0)
+        self.assertFalse(stats["summary_changed"])
@@ -0,0 +1,102 @@
+import asyncio
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.llm import limiter
+
+
+class LimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(limiter.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TokenBucketTests(LimiterTestCase):
+    def test_burst_is_one_minute(self):
+        self.assertTrue(limiter._bucket_take("t", 60, 60))
+        self.assertFalse(limiter._bucket_take("t", 60, 1))
+        self.now += 1
+        self.assertTrue(limiter._bucket_take("t", 60, 1))
+
+    def test_idle_credit_is_capped_before_charging(self):
+        limiter._bucket_take("t", 60, 1)
+        self.now += 3600  # ว่างนาน: เครดิตต้องไม่เกิน 1 นาที
+        self.assertTrue(limiter._bucket_take("t", 60, 60))
+        # ถ้าเติมเครดิตหลังหักค่า call ก่อนหน้าจะกลายเป็นฟรี -> call ถัดไปต้องไม่ผ่าน
+        self.assertFalse(limiter._bucket_take("t", 60, 1))
+
+    def test_call_larger_than_quota_waits_for_full_bucket_then_leaves_debt(self):
+        limiter._bucket_take("t", 60, 30)
+        self.assertFalse(limiter._bucket_take("t", 60, 120))
+        self.now += 30
+        self.assertTrue(limiter._bucket_take("t", 60, 120))
+        self.now += 30
+        self.assertFalse(limiter._bucket_take("t", 60, 1))  # ยังติดหนี้ 60
+        self.now += 31
+        self.assertTrue(limiter._bucket_take("t", 60, 1))
+
+    def test_unlimited(self):
+        self.assertTrue(limiter._bucket_take("t", 0, 10_000))
+
+
+@override_settings(LLM_CONCURRENCY_MIN=1, LLM_CONCURRENCY_MAX={"bedrock": 4}, LLM_CONCURRENCY_LATENCY_TARGET_MS=1000)
+class ConcurrencyTests(LimiterTestCase):
+    def test_slots_limit_concurrency(self):
+        leases = [limiter.Lease("bedrock", 1) for _ in range(5)]
+        self.assertEqual([lease._try() for lease in leases], [True, True, True, True, False])
+        leases[0].started = self.now
+        leases[0]._finish(None)
+        self.assertTrue(leases[4]._try())
+
+    def test_release_only_own_slot(self):
+        lease = limiter.Lease("bedrock", 1)
+        lease._try()
+        lease.started = self.now
+        cache.set(lease.slot, "someone-else")  # lease หมดอายุแล้วคนอื่นได้ slot ไป
+        lease._finish(None)
+        self.assertEqual(cache.get(lease.slot), "someone-else")
+
+    def test_throttle_halves_limit(self):
+        lease = limiter.Lease("bedrock", 1)
+        lease._try()
+        lease._finish(RuntimeError("ThrottlingException: Too many requests"))
+        self.assertEqual(limiter.current_limit("bedrock"), 2)
+
+    def test_fast_successes_add_one(self):
+        cache.set("llm_conc:bedrock:limit", 2, timeout=None)
+        for _ in range(2):
+            lease = limiter.Lease("bedrock", 1)
+            lease._try()
+            lease.started = self.now
+            lease._finish(None)
+        self.assertEqual(limiter.current_limit("bedrock"), 3)
+
+    def test_disconnect_is_neither_success_nor_failure(self):
+        def gen():
+            with limiter.acquire("bedrock", 1):
+                yield 1
+                yield 2
+
+        g = gen()
+        next(g)
+        with mock.patch.object(limiter, "_increase") as inc, mock.patch.object(limiter, "_decrease") as dec:
+            g.close()
+        inc.assert_not_called()
+        dec.assert_not_called()
+        self.assertEqual(limiter.snapshot("bedrock")["in_flight"], 0)
+
+    def test_async_acquire_uses_threads_for_cache(self):
+        async def run():
+            async with limiter.aacquire("bedrock", 1) as lease:
+                return lease.slot
+
+        with mock.patch.object(limiter, "sync_to_async", wraps=limiter.sync_to_async) as s2a:
+            slot = asyncio.run(run())
+        self.assertTrue(slot)
+        self.assertGreaterEqual(s2a.call_count, 2)
+        self.assertEqual(limiter.snapshot("bedrock")["in_flight"], 0)
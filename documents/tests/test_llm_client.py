@@ -0,0 +1,43 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.llm import client
+
+
+@override_settings(LLM_PROVIDER="mock", LLM_FALLBACK_PROVIDERS=[], LLM_HEDGE_ENABLED=False)
+class StreamAccountingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _stream(self, tokens):
+        def fake_tokens(p, system, user, context, prof, usage):
+            yield from tokens
+
+        patches = [
+            mock.patch.object(client, "_precheck"),
+            mock.patch.object(client, "_stream_tokens", fake_tokens),
+            mock.patch.object(client, "_log"),
+            mock.patch.object(client, "_settle"),
+        ]
+        mocks = [p.start() for p in patches]
+        for p in patches:
+            self.addCleanup(p.stop)
+        return client.generate_text_stream("sys", "question", purpose="chat"), mocks[2], mocks[3]
+
+    def test_completed_stream_is_logged(self):
+        gen, log, settle = self._stream(["hello ", "world"])
+        self.assertEqual("".join(gen), "hello world")
+        self.assertTrue(log.call_args.kwargs["ok"])
+        self.assertNotEqual(log.call_args.kwargs.get("stop_reason"), "cancelled")
+        settle.assert_called_once()
+
+    def test_closed_stream_still_logs_usage(self):
+        # hedge ที่แพ้ / client ตัดการเชื่อมต่อ -> gen.close() กลางทาง
+        gen, log, settle = self._stream(["hello ", "world", "!"])
+        next(gen)
+        gen.close()
+        self.assertEqual(log.call_args.kwargs["stop_reason"], "cancelled")
+        self.assertGreater(log.call_args.kwargs["output_tokens"], 0)
+        settle.assert_called_once()
@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from documents.management.commands.loadtest import _read_sse
+
+
+class ReadSseTests(SimpleTestCase):
+    def test_done_event(self):
+        ttft, event = _read_sse([b'event: token\ndata: {"t": "hi"}\n\n', b'event: done\ndata: {"ok": true}\n\n'], 0.0)
+        self.assertEqual(event, "done")
+        self.assertIsNotNone(ttft)
+
+    def test_error_inside_200_response(self):
+        chunks = ['event: error\ndata: {"ok": false, "code": "LLM_ERROR"}\n\n']
+        self.assertEqual(_read_sse(chunks, 0.0)[1], "error")
+
+    def test_marker_split_across_chunks(self):
+        chunks = [b'event: token\ndata: {"t": "a"}\n\nevent: er', b'ror\ndata: {"ok": false}\n\n']
+        self.assertEqual(_read_sse(chunks, 0.0)[1], "error")
+
+    def test_no_terminal_event(self):
+        self.assertEqual(_read_sse([b'event: token\ndata: {"t": "a"}\n\n'], 0.0)[1], "")
@@ -0,0 +1,75 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from documents.management.commands.train_classifier import _fit
+from documents.services.analysis import classifier, local_classifier
+
+DIM = 1 << 10
+TRAIN = {
+    "invoice": ["invoice total amount due payment 12345", "ใบแจ้งหนี้ ยอดชำระ invoice amount due"],
+    "resume": ["resume work experience education skills", "ประวัติการทำงาน การศึกษา resume skills"],
+}
+
+
+def _vec(text):
+    f = local_classifier.features(text, dim=DIM)
+    return np.fromiter(f.keys(), dtype=np.int64), np.log1p(np.fromiter(f.values(), dtype=np.float64))
+
+
+class FeatureTests(SimpleTestCase):
+    def test_thai_uses_character_trigrams(self):
+        f = local_classifier.features("สวัสดี", dim=DIM)
+        self.assertEqual(sum(f.values()), len("สวัสดี") - 2)
+
+    def test_long_numbers_collapse_by_length(self):
+        a = local_classifier.features("no 123456", dim=DIM)
+        b = local_classifier.features("no 654321", dim=DIM)
+        self.assertEqual(a, b)
+
+
+class LocalModelTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ctx = override_settings(LOCAL_CLASSIFIER_PATH=str(Path(tmp.name) / "m.npz"),
+                                LOCAL_CLASSIFIER_ENABLED=True, LOCAL_CLASSIFIER_THRESHOLD=0.9)
+        ctx.enable()
+        self.addCleanup(ctx.disable)
+        labels = sorted(TRAIN)
+        docs = [(y, *_vec(t)) for y, k in enumerate(labels) for t in TRAIN[k]]
+        local_classifier.save_model(local_classifier.Model(labels, *_fit(np, docs, labels, DIM, 0.1)))
+
+    def test_saved_model_round_trip(self):
+        label, conf = local_classifier.predict("invoice amount due")
+        self.assertEqual(label, "invoice")
+        self.assertGreater(conf, 0.5)
+        self.assertEqual(local_classifier.load_model().dim, DIM)
+
+    def test_below_threshold_defers_to_llm(self):
+        with override_settings(LOCAL_CLASSIFIER_THRESHOLD=1.01):
+            self.assertIsNone(local_classifier.confident_label("invoice amount due"))
+
+    def test_sources_are_reported(self):
+        with override_settings(LOCAL_CLASSIFIER_THRESHOLD=0.0), \
+                mock.patch.object(classifier, "generate_text", return_value="banana") as gen:
+            self.assertEqual(classifier.classify_text_with_source("resume skills education"), ("resume", "local"))
+            gen.assert_not_called()
+            # LLM ตอบนอก label -> other แต่ไม่นับเป็นคำตอบของ LLM (ห้ามใช้ train)
+            self.assertEqual(classifier.classify_text_with_source("x", use_local=False), ("other", ""))
+
+    def test_batch_skips_confident_slots(self):
+        with override_settings(LOCAL_CLASSIFIER_THRESHOLD=0.0), \
+                mock.patch.object(classifier, "generate_text") as gen:
+            out = classifier.classify_batch_with_source(["invoice amount due", "resume skills"])
+        self.assertEqual(out, [("invoice", "local"), ("resume", "local")])
+        gen.assert_not_called()
+
+
+@override_settings(LOCAL_CLASSIFIER_PATH="/nonexistent/m.npz")
+class MissingModelTests(SimpleTestCase):
+    def test_no_model_means_no_prediction(self):
+        self.assertIsNone(local_classifier.predict("invoice"))
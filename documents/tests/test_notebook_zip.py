@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.export import notebook_zip
+
+
+@override_settings(EXPORT_ZIP_CONCURRENCY=3)
+class NotebookZipStreamTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.opened, self.closed = [], []
+        patcher = mock.patch.object(notebook_zip, "_open_object", self._open)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _open(self, name):
+        self.opened.append(name)
+        return iter([b"x" * 10] * 3), lambda: self.closed.append(name)
+
+    def _notebook(self, n_docs):
+        cs = mock.MagicMock(id=1, title="t", combined_summary="s", doc_count=n_docs, total_words=1)
+        cs.documents.order_by.return_value.values.return_value = [
+            {"id": i, "file": f"f{i}", "file_name": f"n{i}", "document_type": "other", "word_count": 1, "summary": ""}
+            for i in range(n_docs)
+        ]
+        return cs
+
+    def _disconnect_during_first_file(self, cs):
+        gen = notebook_zip.stream_notebook_zip(cs, user_id=7, export_id="abc")
+        for _ in range(4):  # notebook.md / manifest.json แล้วเข้าไฟล์แรก
+            next(gen)
+        gen.close()
+
+    def test_disconnect_marks_progress_aborted(self):
+        self._disconnect_during_first_file(self._notebook(5))
+        self.assertEqual(notebook_zip.get_progress(7, "abc")["status"], "aborted")
+
+    def test_disconnect_closes_prefetched_bodies(self):
+        self._disconnect_during_first_file(self._notebook(5))
+        # ไฟล์ที่ stream อยู่ + ไฟล์ที่เปิดล่วงหน้าแล้วต้องถูกปิดทั้งหมด (ที่ยังไม่เริ่มเปิดถูก cancel)
+        self.assertIn("f0", self.closed)
+        self.assertEqual(sorted(self.closed), sorted(self.opened))
+
+    def test_empty_notebook_completes(self):
+        data = b"".join(notebook_zip.stream_notebook_zip(self._notebook(0), user_id=7, export_id="abc"))
+        self.assertTrue(data.startswith(b"PK"))
+        self.assertEqual(notebook_zip.get_progress(7, "abc")["status"], "done")
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from django.core import signing
+from django.test import SimpleTestCase
+
+from documents.services.search import pagination
+
+
+class FakeQuerySet:
+    def __init__(self, rows):
+        self.rows, self.filters = rows, []
+
+    def filter(self, q):
+        self.filters.append(q)
+        return self
+
+    def __getitem__(self, s):
+        return self.rows[s]
+
+
+def _row(i, rank=None):
+    at = datetime(2024, 1, 1, 12, 0, i, 123456, tzinfo=timezone.utc)
+    return SimpleNamespace(id=i, uploaded_at=at, rank=rank)
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip_by_time(self):
+        row = _row(7)
+        pos = pagination.decode_cursor(pagination.encode_cursor(row, ranked=False), ranked=False)
+        self.assertEqual(pos, {"uploaded_at": row.uploaded_at, "id": 7})
+
+    def test_round_trip_ranked_keeps_rank(self):
+        row = _row(3, rank=0.4375)
+        pos = pagination.decode_cursor(pagination.encode_cursor(row, ranked=True), ranked=True)
+        self.assertEqual(pos["rank"], 0.4375)
+        self.assertEqual(pos["uploaded_at"], row.uploaded_at)
+
+    def test_cursor_from_other_sort_mode_restarts(self):
+        token = pagination.encode_cursor(_row(1), ranked=False)
+        self.assertIsNone(pagination.decode_cursor(token, ranked=True))
+
+    def test_tampered_cursor_is_rejected(self):
+        token = pagination.encode_cursor(_row(1), ranked=False)
+        self.assertIsNone(pagination.decode_cursor(token[:-2] + "xx", ranked=False))
+        forged = signing.dumps({"m": "t", "u": "2024-01-01T00:00:00", "i": 1}, salt="other")
+        self.assertIsNone(pagination.decode_cursor(forged, ranked=False))
+
+    def test_empty_cursor(self):
+        self.assertIsNone(pagination.decode_cursor("", ranked=False))
+
+
+class PaginateKeysetTests(SimpleTestCase):
+    def test_first_page_has_next_cursor(self):
+        qs = FakeQuerySet([_row(i) for i in (5, 4, 3)])
+        page = pagination.paginate_keyset(qs, per_page=2)
+        self.assertEqual([r.id for r in page.items], [5, 4])
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+        self.assertEqual(qs.filters, [])
+        self.assertEqual(pagination.decode_cursor(page.next_cursor, ranked=False)["id"], 4)
+
+    def test_next_page_filters_after_cursor(self):
+        cursor = pagination.encode_cursor(_row(4), ranked=False)
+        qs = FakeQuerySet([_row(3)])
+        page = pagination.paginate_keyset(qs, cursor=cursor, per_page=2)
+        self.assertTrue(page.has_previous)
+        self.assertFalse(page.has_next)
+        self.assertIsNone(page.next_cursor)
+        self.assertIn(("id__lt", 4), qs.filters[0].children[1].children)
@@ -0,0 +1,68 @@
+import os, tempfile, time
+
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.llm import response_cache
+
+
+def _key(**kw):
+    args = dict(provider="bedrock", model="m", system="s", user="u", temperature=0.0, max_tokens=40, purpose="title")
+    args.update(kw)
+    return response_cache.cache_key(**args)
+
+
+class CacheKeyTests(SimpleTestCase):
+    def test_key_is_stable_and_parameter_sensitive(self):
+        self.assertEqual(_key(), _key())
+        for change in ({"provider": "ollama"}, {"model": "m2"}, {"user": "u2"}, {"max_tokens": 80}, {"stop": ["\n"]}):
+            self.assertNotEqual(_key(), _key(**change), change)
+
+    @override_settings(LLM_RESPONSE_CACHE_BACKEND="disk", LLM_RESPONSE_CACHE_PURPOSES=["title"],
+                       LLM_RESPONSE_CACHE_MAX_TEMPERATURE=0.3)
+    def test_only_opted_in_low_temperature_purposes(self):
+        self.assertTrue(response_cache.is_cacheable("title", 0.3))
+        self.assertFalse(response_cache.is_cacheable("title", 0.7))
+        self.assertFalse(response_cache.is_cacheable("chat", 0.0))
+
+    @override_settings(LLM_RESPONSE_CACHE_BACKEND="", LLM_RESPONSE_CACHE_PURPOSES=["title"])
+    def test_disabled_without_backend(self):
+        self.assertFalse(response_cache.is_cacheable("title", 0.0))
+
+
+class DiskBackendTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ctx = override_settings(LLM_RESPONSE_CACHE_BACKEND="disk", LLM_RESPONSE_CACHE_DIR=tmp.name,
+                                LLM_RESPONSE_CACHE_TTL=3600, LLM_RESPONSE_CACHE_MAX_ENTRIES=2)
+        ctx.enable()
+        self.addCleanup(ctx.disable)
+        self.backend = response_cache.DiskBackend()
+
+    def _set(self, key, text="hi"):
+        self.backend.set(key, response_cache.CachedResponse(text, 3, 1), purpose="title", provider="mock", model="m")
+
+    def test_round_trip(self):
+        key = _key()
+        self._set(key, "ชื่อเรื่อง")
+        hit = self.backend.get(key)
+        self.assertEqual((hit.text, hit.input_tokens, hit.output_tokens), ("ชื่อเรื่อง", 3, 1))
+        self.assertIsNone(self.backend.get(_key(user="other")))
+
+    def test_expired_entry_is_dropped(self):
+        key = _key()
+        self._set(key)
+        with override_settings(LLM_RESPONSE_CACHE_TTL=-1):
+            self.assertIsNone(self.backend.get(key))
+        self.assertFalse(self.backend._path(key).exists())
+
+    def test_prune_keeps_most_recently_used(self):
+        keys = [_key(user=str(i)) for i in range(3)]
+        for i, key in enumerate(keys):
+            self._set(key)
+            t = time.time() - 100 + i
+            os.utime(self.backend._path(key), (t, t))
+        self.backend.get(keys[0])  # hit -> แตะ mtime เป็นตัวล่าสุด
+        self.assertEqual(self.backend.prune(), 1)
+        self.assertIsNotNone(self.backend.get(keys[0]))
+        self.assertIsNone(self.backend.get(keys[1]))
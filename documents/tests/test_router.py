@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.llm import router
+
+
+@override_settings(
+    LLM_BREAKER_MIN_CALLS=2,
+    LLM_BREAKER_ERROR_RATE=0.5,
+    LLM_BREAKER_SLOW_MS=1000,
+    LLM_BREAKER_SLOW_RATE=0.8,
+    LLM_BREAKER_COOLDOWN_SECONDS=30,
+    LLM_FALLBACK_PROVIDERS=["ollama"],
+    LLM_HEDGE_ENABLED=False,
+)
+class BreakerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(router.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _trip(self, prov="bedrock"):
+        router.record(prov, False, 10)
+        router.record(prov, False, 10)
+
+    def test_open_half_open_close(self):
+        self._trip()
+        self.assertFalse(router.allow("bedrock"))
+
+        self.now += 31
+        self.assertTrue(router.allow("bedrock"))   # probe
+        self.assertFalse(router.allow("bedrock"))  # มี probe ค้างอยู่แล้ว
+
+        router.record("bedrock", True, 10)
+        self.assertTrue(router.allow("bedrock"))
+        self.assertEqual(router.snapshot()[0]["state"], "closed")
+
+    def test_window_cleared_when_breaker_closes(self):
+        self._trip()
+        self.now += 31
+        router.allow("bedrock")
+        router.record("bedrock", True, 10)
+
+        # error ก่อนเปิด breaker ยังอยู่ใน window 60s -> ถ้าไม่ล้าง ล้มครั้งเดียวจะเปิดซ้ำ
+        router.record("bedrock", False, 10)
+        self.assertTrue(router.allow("bedrock"))
+
+    def test_failed_probe_reopens(self):
+        self._trip()
+        self.now += 31
+        router.allow("bedrock")
+        router.record("bedrock", False, 10)
+        self.assertFalse(router.allow("bedrock"))
+
+    def test_reset_clears_window(self):
+        router.record("bedrock", False, 10)
+        router.reset("bedrock")
+        router.record("bedrock", True, 10)
+        self.assertTrue(router.allow("bedrock"))
+
+    def test_call_fails_over_and_skips_open_provider(self):
+        calls = []
+
+        def fn(prov):
+            calls.append(prov)
+            if prov == "bedrock":
+                raise RuntimeError("boom")
+            return f"ok-{prov}"
+
+        self.assertEqual(router.call("bedrock", fn), "ok-ollama")
+        self.assertEqual(calls, ["bedrock", "ollama"])
+
+        self._trip("bedrock")
+        self._trip("ollama")
+        with self.assertRaises(router.ProviderUnavailable):
+            router.call("bedrock", fn)
+
+    def test_stream_records_time_to_first_token(self):
+        def make(prov):
+            yield "a"
+            self.now += 60  # คำตอบยาว stream นาน แต่ token แรกมาเร็ว
+            yield "b"
+
+        with mock.patch.object(router, "record") as rec:
+            self.assertEqual(list(router.stream("bedrock", make)), ["a", "b"])
+        rec.assert_called_once_with("bedrock", True, 0)
+
+
+@override_settings(LLM_HEDGE_MIN_SAMPLES=3, LLM_HEDGE_PERCENTILE=50)
+class LatencyTests(SimpleTestCase):
+    def setUp(self):
+        router._latencies.clear()
+
+    def test_modes_are_kept_apart(self):
+        for ms in (5000, 6000, 7000):
+            router.observe_latency("bedrock", ms, "call")
+        for ms in (100, 200, 300):
+            router.observe_latency("bedrock", ms, "ttft")
+        self.assertEqual(router.latency_percentile("bedrock", "call"), 6000)
+        self.assertEqual(router.latency_percentile("bedrock", "ttft"), 200)
+
+    def test_too_few_samples(self):
+        router.observe_latency("ollama", 100, "ttft")
+        self.assertIsNone(router.latency_percentile("ollama", "ttft"))
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from documents.services.search import counts, search_cache
+
+
+class FakeCountQuerySet:
+    def __init__(self, n):
+        self.n, self.calls = n, 0
+
+    def count(self):
+        self.calls += 1
+        return self.n
+
+    def all(self):
+        return self
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def _build(self):
+        self.builds += 1
+        return {"n": self.builds}
+
+    def test_hit_until_generation_bumps(self):
+        self.assertEqual(search_cache.cached_response(1, "search", {"q": "a"}, self._build), {"n": 1})
+        self.assertEqual(search_cache.cached_response(1, "search", {"q": "a"}, self._build), {"n": 1})
+        search_cache.bump_generation(1)
+        self.assertEqual(search_cache.cached_response(1, "search", {"q": "a"}, self._build), {"n": 2})
+        self.assertEqual(search_cache.stats()["hits"], 1)
+
+    def test_generation_is_per_user(self):
+        search_cache.cached_response(1, "search", {}, self._build)
+        search_cache.bump_generation(2)
+        search_cache.cached_response(1, "search", {}, self._build)
+        self.assertEqual(self.builds, 1)
+
+    @override_settings(SEARCH_CACHE_MAX_BYTES=10)
+    def test_large_payload_is_not_cached(self):
+        big = lambda: {"items": "x" * 100}
+        search_cache.cached_response(1, "search", {}, big)
+        search_cache.cached_response(1, "search", {}, big)
+        self.assertEqual(search_cache.stats()["skipped"], 2)
+
+    @override_settings(SEARCH_CACHE_MAX_ENTRIES=1)
+    def test_entry_cap_per_generation(self):
+        search_cache.cached_response(1, "search", {"q": "a"}, self._build)
+        search_cache.cached_response(1, "search", {"q": "b"}, self._build)
+        self.assertEqual(search_cache.stats()["skipped"], 1)
+
+
+@override_settings(SEARCH_COUNT_STALE_AFTER=60)
+class CachedCountTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_within_generation(self):
+        qs = FakeCountQuerySet(5)
+        self.assertEqual(counts.cached_count(qs, user_id=1, filters={"q": ""}), 5)
+        qs.n = 6
+        self.assertEqual(counts.cached_count(qs, user_id=1, filters={"q": ""}), 5)
+        self.assertEqual(qs.calls, 1)
+
+    def test_new_generation_counts_synchronously(self):
+        qs = FakeCountQuerySet(5)
+        counts.cached_count(qs, user_id=1, filters={})
+        qs.n = 6
+        search_cache.bump_generation(1)
+        self.assertEqual(counts.cached_count(qs, user_id=1, filters={}), 6)
+
+    def test_stale_value_refreshes_in_background(self):
+        qs = FakeCountQuerySet(5)
+        counts.cached_count(qs, user_id=1, filters={})
+        key = counts.count_key(1, {}, search_cache.get_generation(1))
+        cache.set(key, {"n": 5, "at": 0})
+        with mock.patch.object(counts, "_refresh_async") as refresh:
+            self.assertEqual(counts.cached_count(qs, user_id=1, filters={}), 5)
+        refresh.assert_called_once()
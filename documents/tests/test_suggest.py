@@ -0,0 +1,30 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from documents.services.search import suggest
+
+
+class SuggestLookupTests(SimpleTestCase):
+    def test_terms_are_aggregated_by_display_in_sql(self):
+        sql = str(suggest._ranked(1, "bu", "term", ("display",), 8).query)
+        self.assertIn('GROUP BY 1', sql)
+        self.assertIn('SUM("documents_suggestterm"."weight")', sql)
+        self.assertNotIn("document_id", sql)
+        self.assertIn("LIMIT 8", sql)
+
+    def test_each_kind_gets_its_own_limit(self):
+        rows = {
+            "file": [{"display": "budget.pdf", "document_id": 1, "w": 1}],
+            "notebook": [{"display": "Budget notebook", "notebook_id": 2, "w": 1}],
+            "term": [{"display": f"budget{i}", "w": 500 - i} for i in range(8)],
+        }
+        with mock.patch.object(suggest, "_ranked", side_effect=lambda o, p, kind, f, n: rows[kind][:n]) as ranked:
+            out = suggest._lookup(object(), "bu", 8)
+
+        self.assertEqual(sorted(c.args[2] for c in ranked.call_args_list), ["file", "notebook", "term"])
+        kinds = [i["kind"] for i in out["items"]]
+        # term ที่ weight สูงมากไม่เบียด file / notebook ออก
+        self.assertEqual(kinds[:2], ["file", "notebook"])
+        self.assertEqual(len(out["items"]), 8)
+        self.assertEqual(out["items"][2]["text"], "budget0")
@@ -0,0 +1,24 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from documents.services.analysis import title_generator
+
+
+class TitleBudgetTests(SimpleTestCase):
+    def _generate(self, lang, answer):
+        with mock.patch.object(title_generator, "generate_text", return_value=answer) as gen:
+            title = title_generator.generate_title("เนื้อหา", lang=lang)
+        return title, gen.call_args.kwargs["max_tokens"]
+
+    def test_thai_title_gets_a_larger_budget(self):
+        _, th = self._generate("th", "รายงาน")
+        _, en = self._generate("en", "Report")
+        self.assertGreater(th, en)
+        self.assertGreaterEqual(en, 80)
+        # title ไทยยาวสุดต้องพอดีงบ ไม่ถูกตัดกลางคำ
+        self.assertGreaterEqual(th, title_generator.estimate_tokens("ก" * title_generator.TITLE_MAX_CHARS))
+
+    def test_title_is_first_line_without_trailing_punctuation(self):
+        title, _ = self._generate("en", "Quarterly report.\nsecond line")
+        self.assertEqual(title, "Quarterly report")
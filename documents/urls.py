@@ -18,6 +18,8 @@ urlpatterns = [
 
     path("api/search/", views.search_documents_api, name="search_api"),
     path("api/combined/search/", views.search_combined_api, name="combined_search_api"),
+    path("api/suggest/", views.suggest_api, name="suggest_api"),
+    path("api/llm/status/", views.llm_status_api, name="llm_status_api"),
 
     path("export/csv/", views.export_documents_csv, name="export_csv"),
 
@@ -25,6 +27,9 @@ urlpatterns = [
     path("combined/create/", views.create_combined_summary, name="combined_create"),
     path("combined/<int:pk>/", views.combined_detail, name="combined_detail"),
     path("combined/<int:pk>/delete/", views.delete_combined, name="combined_delete"),
+    path("combined/<int:pk>/documents/", views.update_combined_documents, name="combined_documents"),
+    path("combined/<int:pk>/export/", views.export_notebook_zip, name="combined_export"),
+    path("combined/<int:pk>/export/progress/", views.export_notebook_progress, name="combined_export_progress"),
     
     
     path("chat/document/<int:pk>/", views.chat_document, name="chat_document"),
@@ -33,6 +38,8 @@ urlpatterns = [
     path("chat/<int:conv_id>/api/", views.chat_api, name="chat_api"),
     path("chat/<int:conv_id>/stream/", views.chat_stream_api, name="chat_stream_api"),
     path("chat/<int:conv_id>/cancel/", views.chat_cancel_api, name="chat_cancel_api"),
+    path("chat/<int:conv_id>/astream/", views.achat_stream_api, name="achat_stream_api"),
+    path("chat/<int:conv_id>/acancel/", views.achat_cancel_api, name="achat_cancel_api"),
     path("chat/<int:conv_id>/reset/", views.chat_reset_api, name="chat_reset_api"),
     path("chat/<int:conv_id>/regenerate/", views.chat_regenerate_api, name="chat_regenerate_api"),
 
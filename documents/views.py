@@ -1,30 +1,38 @@
-import csv, json, boto3, re
+import json, re, uuid
 from pathlib import Path
 from datetime import datetime, timedelta
 from django.urls import reverse
 from django.conf import settings
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.core.cache import cache
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.postgres.search import SearchQuery, SearchRank, SearchHeadline
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST, require_GET
-from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.utils import timezone
-from django.utils.dateparse import parse_date
-from django.db.models import Q, Exists, OuterRef, Value, F
-from django.db.models.functions import Coalesce
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from asgiref.sync import sync_to_async
 from urllib.parse import urlencode, quote
 
 from documents.services.llm.token_ledger import get_all_status
 from documents.services.upload.upload_validation import validate_files, get_limits
-from documents.services.analysis.combined_summarizer import build_combined_summary, build_combined_title_and_summary
+from documents.services.analysis.combined_summarizer import refresh_notebook
 from documents.services.pipeline.processor import process_document
-from documents.services.chat.chat_service import answer_chat, answer_chat_stream
+from documents.services.chat.chat_service import answer_chat, answer_chat_stream, aanswer_chat_stream
 from documents.services.llm.guardrails import check_daily_limit
 from documents.services.llm.client import LLMError
+from documents.services.llm import router as llm_router
+from documents.services.search.document_query import DocumentFilters, search_page
+from documents.services.search.notebook_query import filtered_notebooks
+from documents.services.search.search_cache import cached_response, bump_generation
+from documents.services.search.facets import facet_counts
+from documents.services.search.suggest import suggest, index_notebook_terms
+from documents.services.export.streaming import stream_csv, stream_jsonl
+from documents.services.export.notebook_zip import stream_notebook_zip, get_progress as notebook_export_progress
+from documents.services.storage.s3 import presigned_get_url
 from .models import Document, CombinedSummary, Conversation, Message
 
 def health(request):
@@ -66,18 +74,15 @@ def upload_document(request):
             created.append(doc)
 
         if auto_combine and len(created) >= 2:
-            ai_title, combined_text = build_combined_title_and_summary(created, owner=request.user)
-            final_title = title or ai_title
-
+            # ผู้ใช้ตั้งชื่อเอง -> ไม่สร้าง title อัตโนมัติ (ทั้งตอนนี้และตอนเอกสารในชุดเปลี่ยน)
             cs = CombinedSummary.objects.create(
                 owner=request.user,
-                title=final_title,
-                combined_summary=combined_text,
-                doc_count=len(created),
-                total_words=sum(d.word_count for d in created),
+                title=title or "Combined Summary",
+                auto_title=not title,
             )
-
             cs.documents.set(created)
+            refresh_notebook(cs, owner=request.user)
+            index_notebook_terms(cs)
 
             messages.success(request, f"Uploaded {len(created)} files and created a combined summary.")
             return redirect("documents:combined_detail", pk=cs.pk)
@@ -96,64 +101,26 @@ def document_detail(request, pk: int):
 
 @login_required
 def document_list(request):
-    dtype = (request.GET.get("type") or "").strip().lower()
-    q = (request.GET.get("q") or "").strip()
-    date_from = parse_date(request.GET.get("from") or "")
-    date_to = parse_date(request.GET.get("to") or "")
-
-    qs = Document.objects.filter(owner=request.user)
-
-    # filters
-    if dtype:
-        qs = qs.filter(document_type=dtype)
-    if date_from:
-        qs = qs.filter(uploaded_at__date__gte=date_from)
-    if date_to:
-        qs = qs.filter(uploaded_at__date__lte=date_to)
-
-    if q:
-        query = SearchQuery(q, search_type="websearch", config="simple")
-
-        filename_q = Q(file_name__icontains=q)
-
-        qs = qs.filter(
-            Q(search_vector=query) | filename_q
-        ).annotate(
-            rank=Coalesce(SearchRank(F("search_vector"), query), Value(0.0)),
-            snippet=SearchHeadline(
-                Coalesce("extracted_text", Value("")),
-                query,
-                config="simple",
-                start_sel="",
-                stop_sel="",
-                max_words=35,
-                min_words=15,
-            ),
-        ).order_by("-rank", "-uploaded_at")
-    else:
-        qs = qs.order_by("-uploaded_at")
-
-    qs = qs.annotate(
-        has_chat=Exists(
-            Conversation.objects.filter(owner=request.user, document_id=OuterRef("pk"))
-        )
-    )
+    f = DocumentFilters.from_params(request.GET)
+    cursor = (request.GET.get("cursor") or "").strip()
 
-    paginator = Paginator(qs, 10)
-    page_number = request.GET.get("page") or 1
-    page_obj = paginator.get_page(page_number)
+    page, total = search_page(request.user, f, cursor=cursor)
+    facets = facet_counts(request.user, f)
 
     type_choices = ["invoice", "announcement", "policy", "proposal", "report", "research", "resume", "other"]
+    type_counts = {x["value"]: x["count"] for x in facets["types"]}
 
     return render(request, "documents/list.html", {
-        "docs": page_obj.object_list,
-        "dtype": dtype,
-        "type_choices": type_choices,
-        "page_obj": page_obj,
-
-        "q": q,
-        "date_from": date_from.isoformat() if date_from else "",
-        "date_to": date_to.isoformat() if date_to else "",
+        "docs": page.items,
+        "dtype": f.dtype,
+        "type_choices": [(t, type_counts.get(t, 0)) for t in type_choices],
+        "month_facets": facets["months"],
+        "page": page,
+        "total_count": total,
+
+        "q": f.q,
+        "date_from": f.date_from.isoformat() if f.date_from else "",
+        "date_to": f.date_to.isoformat() if f.date_to else "",
     })
 
 @login_required
@@ -161,7 +128,7 @@ def document_list(request):
 def delete_document(request, pk: int):
     doc = get_object_or_404(Document, pk=pk, owner=request.user)
 
-    page = (request.POST.get("page") or "").strip()
+    cursor = (request.POST.get("cursor") or "").strip()
     dtype = (request.POST.get("dtype") or "").strip().lower()
 
     combined_qs = doc.combined_in.filter(owner=request.user).order_by("-created_at")
@@ -197,18 +164,19 @@ def delete_document(request, pk: int):
         pass
 
     doc.delete()
+    bump_generation(request.user.id)
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse({"ok": True, "deleted_id": pk, "deleted_name": file_name})
 
     messages.success(request, f"Deleted: {file_name}")
 
-    if dtype or page:
+    if dtype or cursor:
         qs = {}
         if dtype:
             qs["type"] = dtype
-        if page:
-            qs["page"] = page
+        if cursor:
+            qs["cursor"] = cursor
         return redirect(f"{reverse('documents:list')}?{urlencode(qs)}")
 
     return redirect("documents:list")
@@ -222,76 +190,45 @@ def reprocess_document(request, pk: int):
 @login_required
 @require_GET
 def search_documents_api(request):
-    q = (request.GET.get("q") or "").strip()
-    dtype = (request.GET.get("type") or "").strip().lower()
-    date_from = parse_date(request.GET.get("from") or "")
-    date_to = parse_date(request.GET.get("to") or "")
-    page = int(request.GET.get("page") or 1)
-
-    qs = Document.objects.filter(owner=request.user)
-
-    if dtype:
-        qs = qs.filter(document_type=dtype)
-    if date_from:
-        qs = qs.filter(uploaded_at__date__gte=date_from)
-    if date_to:
-        qs = qs.filter(uploaded_at__date__lte=date_to)
-
-    if q:
-        query = SearchQuery(q, search_type="websearch", config="simple")
-
-        filename_q = Q(file_name__icontains=q)
-
-        qs = qs.filter(
-            Q(search_vector=query) | filename_q
-        ).annotate(
-            rank=Coalesce(SearchRank(F("search_vector"), query), Value(0.0)),
-            snippet=SearchHeadline(
-                Coalesce("extracted_text", Value("")),
-                query,
-                config="simple",
-                start_sel="",
-                stop_sel="",
-                max_words=35,
-                min_words=15,
-            ),
-        ).order_by("-rank", "-uploaded_at")
-    else:
-        qs = qs.order_by("-uploaded_at")
+    f = DocumentFilters.from_params(request.GET)
+    cursor = (request.GET.get("cursor") or "").strip()
+
+    def build():
+        page, total = search_page(request.user, f, cursor=cursor)
+
+        items = []
+        for d in page.items:
+            items.append({
+                "id": d.id,
+                "file_name": d.file_name,
+                "document_type": d.document_type,
+                "word_count": d.word_count,
+                "char_count": d.char_count,
+                "uploaded_at": timezone.localtime(d.uploaded_at).strftime("%-d %b %Y %H:%M"),
+                "has_chat": d.has_chat,
+                "snippet": d.snippet,
+                "detail_url": reverse("documents:detail", kwargs={"pk": d.pk}),
+                "chat_url": reverse("documents:chat_document", kwargs={"pk": d.pk}),
+                "delete_url": reverse("documents:delete", kwargs={"pk": d.pk}),
+            })
 
-    # has_chat
-    qs = qs.annotate(
-        has_chat=Exists(
-            Conversation.objects.filter(owner=request.user, document_id=OuterRef("pk"))
-        )
-    )
+        return {
+            "ok": True,
+            "next_cursor": page.next_cursor,
+            "has_next": page.has_next,
+            "count": total,
+            "items": items,
+        }
 
-    paginator = Paginator(qs, 10)
-    page_obj = paginator.get_page(page)
+    payload = cached_response(request.user.id, "documents", {**f.as_dict(), "cursor": cursor}, build)
+    return JsonResponse({**payload, "facets": facet_counts(request.user, f)})
 
-    items = []
-    for d in page_obj.object_list:
-        items.append({
-            "id": d.id,
-            "file_name": d.file_name,
-            "document_type": d.document_type,
-            "word_count": d.word_count,
-            "char_count": d.char_count,
-            "uploaded_at": timezone.localtime(d.uploaded_at).strftime("%-d %b %Y %H:%M"),
-            "has_chat": bool(getattr(d, "has_chat", False)),
-            "snippet": (getattr(d, "snippet", "") or "").strip(),
-            "detail_url": reverse("documents:detail", kwargs={"pk": d.pk}),
-            "chat_url": reverse("documents:chat_document", kwargs={"pk": d.pk}),
-            "delete_url": reverse("documents:delete", kwargs={"pk": d.pk}),
-        })
 
-    return JsonResponse({
-        "ok": True,
-        "page": page_obj.number,
-        "num_pages": page_obj.paginator.num_pages,
-        "count": page_obj.paginator.count,
-        "items": items,
-    })
+@login_required
+@require_GET
+def suggest_api(request):
+    q = (request.GET.get("q") or "").strip()
+    return JsonResponse(suggest(request.user, q))
 
 
 def _ascii_filename_fallback(name: str) -> str:
@@ -307,64 +244,81 @@ def _ascii_filename_fallback(name: str) -> str:
     safe = re.sub(r"\s+", " ", safe).strip()
     return safe or "download"
 
-def _content_disposition_inline(filename: str) -> str:
+def _content_disposition(filename: str, disposition: str = "inline") -> str:
     ascii_name = _ascii_filename_fallback(filename)
     utf8_name = quote(filename, safe="")  # percent-encode UTF-8
     # RFC 5987
-    return f'inline; filename="{ascii_name}"; filename*=UTF-8\'\'{utf8_name}'
+    return f'{disposition}; filename="{ascii_name}"; filename*=UTF-8\'\'{utf8_name}'
+
+def _content_disposition_inline(filename: str) -> str:
+    return _content_disposition(filename, "inline")
 
 @login_required
 def document_file(request, pk: int):
     doc = get_object_or_404(Document, pk=pk, owner=request.user)
 
     # doc.file.name = path แบบ relative ต่อ storage (ไม่มี "media/")
-    key = doc.file.name
-    # location = (getattr(settings, "AWS_LOCATION", "") or "").strip("/")
-
-    # if location:
-    #     key = f"{location}/{key.lstrip('/')}"
-
-    s3 = boto3.client("s3", region_name=settings.AWS_S3_REGION_NAME)
-
-    url = s3.generate_presigned_url(
-        ClientMethod="get_object",
-        Params={
-            "Bucket": settings.AWS_STORAGE_BUCKET_NAME,
-            "Key": key,
-            "ResponseContentDisposition": _content_disposition_inline(doc.file_name),
-            "ResponseContentType": doc.mime_type or "application/octet-stream",
-        },
-        ExpiresIn=60,
+    # client ของ S3 ใช้ร่วมกันทั้ง process (ดู services/storage/s3.py)
+    url = presigned_get_url(
+        doc.file.name,
+        filename_disposition=_content_disposition_inline(doc.file_name),
+        content_type=doc.mime_type or "application/octet-stream",
+        expires_in=60,
     )
     return redirect(url)
 
 @login_required
 def export_documents_csv(request):
-    dtype = (request.GET.get("type") or "").strip().lower()
-    docs = Document.objects.filter(owner=request.user).order_by("-uploaded_at")
-    if dtype:
-        docs = docs.filter(document_type=dtype)
+    f = DocumentFilters.from_params(request.GET)
+    fmt = (request.GET.get("format") or "csv").strip().lower()
+    include = {x.strip() for x in (request.GET.get("include") or "").lower().split(",") if x.strip()}
+    include_text = "text" in include
+
+    base = "documents" if not f.dtype else f"documents_{f.dtype}"
+
+    if fmt == "jsonl":
+        resp = StreamingHttpResponse(
+            stream_jsonl(request.user, f, include_text=include_text, include_chunks="chunks" in include),
+            content_type="application/x-ndjson; charset=utf-8",
+        )
+        filename = f"{base}.jsonl"
+    else:
+        resp = StreamingHttpResponse(
+            stream_csv(request.user, f, include_text=include_text),
+            content_type="text/csv; charset=utf-8",
+        )
+        filename = f"{base}.csv"
 
-    resp = HttpResponse(content_type="text/csv")
-    filename = "documents.csv" if not dtype else f"documents_{dtype}.csv"
     resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp["X-Accel-Buffering"] = "no"
+    return resp
 
-    writer = csv.writer(resp)
-    writer.writerow(["id", "file_name", "document_type", "word_count", "char_count", "summary", "uploaded_at"])
+@login_required
+def export_notebook_zip(request, pk: int):
+    cs = get_object_or_404(CombinedSummary, pk=pk, owner=request.user)
 
-    for d in docs:
-        writer.writerow([
-            d.id,
-            d.file_name,
-            d.document_type,
-            d.word_count,
-            d.char_count,
-            (d.summary or "").replace("\n", " ").strip(),
-            d.uploaded_at.isoformat(),
-        ])
+    # export_id มาจาก client (ใช้ poll progress) ถ้าไม่ส่งมาก็สุ่มให้
+    export_id = re.sub(r"[^A-Za-z0-9_-]", "", request.GET.get("export_id") or "")[:64] or uuid.uuid4().hex
 
+    resp = StreamingHttpResponse(
+        stream_notebook_zip(cs, user_id=request.user.id, export_id=export_id),
+        content_type="application/zip",
+    )
+    resp["Content-Disposition"] = _content_disposition(f"{cs.title or 'notebook'}.zip", "attachment")
+    resp["X-Accel-Buffering"] = "no"
+    resp["X-Export-Id"] = export_id
     return resp
 
+@login_required
+@require_GET
+def export_notebook_progress(request, pk: int):
+    get_object_or_404(CombinedSummary, pk=pk, owner=request.user)
+    export_id = re.sub(r"[^A-Za-z0-9_-]", "", request.GET.get("export_id") or "")[:64]
+    data = notebook_export_progress(request.user.id, export_id) if export_id else None
+    if data is None:
+        return JsonResponse({"ok": False, "status": "unknown"}, status=404)
+    return JsonResponse({"ok": True, **data})
+
 @login_required
 def create_combined_summary(request):
     
@@ -378,21 +332,16 @@ def create_combined_summary(request):
         messages.error(request, "Please select at least 2 documents to combine.")
         return redirect("documents:list")
 
-    docs = list(Document.objects.filter(owner=request.user, id__in=ids).order_by("-uploaded_at"))
+    # summarizer โหลดคอลัมน์ที่ต้องใช้เอง -> ที่นี่ต้องการแค่ id
+    docs = list(Document.objects.filter(owner=request.user, id__in=ids).values_list("id", flat=True))
     if len(docs) < 2:
         messages.error(request, "Selected documents not found.")
         return redirect("documents:list")
 
-    title, combined_text = build_combined_title_and_summary(docs, owner=request.user)
-
-    cs = CombinedSummary.objects.create(
-        owner=request.user,
-        title=title,
-        combined_summary=combined_text,
-        doc_count=len(docs),
-        total_words=sum(d.word_count for d in docs),
-    )
+    cs = CombinedSummary.objects.create(owner=request.user)
     cs.documents.set(docs)
+    refresh_notebook(cs, owner=request.user)
+    index_notebook_terms(cs)
 
     messages.success(request, "Combined summary created.")
     return redirect("documents:combined_detail", pk=cs.pk)
@@ -402,7 +351,61 @@ def create_combined_summary(request):
 def combined_detail(request, pk: int):
     cs = get_object_or_404(CombinedSummary, pk=pk, owner=request.user)
     docs = cs.documents.all().order_by("-uploaded_at")
-    return render(request, "documents/combined_detail.html", {"cs": cs, "docs": docs})
+    # เอกสารที่เพิ่มเข้า notebook ได้ (ประมวลผลเสร็จแล้ว และยังไม่อยู่ในชุด)
+    addable = (
+        Document.objects.filter(owner=request.user, status="done")
+        .exclude(combined_in=cs)
+        .order_by("-uploaded_at")
+        .values("id", "file_name")[:200]
+    )
+    return render(request, "documents/combined_detail.html", {"cs": cs, "docs": docs, "addable": addable})
+
+@login_required
+@require_POST
+def update_combined_documents(request, pk: int):
+    """
+    เพิ่ม/ลบเอกสารใน notebook แล้วอัปเดต combined summary แบบ incremental (สรุปใหม่เฉพาะกิ่งที่เปลี่ยน)
+    """
+    cs = get_object_or_404(CombinedSummary, pk=pk, owner=request.user)
+    add_ids = [int(i) for i in request.POST.getlist("add_ids") if i.isdigit()]
+    remove_ids = {int(i) for i in request.POST.getlist("remove_ids") if i.isdigit()}
+    ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+    current = set(cs.documents.values_list("id", flat=True))
+    add = set(
+        Document.objects.filter(owner=request.user, status="done", id__in=add_ids).values_list("id", flat=True)
+    ) - current
+    remove = remove_ids & current
+
+    error = ""
+    if not add and not remove:
+        error = "Nothing to change."
+    elif len(current | add) - len(remove) < 2:
+        error = "A notebook needs at least 2 documents."
+    if error:
+        if ajax:
+            return JsonResponse({"ok": False, "error": error}, status=400)
+        messages.error(request, error)
+        return redirect("documents:combined_detail", pk=cs.pk)
+
+    if add:
+        cs.documents.add(*add)
+    if remove:
+        cs.documents.remove(*remove)
+    stats = refresh_notebook(cs, owner=request.user)
+    if stats["title_changed"]:
+        index_notebook_terms(cs)
+    else:
+        bump_generation(request.user.id)
+
+    if ajax:
+        return JsonResponse({"ok": True, "title": cs.title, "doc_count": cs.doc_count, **stats})
+    messages.success(
+        request,
+        f"Notebook updated (+{len(add)} / -{len(remove)} documents, "
+        f"{stats['computed']} groups summarized, {stats['reused']} reused).",
+    )
+    return redirect("documents:combined_detail", pk=cs.pk)
 
 @login_required
 def combined_list(request):
@@ -420,6 +423,7 @@ def delete_combined(request, pk: int):
     title = cs.title
 
     cs.delete()
+    bump_generation(request.user.id)
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse({"ok": True, "deleted_id": pk, "deleted_title": title})
@@ -434,24 +438,7 @@ def search_combined_api(request):
     sort = (request.GET.get("sort") or "newest").strip()
     page = int(request.GET.get("page") or 1)
 
-    qs = CombinedSummary.objects.filter(owner=request.user)
-
-    if q:
-        qs = qs.filter(
-            Q(title__icontains=q) |
-            Q(combined_summary__icontains=q)
-        )
-
-    if sort == "oldest":
-        qs = qs.order_by("created_at")
-    elif sort == "title":
-        qs = qs.order_by("title", "-created_at")
-    elif sort == "docs":
-        qs = qs.order_by("-doc_count", "-created_at")
-    elif sort == "words":
-        qs = qs.order_by("-total_words", "-created_at")
-    else:
-        qs = qs.order_by("-created_at")
+    qs = filtered_notebooks(request.user, q, sort)
 
     qs = qs.annotate(
         has_chat=Exists(
@@ -488,7 +475,10 @@ def search_combined_api(request):
 @login_required
 def chat_document(request, pk: int):
     doc = get_object_or_404(Document, pk=pk, owner=request.user)
-    conv, _ = Conversation.objects.get_or_create(owner=request.user, document=doc)
+    conv, created = Conversation.objects.get_or_create(owner=request.user, document=doc)
+    if created and not doc.has_chat:
+        Document.objects.filter(pk=doc.pk).update(has_chat=True)
+        bump_generation(request.user.id)
     if not conv.title:
         conv.title = f"Chat: {doc.file_name}"
         conv.save(update_fields=["title"])
@@ -529,6 +519,7 @@ def chat_view(request, conv_id: int):
     return render(request, "documents/chat.html", {
         "conv": conv,
         "chat_messages": msgs,
+        "async_stream": getattr(settings, "CHAT_ASYNC_STREAMING", False),
     })
 
 @login_required
@@ -575,6 +566,9 @@ def chat_api(request, conv_id: int):
         "created_at": timezone.now().strftime("%b. %d, %Y, %I:%M %p"),
     })
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @login_required
 @require_POST
 def chat_stream_api(request, conv_id: int):
@@ -620,9 +614,6 @@ def chat_stream_api(request, conv_id: int):
             is_active=True,
         )
 
-    def sse(event: str, data: dict):
-        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
-
     def gen():
         assistant_chunks = []
         try:
@@ -637,16 +628,16 @@ def chat_stream_api(request, conv_id: int):
             ):
                 if stopped():
                     user_msg.delete()
-                    yield sse("canceled", {"ok": False})
+                    yield _sse("canceled", {"ok": False})
                     return
                 assistant_chunks.append(token)
-                yield sse("token", {"t": token})
+                yield _sse("token", {"t": token})
 
             assistant_text = "".join(assistant_chunks).strip() or "I couldn't generate a response."
 
             if cache.get(f"chat_cancel:{conv.id}:{rid}"):
                 user_msg.delete()
-                yield sse("canceled", {"ok": False})
+                yield _sse("canceled", {"ok": False})
                 return
 
             assistant_msg = Message.objects.create(
@@ -657,7 +648,7 @@ def chat_stream_api(request, conv_id: int):
                 is_active=True,
             )
 
-            yield sse("done", {
+            yield _sse("done", {
                 "ok": True,
                 "created_at": timezone.now().strftime("%b. %d, %Y, %I:%M %p"),
                 "user_message_id": user_msg.id,
@@ -667,10 +658,10 @@ def chat_stream_api(request, conv_id: int):
 
         except LLMError as e:
             user_msg.delete()
-            yield sse("error", {"ok": False, "error": str(e), "code": "LLM_ERROR"})
+            yield _sse("error", {"ok": False, "error": str(e), "code": "LLM_ERROR"})
         except Exception as e:
             user_msg.delete()
-            yield sse("error", {"ok": False, "error": str(e), "code": "SERVER_ERROR"})
+            yield _sse("error", {"ok": False, "error": str(e), "code": "SERVER_ERROR"})
 
     resp = StreamingHttpResponse(gen(), content_type="text/event-stream; charset=utf-8")
     resp["Cache-Control"] = "no-cache"
@@ -688,6 +679,118 @@ def chat_cancel_api(request, conv_id: int):
     cache.set(f"chat_cancel:{conv.id}:{rid}", True, timeout=300)
     return JsonResponse({"ok": True})
 
+# -------------------------
+# async chat (ASGI)
+# -------------------------
+# ระหว่างรอ token ไม่ถือ worker thread และ DB connection -> stream พร้อมกันได้หลักร้อยต่อ process
+# ใช้เมื่อรันผ่าน ASGI (config/asgi.py) และเปิด CHAT_ASYNC_STREAMING
+
+@login_required
+@require_POST
+async def achat_stream_api(request, conv_id: int):
+    user = await request.auser()
+    conv = await aget_object_or_404(Conversation.objects.select_related("owner"), pk=conv_id, owner=user)
+
+    user_text = (request.POST.get("message") or "").strip()
+    rid = (request.POST.get("request_id") or "").strip()
+    edit_message_id = (request.POST.get("edit_message_id") or "").strip()
+
+    if not user_text:
+        return JsonResponse({"ok": False, "error": "Empty message"}, status=400)
+    if not rid:
+        return JsonResponse({"ok": False, "error": "Missing request_id"}, status=400)
+
+    cancel_key = f"chat_cancel:{conv.id}:{rid}"
+    await cache.adelete(cancel_key)
+
+    if edit_message_id:
+        old_user_msg = await aget_object_or_404(
+            Message,
+            pk=edit_message_id,
+            conversation=conv,
+            role="user",
+            is_active=True,
+        )
+        await conv.messages.filter(is_active=True, id__gte=old_user_msg.id).aupdate(is_active=False)
+        user_msg = await Message.objects.acreate(
+            conversation=conv,
+            role="user",
+            content=user_text,
+            edited_from=old_user_msg,
+            is_active=True,
+        )
+    else:
+        user_msg = await Message.objects.acreate(
+            conversation=conv,
+            role="user",
+            content=user_text,
+            is_active=True,
+        )
+
+    async def stopped():
+        return await cache.aget(cancel_key) is True
+
+    async def gen():
+        assistant_chunks = []
+        try:
+            async for token in aanswer_chat_stream(
+                conv,
+                user_text,
+                should_stop=stopped,
+                history_until=user_msg,
+            ):
+                assistant_chunks.append(token)
+                yield _sse("token", {"t": token})
+
+            assistant_text = "".join(assistant_chunks).strip() or "I couldn't generate a response."
+
+            if await stopped():
+                await user_msg.adelete()
+                yield _sse("canceled", {"ok": False})
+                return
+
+            assistant_msg = await Message.objects.acreate(
+                conversation=conv,
+                role="assistant",
+                content=assistant_text,
+                parent_message=user_msg,
+                is_active=True,
+            )
+
+            yield _sse("done", {
+                "ok": True,
+                "created_at": timezone.now().strftime("%b. %d, %Y, %I:%M %p"),
+                "user_message_id": user_msg.id,
+                "assistant_message_id": assistant_msg.id,
+                "edited_from_id": edit_message_id or None,
+            })
+
+        except LLMError as e:
+            await user_msg.adelete()
+            yield _sse("error", {"ok": False, "error": str(e), "code": "LLM_ERROR"})
+        except Exception as e:
+            await user_msg.adelete()
+            yield _sse("error", {"ok": False, "error": str(e), "code": "SERVER_ERROR"})
+        finally:
+            await sync_to_async(connection.close)()
+
+    resp = StreamingHttpResponse(gen(), content_type="text/event-stream; charset=utf-8")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+@login_required
+@require_POST
+async def achat_cancel_api(request, conv_id: int):
+    user = await request.auser()
+    conv = await aget_object_or_404(Conversation, pk=conv_id, owner=user)
+    rid = (request.POST.get("request_id") or "").strip()
+    if not rid:
+        return JsonResponse({"ok": False, "error": "Missing request_id"}, status=400)
+
+    await cache.aset(f"chat_cancel:{conv.id}:{rid}", True, timeout=300)
+    return JsonResponse({"ok": True})
+
 def _next_midnight_iso():
     tz = timezone.get_current_timezone()
     now = timezone.localtime(timezone.now(), tz)
@@ -714,6 +817,14 @@ def usage_api(request):
         ]
     })
     
+@login_required
+@require_GET
+def llm_status_api(request):
+    # สถานะ circuit breaker ของแต่ละ provider (เฉพาะ staff)
+    if not request.user.is_staff:
+        return JsonResponse({"ok": False, "error": "Forbidden"}, status=403)
+    return JsonResponse({"ok": True, "providers": llm_router.snapshot()})
+
 @login_required
 @require_POST
 def chat_reset_api(request, conv_id: int):
@@ -0,0 +1,51 @@
+(function () {
+    const link = document.getElementById("notebookExport");
+    if (!link) return;
+
+    const statusEl = document.getElementById("notebookExportStatus");
+    const baseHref = link.getAttribute("href");
+    const progressUrl = link.dataset.progressUrl || "";
+    let timer = null;
+
+    function fmtBytes(n) {
+        if (n < 1024) return n + " B";
+        if (n < 1024 * 1024) return (n / 1024).toFixed(1) + " KB";
+        return (n / 1024 / 1024).toFixed(1) + " MB";
+    }
+
+    async function poll(exportId) {
+        try {
+            const res = await fetch(`${progressUrl}?export_id=${encodeURIComponent(exportId)}`, {
+                headers: { "X-Requested-With": "XMLHttpRequest" },
+            });
+            if (res.ok) {
+                const data = await res.json();
+                if (data.status === "done") {
+                    statusEl.textContent = `Done · ${fmtBytes(data.bytes || 0)}`;
+                    clearInterval(timer);
+                    return;
+                }
+                if (data.status === "error" || data.status === "aborted") {
+                    statusEl.textContent = data.status === "error" ? "Export failed" : "Export cancelled";
+                    clearInterval(timer);
+                    return;
+                }
+                statusEl.textContent = `${data.done || 0}/${data.total || 0} files · ${fmtBytes(data.bytes || 0)}`;
+            }
+        } catch (e) {
+            // ignore, try again next tick
+        }
+    }
+
+    link.addEventListener("click", () => {
+        // ให้ browser ดาวน์โหลดตรง ๆ (stream) แล้ว poll progress ด้วย export_id เดียวกัน
+        const exportId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID().replace(/-/g, "") : String(Date.now());
+        link.setAttribute("href", `${baseHref}?export_id=${exportId}`);
+        if (statusEl) {
+            statusEl.textContent = "Preparing...";
+            clearInterval(timer);
+            timer = setInterval(() => poll(exportId), 1500);
+        }
+        setTimeout(() => link.setAttribute("href", baseHref), 0);
+    });
+})();
@@ -13,18 +13,19 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
     let timer = null;
     let controller = null;
     let lastSig = "";
-    let livePage = getPageFromUrl();
+    let liveCursor = getCursorFromUrl();
+    // cursor ของหน้าก่อน ๆ (keyset pagination ย้อนกลับเองไม่ได้ เลยเก็บ stack ไว้ฝั่ง client)
+    let cursorStack = [];
 
-    function getPageFromUrl() {
+    function getCursorFromUrl() {
         const u = new URL(window.location.href);
-        const p = parseInt(u.searchParams.get("page") || "1", 10);
-        return Number.isFinite(p) && p > 0 ? p : 1;
+        return u.searchParams.get("cursor") || "";
     }
 
     function setUrlParams(params) {
         const u = new URL(window.location.href);
 
-        ["q", "type", "from", "to", "page"].forEach(k => u.searchParams.delete(k));
+        ["q", "type", "from", "to", "cursor"].forEach(k => u.searchParams.delete(k));
 
         Object.entries(params).forEach(([k, v]) => {
             if (v !== undefined && v !== null && String(v).trim() !== "") {
@@ -97,7 +98,7 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
             type: typeSelect.value.trim(),
             from: fromInput.value,
             to: toInput.value,
-            page: livePage,
+            cursor: liveCursor,
         };
     }
 
@@ -105,47 +106,69 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
         return JSON.stringify(p);
     }
 
-    function buildPager(page, numPages, params) {
+    function buildPager(nextCursor, count) {
         if (!pager) return;
 
-        if (!numPages || numPages <= 1) {
+        const hasPrev = cursorStack.length > 0 || !!liveCursor;
+        if (!hasPrev && !nextCursor) {
             pager.classList.add("hidden");
             pager.innerHTML = "";
             return;
         }
 
-        const buildHref = (targetPage) => {
-            const qs = new URLSearchParams();
-            if (params.q) qs.set("q", params.q);
-            if (params.type) qs.set("type", params.type);
-            if (params.from) qs.set("from", params.from);
-            if (params.to) qs.set("to", params.to);
-            qs.set("page", String(targetPage));
-            return `?${qs.toString()}`;
-        };
-
         pager.classList.remove("hidden");
         pager.className = "table-footer flex items-center justify-between";
 
         pager.innerHTML = `
             <div class="text-xs text-slate-500 dark:text-slate-400">
-                Page ${page} of ${numPages}
+                Page ${cursorStack.length + 1} · ${count ?? 0} documents
             </div>
 
             <div class="flex items-center gap-2">
-                ${page > 1
-                ? `<a class="btn-outline pager-link" data-no-global-loader="1" href="${buildHref(page - 1)}" data-page="${page - 1}">Prev</a>`
+                ${hasPrev
+                ? `<a class="btn-outline pager-link" data-no-global-loader="1" href="#" data-dir="prev">Prev</a>`
                 : `<span class="btn-outline opacity-50 cursor-not-allowed">Prev</span>`
             }
 
-                ${page < numPages
-                ? `<a class="btn-outline pager-link" data-no-global-loader="1" href="${buildHref(page + 1)}" data-page="${page + 1}">Next</a>`
+                ${nextCursor
+                ? `<a class="btn-outline pager-link" data-no-global-loader="1" href="#" data-dir="next" data-cursor="${esc(nextCursor)}">Next</a>`
                 : `<span class="btn-outline opacity-50 cursor-not-allowed">Next</span>`
             }
             </div>
         `;
     }
 
+    function renderFacets(facets) {
+        if (!facets) return;
+
+        const counts = {};
+        (facets.types || []).forEach(t => { counts[t.value] = t.count; });
+        Array.from(typeSelect.options).forEach(opt => {
+            if (!opt.value) return;
+            const label = opt.dataset.label || opt.value;
+            opt.textContent = `${label} (${counts[opt.value] ?? 0})`;
+        });
+
+        const box = document.getElementById("monthFacets");
+        if (!box) return;
+        box.innerHTML = (facets.months || []).map(m => `
+            <a class="pill pill-neutral monthFacet" data-no-global-loader="1" href="#"
+                data-from="${esc(m.from)}" data-to="${esc(m.to)}">
+                ${esc(m.label)} (${esc(String(m.count ?? 0))})
+            </a>
+        `).join("");
+    }
+
+    document.addEventListener("click", (e) => {
+        const chip = e.target.closest(".monthFacet");
+        if (!chip) return;
+        e.preventDefault();
+
+        fromInput.value = chip.dataset.from || "";
+        toInput.value = chip.dataset.to || "";
+        scheduleSearch({ resetPage: true });
+    });
+
     async function runSearch() {
         const p = getParams();
         const sig = signature(p);
@@ -174,8 +197,8 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
             const data = await res.json();
             if (!data.ok) throw new Error("Bad response");
 
-            if ((data.items || []).length === 0 && (data.page || 1) > 1) {
-                livePage = (data.page || 1) - 1;
+            if ((data.items || []).length === 0 && liveCursor) {
+                liveCursor = cursorStack.pop() || "";
                 lastSig = "";
                 return runSearch();
             }
@@ -198,7 +221,8 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
 
             if (docsCount) docsCount.textContent = `${data.count ?? 0} documents`;
 
-            buildPager(data.page || 1, data.num_pages || 1, p);
+            buildPager(data.next_cursor || "", data.count);
+            renderFacets(data.facets);
 
             setUrlParams(p);
 
@@ -220,16 +244,23 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
         e.preventDefault();
         e.stopPropagation();
 
-        const targetPage = parseInt(link.dataset.page || "1", 10);
-        if (!Number.isFinite(targetPage) || targetPage < 1) return;
+        if (link.dataset.dir === "next") {
+            if (!link.dataset.cursor) return;
+            cursorStack.push(liveCursor);
+            liveCursor = link.dataset.cursor;
+        } else {
+            liveCursor = cursorStack.pop() || "";
+        }
 
-        livePage = targetPage;
         lastSig = "";
         runSearch();
     });
 
     function scheduleSearch({ resetPage = false } = {}) {
-        if (resetPage) livePage = 1;
+        if (resetPage) {
+            liveCursor = "";
+            cursorStack = [];
+        }
         clearTimeout(timer);
         timer = setTimeout(runSearch, 250);
     }
@@ -259,7 +290,7 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
                     "X-Requested-With": "XMLHttpRequest",
                 },
                 body: new URLSearchParams({
-                    page: String(livePage || 1),
+                    cursor: liveCursor || "",
                     dtype: (typeSelect.value || "").trim(),
                 }),
             });
@@ -304,6 +335,44 @@ if (qInput && typeSelect && fromInput && toInput && tbody) {
         }
     });
 
+    const suggestUrl = qInput.dataset.suggestUrl || "";
+    const suggestList = document.getElementById("qSuggest");
+    let suggestTimer = null;
+    let suggestController = null;
+
+    async function runSuggest() {
+        const q = qInput.value.trim();
+        if (!suggestUrl || !suggestList) return;
+        if (q.length < 2) {
+            suggestList.innerHTML = "";
+            return;
+        }
+
+        if (suggestController) suggestController.abort();
+        suggestController = new AbortController();
+
+        try {
+            const res = await fetch(`${suggestUrl}?${new URLSearchParams({ q })}`, {
+                headers: { "Accept": "application/json" },
+                signal: suggestController.signal,
+            });
+            if (!res.ok) return;
+            const data = await res.json();
+            const seen = new Set();
+            suggestList.innerHTML = (data.items || [])
+                .filter(x => !seen.has(x.text) && seen.add(x.text))
+                .map(x => `<option value="${esc(x.text)}">${esc(x.kind)}</option>`)
+                .join("");
+        } catch (err) {
+            if (err.name !== "AbortError") console.error(err);
+        }
+    }
+
+    qInput.addEventListener("input", () => {
+        clearTimeout(suggestTimer);
+        suggestTimer = setTimeout(runSuggest, 120);
+    });
+
     qInput.addEventListener("input", () => scheduleSearch({ resetPage: true }));
     typeSelect.addEventListener("change", () => scheduleSearch({ resetPage: true }));
     fromInput.addEventListener("change", () => scheduleSearch({ resetPage: true }));